@@ -3,6 +3,9 @@ import uuid
 from datetime import datetime
 import os
 
+from local_store import LocalStore
+from passwords import PasswordHasherBusy, hash_password, verify_password
+
 app = Flask(__name__)
 # Use environment variable for secret key in production
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
@@ -12,9 +15,8 @@ def generate_id():
     return str(uuid.uuid4())
 
 # In-memory data storage (Phase 1)
-users = {}  # Will store both patients and doctors
-appointments = {}
-medical_records = {}
+# Stores both patients and doctors, with email/patient/doctor indexes
+store = LocalStore()
 
 # Demo data for testing
 def initialize_demo_data():
@@ -24,7 +26,7 @@ def initialize_demo_data():
     demo_patient = {
         'user_id': patient_id,
         'email': 'patient@demo.com',
-        'password': 'password123',
+        'password': 'password123',  # plaintext demo password, hashed on first login
         'first_name': 'John',
         'last_name': 'Doe',
         'phone': '(555) 123-4567',
@@ -36,7 +38,7 @@ def initialize_demo_data():
         'appointments': [],
         'medical_history': []
     }
-    users[patient_id] = demo_patient
+    store.create_user(demo_patient)
     
     # Demo doctor
     doctor_id = generate_id()
@@ -55,7 +57,7 @@ def initialize_demo_data():
         'appointments': [],
         'patients': []
     }
-    users[doctor_id] = demo_doctor
+    store.create_user(demo_doctor)
 
 # Initialize demo data when the app starts
 initialize_demo_data()
@@ -73,16 +75,23 @@ def login():
         password = request.form['password']
         
         # Check if user exists and password matches
-        for user_id, user in users.items():
-            if user['email'] == email and user['password'] == password:
-                session['user_id'] = user_id
-                session['user_type'] = user['user_type']
-                session['user_name'] = f"{user['first_name']} {user['last_name']}"
-                
-                if user['user_type'] == 'patient':
-                    return redirect(url_for('patient_dashboard'))
-                else:
-                    return redirect(url_for('doctor_dashboard'))
+        user = store.get_user_by_email(email)
+        try:
+            valid, new_hash = verify_password(user['password'] if user else None, password)
+        except PasswordHasherBusy:
+            flash('We are busy right now. Please try logging in again.', 'error')
+            return render_template('login.html'), 503
+        if valid:
+            if new_hash:
+                store.set_password(user['user_id'], new_hash)
+            session['user_id'] = user['user_id']
+            session['user_type'] = user['user_type']
+            session['user_name'] = f"{user['first_name']} {user['last_name']}"
+            
+            if user['user_type'] == 'patient':
+                return redirect(url_for('patient_dashboard'))
+            else:
+                return redirect(url_for('doctor_dashboard'))
         
         flash('Invalid email or password', 'error')
     
@@ -100,17 +109,22 @@ def signup():
         phone = request.form['phone']
         
         # Check if email already exists
-        for user in users.values():
-            if user['email'] == email:
-                flash('Email already registered', 'error')
-                return render_template('signup.html')
+        if store.get_user_by_email(email):
+            flash('Email already registered', 'error')
+            return render_template('signup.html')
+        
+        try:
+            password_hash = hash_password(password)
+        except PasswordHasherBusy:
+            flash('We are busy right now. Please try again.', 'error')
+            return render_template('signup.html'), 503
         
         # Create new user
         user_id = generate_id()
         new_user = {
             'user_id': user_id,
             'email': email,
-            'password': password,  # In production, this should be hashed
+            'password': password_hash,
             'first_name': first_name,
             'last_name': last_name,
             'phone': phone,
@@ -131,7 +145,9 @@ def signup():
             new_user['office_address'] = request.form.get('office_address', '')
             new_user['patients'] = []
         
-        users[user_id] = new_user
+        if not store.create_user(new_user):
+            flash('Email already registered', 'error')
+            return render_template('signup.html')
         flash('Registration successful! Please login.', 'success')
         return redirect(url_for('login'))
     
@@ -143,7 +159,7 @@ def patient_dashboard():
     if 'user_id' not in session or session.get('user_type') != 'patient':
         return redirect(url_for('login'))
     
-    user = users[session['user_id']]
+    user = store.get_user(session['user_id'])
     return render_template('patient_dashboard.html', user=user)
 
 # Doctor dashboard
@@ -152,7 +168,7 @@ def doctor_dashboard():
     if 'user_id' not in session or session.get('user_type') != 'doctor':
         return redirect(url_for('login'))
     
-    user = users[session['user_id']]
+    user = store.get_user(session['user_id'])
     return render_template('doctor_dashboard.html', user=user)
 
 # About page
@@ -198,8 +214,7 @@ def tickets():
                 'created_at': datetime.now()
             }
             
-            appointments[appointment_id] = new_appointment
-            users[session['user_id']]['appointments'].append(appointment_id)
+            store.create_appointment(new_appointment)
             
             flash('Appointment booked successfully!', 'success')
             return render_template('tickets.html', appointment=new_appointment)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Appointment statistics for MedTrack
+Counts of appointments booked and cancelled per day, for each doctor and
+for the whole clinic, kept up to date as appointments are booked and
+cancelled, so dashboards read a few counter items instead of every
+appointment in the period. Days are appointment dates, not booking dates.
+
+In DynamoDB (STATS_TABLE) there is one item per scope and month: the
+scope is 'clinic' or 'doctor#<doctor_key>', the sort key 'YYYY-MM', and
+each day is a pair of numbers, booked_DD and cancelled_DD. A booking or a
+cancellation ADDs to the doctor's item and to the clinic's, so concurrent
+writers never overwrite each other. A doctor's week is one Query returning
+at most two items; every doctor's month is one Query on MonthIndex. The
+local stores keep the same counts per scope and day, updated under the
+same lock (or in the same transaction) as the appointment itself.
+
+Counts are history: archiving old rows (archive.py) doesn't change them.
+In DynamoDB the counters are written after the appointment, so a counter
+write that fails leaves them off. reconcile recounts a date range from the
+live rows and the archive and corrects any day that drifted, as it must
+once for appointments booked before the counters existed. A read that
+fails stops it rather than passing for an empty day, and a day whose
+counters change while it recounts is left for the next run:
+
+Usage:
+    python appointment_stats.py reconcile --start 2024-01-01 --end 2024-03-31 [--dry-run]
+"""
+
+import argparse
+import sys
+import time
+
+from archive import ARCHIVE_DIR, read_archive
+from availability import date_range
+from schedule import doctor_key
+
+# Scope of the clinic-wide counters; each doctor's is doctor_scope(doctor_key)
+CLINIC = 'clinic'
+COUNTERS = ('booked', 'cancelled')
+
+
+def doctor_scope(dkey):
+    return f'doctor#{dkey}'
+
+
+def appointment_scopes(appointment):
+    """The scopes an appointment counts towards: its doctor's and the clinic's"""
+    dkey = appointment.get('doctor_key') or doctor_key(appointment['doctor_name'])
+    return (doctor_scope(dkey), CLINIC)
+
+
+def empty_counts():
+    return dict.fromkeys(COUNTERS, 0)
+
+
+def summarize(days):
+    """Totals over {day: counts}, with active = booked - cancelled"""
+    total = empty_counts()
+    for counts in days.values():
+        for name in COUNTERS:
+            total[name] += counts.get(name, 0)
+    total['active'] = total['booked'] - total['cancelled']
+    return total
+
+
+# -------------------------------------------------
+# DYNAMODB LAYOUT
+# -------------------------------------------------
+def counter_attribute(name, day):
+    """The attribute of a month item holding one day's count (booked_17)"""
+    return f'{name}_{day[8:10]}'
+
+
+def months_between(start_date, end_date):
+    """The YYYY-MM of every month from start_date's to end_date's"""
+    year, month = int(start_date[:4]), int(start_date[5:7])
+    months = []
+    while f'{year:04d}-{month:02d}' <= end_date[:7]:
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def add_update(day, counts):
+    """update_item arguments ADDing {counter: amount} to one day of a month item"""
+    counts = {name: amount for name, amount in counts.items() if amount}
+    return {
+        'UpdateExpression': 'ADD ' + ', '.join(f'#{name} :{name}' for name in counts),
+        'ExpressionAttributeNames': {f'#{name}': counter_attribute(name, day) for name in counts},
+        'ExpressionAttributeValues': {f':{name}': amount for name, amount in counts.items()},
+    }
+
+
+def days_from_item(item, start_date, end_date):
+    """{day: counts} for the days of a month item between two dates"""
+    days = {}
+    for attribute, value in item.items():
+        name, _, day_of_month = attribute.rpartition('_')
+        if name in COUNTERS and day_of_month.isdigit():
+            day = f"{item['month']}-{day_of_month}"
+            if start_date <= day <= end_date:
+                days.setdefault(day, empty_counts())[name] = int(value)
+    return days
+
+
+# -------------------------------------------------
+# RECONCILE
+# -------------------------------------------------
+def collect_appointments(start_date, end_date, fetch_day, archive_root=ARCHIVE_DIR):
+    """Every appointment between two dates, live or archived, each once
+
+    fetch_day(iso_day) returns the live rows on a date. A row that was
+    archived but not yet deleted is in both; the live one wins.
+    """
+    appointments = {}
+    for item in read_archive(start_date, end_date, root=archive_root):
+        appointments[item['appointment_id']] = item
+    for day in date_range(start_date, end_date):
+        for item in fetch_day(day.isoformat()):
+            appointments[item['appointment_id']] = item
+    return appointments.values()
+
+
+def count_appointments(appointments):
+    """{scope: {day: counts}} recounted from appointment rows"""
+    stats = {}
+    for appointment in appointments:
+        day = appointment['appointment_date']
+        for scope in appointment_scopes(appointment):
+            counts = stats.setdefault(scope, {}).setdefault(day, empty_counts())
+            counts['booked'] += 1
+            if appointment.get('status') == 'cancelled':
+                counts['cancelled'] += 1
+    return stats
+
+
+def reconcile(start_date, end_date, read_stats, read_appointments, adjust, dry_run=False):
+    """Correct the counters between two dates to match the appointments
+
+    read_stats() returns the stored counters as {scope: {day: counts}} and
+    read_appointments() every appointment in the range; both must raise
+    rather than return less than there is. The counters are read before
+    the recount and again after it: a day whose counters moved meanwhile
+    had bookings landing during the recount, so it is skipped rather than
+    corrected against a stale value (run again later). adjust(scope, day,
+    counts) ADDs the differences and returns False if it couldn't.
+
+    Returns (drifted, skipped): (scope, day, stored counts, actual counts)
+    for every day that drifted, and (scope, day) for every day skipped.
+    """
+    stored = read_stats()
+    actual = count_appointments(read_appointments())
+    stored_after = read_stats()
+    drifted, skipped = [], []
+    for scope in sorted(actual.keys() | stored.keys() | stored_after.keys()):
+        want_days, have_days = actual.get(scope, {}), stored.get(scope, {})
+        after_days = stored_after.get(scope, {})
+        for day in sorted(want_days.keys() | have_days.keys() | after_days.keys()):
+            if not start_date <= day <= end_date:
+                continue
+            want = want_days.get(day, empty_counts())
+            have = {name: have_days.get(day, {}).get(name, 0) for name in COUNTERS}
+            if have != {name: after_days.get(day, {}).get(name, 0) for name in COUNTERS}:
+                skipped.append((scope, day))
+                continue
+            if want == have:
+                continue
+            if dry_run or adjust(scope, day, {name: want[name] - have[name] for name in COUNTERS}):
+                drifted.append((scope, day, have, want))
+            else:
+                skipped.append((scope, day))
+    return drifted, skipped
+
+
+# -------------------------------------------------
+# CLI
+# -------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Maintain MedTrack appointment statistics')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('reconcile', help='recount a date range and correct the counters')
+    run.add_argument('--start', required=True, help='YYYY-MM-DD')
+    run.add_argument('--end', required=True, help='YYYY-MM-DD')
+    run.add_argument('--dry-run', action='store_true', help='report drift without fixing it')
+    args = parser.parse_args()
+
+    import aws_app
+    start = time.perf_counter()
+    drifted, skipped = reconcile(
+        args.start, args.end,
+        lambda: aws_app.get_appointment_stats_by_scope(args.start, args.end),
+        lambda: collect_appointments(args.start, args.end, aws_app.get_appointments_on),
+        aws_app.add_appointment_stats, args.dry_run)
+    for scope, day, have, want in drifted:
+        print(f"{scope} {day}: " + ', '.join(
+            f"{name} {have[name]} -> {want[name]}" for name in COUNTERS))
+    for scope, day in skipped:
+        print(f"{scope} {day}: skipped (changed during the recount, or the update failed)")
+    print(f"Stats: {len(drifted)} day(s) {'drifted' if args.dry_run else 'corrected'}, "
+          f"{len(skipped)} skipped in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if skipped:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Appointment expiry and archival for MedTrack
+Every appointment carries an expires_at TTL (epoch seconds) and an
+expires_day (YYYY-MM-DD) that the ExpiryIndex GSI is keyed on: some time
+after its date, or sooner once cancelled. DynamoDB deletes rows once
+expires_at passes; before that happens this job reads each day's expiring
+rows by index, appends them to gzip-compressed JSONL files partitioned by
+appointment date, and deletes them from the hot table. The TTL is only a
+backstop for rows the job didn't get to.
+
+    ARCHIVE_DIR/appointments/date=2024-05-01/part-<run>.jsonl.gz
+
+The last archived expiry day is checkpointed in ARCHIVE_DIR, so each run
+only reads the days it hasn't seen. A day is checkpointed only once every
+row of it was written and deleted; a run that couldn't read or delete
+something stops the checkpoint there, and the next run reads it again,
+so a row can land in more than one part file; read_archive yields each
+appointment once. History stays readable by date range:
+
+Usage:
+    python archive.py run                     # archive everything expiring by tomorrow
+    python archive.py history --start 2024-01-01 --end 2024-03-31 [--patient ID]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from availability import date_range
+from bulk_data import to_jsonl
+
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+# Days a past appointment stays in the hot table after its date
+APPOINTMENT_RETENTION_DAYS = int(os.environ.get('APPOINTMENT_RETENTION_DAYS', 30))
+# Days a cancelled appointment stays in the hot table after cancellation
+CANCELLED_RETENTION_DAYS = int(os.environ.get('CANCELLED_RETENTION_DAYS', 7))
+# Archive rows this many days before their TTL fires
+ARCHIVE_AHEAD_DAYS = int(os.environ.get('ARCHIVE_AHEAD_DAYS', 1))
+# First run without a checkpoint looks this far back for expiring rows
+ARCHIVE_LOOKBACK_DAYS = int(os.environ.get('ARCHIVE_LOOKBACK_DAYS', 7))
+
+_CHECKPOINT = '_checkpoint.json'
+
+
+# -------------------------------------------------
+# EXPIRY
+# -------------------------------------------------
+def expiry_fields(expires):
+    """TTL attributes for a datetime: epoch seconds plus the day it falls on"""
+    return {'expires_at': int(expires.timestamp()), 'expires_day': expires.date().isoformat()}
+
+
+def appointment_expiry(appointment):
+    """TTL attributes for a booked appointment: APPOINTMENT_RETENTION_DAYS after its date"""
+    day = date.fromisoformat(appointment['appointment_date'])
+    return expiry_fields(datetime.combine(day + timedelta(days=APPOINTMENT_RETENTION_DAYS + 1),
+                                          datetime.min.time()))
+
+
+def cancellation_fields(now=None):
+    """Attributes a cancellation sets: status, when, and a CANCELLED_RETENTION_DAYS TTL"""
+    now = now or datetime.now()
+    fields = {'status': 'cancelled', 'cancelled_at': now.isoformat()}
+    fields.update(expiry_fields(now + timedelta(days=CANCELLED_RETENTION_DAYS)))
+    return fields
+
+
+# -------------------------------------------------
+# ARCHIVE FILES
+# -------------------------------------------------
+def partition_dir(root, appointment_date):
+    return os.path.join(root, 'appointments', f"date={appointment_date}")
+
+
+class ArchiveWriter:
+    """Appends items to one gzip JSONL file per appointment date
+
+    Files are written under a temporary name and renamed on close, so
+    readers never see a partial part file.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self.run_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._files = {}  # appointment_date -> (gzip file, tmp path, final path)
+        self.written = 0
+
+    def write(self, item):
+        appointment_date = item.get('appointment_date') or 'unknown'
+        entry = self._files.get(appointment_date)
+        if entry is None:
+            directory = partition_dir(self.root, appointment_date)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.part-')
+            entry = (gzip.open(os.fdopen(fd, 'wb'), 'wt', encoding='utf-8'), tmp_path,
+                     os.path.join(directory, f"part-{self.run_id}.jsonl.gz"))
+            self._files[appointment_date] = entry
+        entry[0].writelines(to_jsonl((item,)))
+        self.written += 1
+
+    def close(self):
+        """Finish every part file; nothing is visible to readers until this runs"""
+        for f, tmp_path, path in self._files.values():
+            f.close()
+            os.replace(tmp_path, path)
+        self._files.clear()
+
+    def abort(self):
+        for f, tmp_path, _ in self._files.values():
+            f.close()
+            os.unlink(tmp_path)
+        self._files.clear()
+
+
+def read_archive(start_date, end_date, patient_id=None, root=ARCHIVE_DIR):
+    """Yield archived appointments between two dates, reading only those partitions
+
+    A row whose delete failed is archived again by the next run, into
+    another part file; each appointment is yielded once, from the newest
+    part that has it.
+    """
+    seen = set()
+    for day in date_range(start_date, end_date):
+        directory = partition_dir(root, day.isoformat())
+        if not os.path.isdir(directory):
+            continue
+        # Run ids start with their timestamp: newest part first
+        for name in sorted(os.listdir(directory), reverse=True):
+            if not name.endswith('.jsonl.gz'):
+                continue
+            with gzip.open(os.path.join(directory, name), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    item = json.loads(line)
+                    if item['appointment_id'] in seen:
+                        continue
+                    seen.add(item['appointment_id'])
+                    if patient_id is None or item.get('patient_id') == patient_id:
+                        yield item
+
+
+# -------------------------------------------------
+# PIPELINE
+# -------------------------------------------------
+def _load_checkpoint(root):
+    try:
+        with open(os.path.join(root, _CHECKPOINT)) as f:
+            return json.load(f).get('archived_through')
+    except FileNotFoundError:
+        return None
+
+
+def _save_checkpoint(root, day):
+    os.makedirs(root, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=root, prefix='.checkpoint-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'archived_through': day, 'saved_at': datetime.now().isoformat()}, f)
+    os.replace(tmp_path, os.path.join(root, _CHECKPOINT))
+
+
+def archive_expiring(fetch_expiring, delete, root=ARCHIVE_DIR, today=None,
+                     ahead_days=ARCHIVE_AHEAD_DAYS, lookback_days=ARCHIVE_LOOKBACK_DAYS):
+    """Archive and delete every appointment expiring from the checkpoint up to today + ahead_days
+
+    fetch_expiring(iso_day) returns the rows whose expires_day is that day
+    and must raise if it can't read them all, rather than return fewer;
+    delete(appointment_id) removes one from the hot table and returns
+    False if it couldn't. Each day's rows are written and their part files
+    closed before any of them is deleted, and the checkpoint moves only
+    after a day is fully done. After a day with rows left undeleted, later
+    days are still archived but no longer checkpointed. A day that isn't
+    over yet is read again on the next run, since cancellations can still
+    land on it. Returns (rows archived, rows archived but not deleted).
+    """
+    today = today or date.today()
+    last = today + timedelta(days=ahead_days)
+    checkpoint = _load_checkpoint(root)
+    first = (date.fromisoformat(checkpoint) + timedelta(days=1) if checkpoint
+             else today - timedelta(days=lookback_days))
+    archived = undeleted = 0
+    for day in date_range(first.isoformat(), last.isoformat()):
+        iso_day = day.isoformat()
+        items = list(fetch_expiring(iso_day))
+        writer = ArchiveWriter(root)
+        try:
+            for item in items:
+                writer.write(item)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        failed = [item['appointment_id'] for item in items if not delete(item['appointment_id'])]
+        archived += len(items)
+        undeleted += len(failed)
+        print(f"Archive: {iso_day}: {len(items)} row(s)", file=sys.stderr)
+        if failed:
+            # Written but still in the hot table: the next run reads them again
+            print(f"Archive: {iso_day}: {len(failed)} row(s) not deleted", file=sys.stderr)
+        elif day < today and not undeleted:
+            _save_checkpoint(root, iso_day)
+    return archived, undeleted
+
+
+# -------------------------------------------------
+# CLI
+# -------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Archive expiring MedTrack appointments')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('run', help='archive and delete rows expiring by tomorrow')
+    history = sub.add_parser('history', help='print archived appointments as JSONL')
+    history.add_argument('--start', required=True, help='YYYY-MM-DD')
+    history.add_argument('--end', required=True, help='YYYY-MM-DD')
+    history.add_argument('--patient', help='only this patient_id')
+    args = parser.parse_args()
+
+    if args.command == 'history':
+        for item in read_archive(args.start, args.end, args.patient):
+            sys.stdout.write(json.dumps(item) + '\n')
+        return
+
+    import aws_app
+    start = time.perf_counter()
+    count, undeleted = archive_expiring(aws_app.get_appointments_expiring_on,
+                                        aws_app.delete_appointment)
+    print(f"Archive: done, {count} row(s) in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if undeleted:
+        sys.exit(f"Archive: {undeleted} row(s) not deleted; the checkpoint stops before them")
+
+
+if __name__ == '__main__':
+    main()
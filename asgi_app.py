@@ -0,0 +1,294 @@
+"""
+ASGI entry point for MedTrack
+Serves the same app as aws_app:app from an event loop, for when requests
+spend most of their time waiting on DynamoDB and SNS. The storage-bound
+routes - both dashboards, /availability, /doctors/search and /logout -
+have async versions here that await their reads (together, where they are
+independent) through async_storage, so one worker holds thousands of them
+at a fraction of a thread each. Every other route runs the Flask app
+unchanged on a small thread pool (ASGI_WSGI_THREADS), as under gunicorn.
+
+The async views still go through Flask's request handling: sessions and
+flashed messages, the before/after-request hooks (metrics, rate limits,
+storage deadlines, compression) and the error handlers all apply, and
+they render the same templates.
+
+    uvicorn asgi_app:application --workers 4
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \\
+        gunicorn --config gunicorn.conf.py asgi_app:application
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import redirect, request, session, url_for
+from werkzeug.exceptions import HTTPException
+
+# Sizes the AWS connection pool, so it must come before aws_app
+import async_storage as aio
+import aws_app
+from aws_app import app, doctor_directory, is_logged_in, notifier
+
+# Threads running routes that have no async version (like gunicorn's --threads)
+ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+# Request bodies up to this size are kept in memory, bigger ones (uploads) on disk
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# endpoint -> coroutine function serving it in ASGI mode
+ASYNC_VIEWS = {}
+
+_wsgi_executor = None
+_wsgi_executor_pid = None
+_wsgi_executor_lock = threading.Lock()
+
+
+def async_view(endpoint):
+    """Serve a Flask endpoint's GET/HEAD requests with this coroutine function"""
+
+    def decorator(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+
+    return decorator
+
+
+def get_wsgi_executor():
+    """The pool for routes without an async view, created lazily per worker"""
+    global _wsgi_executor, _wsgi_executor_pid
+    if _wsgi_executor_pid != os.getpid():
+        with _wsgi_executor_lock:
+            if _wsgi_executor_pid != os.getpid():
+                _wsgi_executor = ThreadPoolExecutor(
+                    max_workers=ASGI_WSGI_THREADS,
+                    thread_name_prefix='wsgi'
+                )
+                _wsgi_executor_pid = os.getpid()
+    return _wsgi_executor
+
+
+# -------------------------------------------------
+# ASYNC VIEWS
+# Same behaviour as the aws_app views of the same name
+# -------------------------------------------------
+@async_view('patient_dashboard')
+async def patient_dashboard():
+    if not is_logged_in() or session.get('user_type') != 'patient':
+        return redirect(url_for('login'))
+
+    # Profile and one page of appointments, awaited together
+    reads, render = aws_app.plan_patient_dashboard()
+    return render(await aio.load_reads(reads))
+
+
+@async_view('doctor_dashboard')
+async def doctor_dashboard():
+    if not is_logged_in() or session.get('user_type') != 'doctor':
+        return redirect(url_for('login'))
+
+    reads, render = aws_app.plan_doctor_dashboard()
+    return render(await aio.load_reads(reads))
+
+
+@async_view('availability')
+async def availability():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+
+    doctor, start_date, end_date = aws_app.availability_args()
+    return aws_app.availability_response(
+        doctor, start_date, end_date,
+        await aio.get_free_slots(doctor, start_date, end_date) if doctor else {})
+
+
+@async_view('search_doctors')
+async def search_doctors():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+
+    query, limit = aws_app.search_args()
+    # Only the first search in a worker waits for the directory to load
+    await aio.run_io(doctor_directory.ensure_fresh, aws_app.get_doctors)
+    return aws_app.search_response(query, limit)
+
+
+@async_view('logout')
+async def logout():
+    await aio.send_notification(*aws_app.end_session())
+    return redirect(url_for('index'))
+
+
+# -------------------------------------------------
+# ASGI
+# -------------------------------------------------
+def build_environ(scope, body):
+    """The WSGI environ for an ASGI http scope and its (file-like) body"""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        value = value.decode('latin-1')
+        if key in environ:
+            # HTTP/2 sends each cookie as its own header
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    if 'CONTENT_LENGTH' not in environ:
+        # Chunked HTTP/1.1 and HTTP/2 bodies come without one; the body is
+        # buffered by now, so its size is known
+        body.seek(0, os.SEEK_END)
+        environ['CONTENT_LENGTH'] = str(body.tell())
+        body.seek(0)
+    return environ
+
+
+async def read_body(receive):
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        body.write(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    body.seek(0)
+    return body
+
+
+def match_endpoint(environ):
+    """The endpoint Flask would route this request to, or None"""
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(
+            environ, server_name=app.config['SERVER_NAME']).match()
+    except HTTPException:
+        # 404, 405 and trailing-slash redirects are left to Flask
+        return None
+    return endpoint
+
+
+async def run_async_view(view, environ):
+    """Flask's request handling around an async view
+
+    Returns (status, headers, body); as in Flask.wsgi_app, teardown runs
+    whatever happens. The before- and after-request hooks can block (the
+    rate limiter's SQLite transaction, compression), so they run on the
+    I/O pool rather than the event loop.
+    """
+    ctx = app.request_context(environ)
+    error = None
+    try:
+        try:
+            ctx.push()
+            try:
+                rv = await aio.run_io(app.preprocess_request)
+                if rv is None:
+                    rv = await view(**request.view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = await aio.run_io(app.finalize_request, rv)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        app_iter, status, headers = response.get_wsgi_response(environ)
+        return status, headers, b''.join(app_iter)
+    finally:
+        if error is not None and app.should_ignore_error(error):
+            error = None
+        ctx.pop(error)
+
+
+async def run_wsgi(environ, send):
+    """Run the Flask app for a request on the WSGI pool, streaming its body"""
+    loop = asyncio.get_running_loop()
+    executor = get_wsgi_executor()
+    # Every step runs in this one context, so streamed responses that push a
+    # request context (stream_with_context) find it on the next chunk
+    context = contextvars.Context()
+
+    def call(fn, *args):
+        return loop.run_in_executor(executor, functools.partial(context.run, fn, *args))
+
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'], started['headers'] = status, headers
+
+    app_iter = await call(app, environ, start_response)
+    try:
+        chunks = iter(app_iter)
+        chunk = await call(next, chunks, None)
+        await send_start(send, started['status'], started['headers'])
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            chunk = await call(next, chunks, None)
+        await send({'type': 'http.response.body'})
+    finally:
+        if hasattr(app_iter, 'close'):
+            await call(app_iter.close)
+
+
+async def send_start(send, status, headers):
+    await send({
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers],
+    })
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Publish any queued notifications before the worker goes away
+            await aio.run_io(notifier.shutdown)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """The ASGI application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    environ = build_environ(scope, await read_body(receive))
+    view = ASYNC_VIEWS.get(match_endpoint(environ)) if scope['method'] in ('GET', 'HEAD') else None
+    if view is None:
+        await run_wsgi(environ, send)
+        return
+    status, headers, body = await run_async_view(view, environ)
+    await send_start(send, status, headers)
+    await send({'type': 'http.response.body', 'body': body})
@@ -0,0 +1,121 @@
+"""
+Async storage helpers for MedTrack
+Awaitable versions of aws_app's storage helpers and send_notification, for
+the ASGI serving mode (asgi_app.py). Each one runs the existing helper -
+with its user cache, retries, circuit breaker and metrics - on a dedicated
+I/O thread pool, so the event loop goes on serving other requests while
+DynamoDB or SNS answers. A process can then hold thousands of requests
+that are waiting on storage, with at most ASYNC_IO_THREADS storage calls
+in flight at once.
+
+boto3 has no asyncio API of its own, and aiobotocore doesn't support the
+botocore version pinned in requirements.txt, hence the pool.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dashboard_loader import DashboardData, DASHBOARD_TIMEOUT
+
+ASYNC_IO_THREADS = int(os.environ.get('ASYNC_IO_THREADS', 256))
+
+# Every pool thread may hold a DynamoDB connection; must be set before
+# aws_clients is imported
+os.environ.setdefault('AWS_MAX_POOL_CONNECTIONS', str(ASYNC_IO_THREADS))
+
+import aws_app  # noqa: E402
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """The I/O pool, created lazily (and again in each forked worker)"""
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=ASYNC_IO_THREADS,
+                    thread_name_prefix='async-io'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+async def run_io(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) run on the I/O pool
+
+    It runs in a copy of the caller's context, so the Flask request
+    context (the storage deadline on g, the route for metrics) is visible
+    inside it.
+    """
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
+
+
+def awaitable(fn):
+    """An async version of a blocking helper, run with run_io"""
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_io(fn, *args, **kwargs)
+
+    return wrapper
+
+
+async def load_dashboard(loaders, timeout=None):
+    """Await {name: awaitable} loaders together and collect what finishes in time
+
+    The async counterpart of dashboard_loader.load_dashboard: anything
+    that fails or misses the deadline is left out.
+    """
+    timeout = DASHBOARD_TIMEOUT if timeout is None else timeout
+    tasks = {name: asyncio.ensure_future(loader) for name, loader in loaders.items()}
+    done, _ = await asyncio.wait(tasks.values(), timeout=timeout)
+
+    results = {}
+    missing = []
+    for name, task in tasks.items():
+        if task not in done:
+            task.cancel()
+            print(f"Dashboard: '{name}' missed the {timeout}s deadline")
+            missing.append(name)
+        elif task.exception() is not None:
+            print(f"Dashboard: '{name}' failed: {task.exception()}")
+            missing.append(name)
+        else:
+            results[name] = task.result()
+    return DashboardData(results, missing)
+
+
+async def load_reads(reads, timeout=None):
+    """The async aws_app.load_reads: each {name: (helper, args)} read runs on the I/O pool"""
+    return await load_dashboard({name: run_io(fn, *args) for name, (fn, args) in reads.items()},
+                                timeout)
+
+
+# -------------------------------------------------
+# HELPERS
+# -------------------------------------------------
+get_user_by_email = awaitable(aws_app.get_user_by_email)
+get_session_user = awaitable(aws_app.get_session_user)
+get_doctors = awaitable(aws_app.get_doctors)
+get_user_appointments = awaitable(aws_app.get_user_appointments)
+get_user_appointments_page = awaitable(aws_app.get_user_appointments_page)
+get_doctor_schedule = awaitable(aws_app.get_doctor_schedule)
+get_appointments_on = awaitable(aws_app.get_appointments_on)
+get_free_slots = awaitable(aws_app.get_free_slots)
+get_appointment_stats = awaitable(aws_app.get_appointment_stats)
+get_medical_record = awaitable(aws_app.get_medical_record)
+get_patient_records = awaitable(aws_app.get_patient_records)
+create_appointment = awaitable(aws_app.create_appointment)
+delete_appointment = awaitable(aws_app.delete_appointment)
+
+# Queueing is normally instant, but the 'block' overflow policy can wait
+send_notification = awaitable(aws_app.send_notification)
@@ -0,0 +1,152 @@
+"""
+Slot availability for MedTrack
+Each doctor's day is split into fixed-length slots. Working hours and
+booked slots are both bitmaps (one int per doctor per day), so free-slot
+search over a date range is a few bit operations per day, and a booking
+is a test-and-set on one bit.
+"""
+
+import json
+import os
+from datetime import date, timedelta
+
+SLOT_MINUTES = int(os.environ.get('SLOT_MINUTES', 30))
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+# Longest range /availability will search in one request
+MAX_AVAILABILITY_DAYS = 31
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+# Used for any doctor without an entry in DOCTOR_HOURS_FILE
+DEFAULT_WORKING_HOURS = {
+    'mon': ['09:00-17:00'],
+    'tue': ['09:00-17:00'],
+    'wed': ['09:00-17:00'],
+    'thu': ['09:00-17:00'],
+    'fri': ['09:00-17:00'],
+}
+
+
+class SlotUnavailable(Exception):
+    """The requested slot is already booked or outside working hours"""
+
+
+def slot_index(time_str):
+    """Slot number containing an HH:MM time"""
+    hours, minutes = time_str.split(':')[:2]
+    return (int(hours) * 60 + int(minutes)) // SLOT_MINUTES
+
+
+def slot_time(index):
+    """HH:MM start time of a slot number"""
+    minutes = index * SLOT_MINUTES
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def slot_id(dkey, appointment_date, appointment_time):
+    """Unique claim key for one doctor's slot ("sarah johnson#2024-05-01#09:30")"""
+    return f"{dkey}#{appointment_date}#{slot_time(slot_index(appointment_time))}"
+
+
+def date_range(start_date, end_date):
+    """ISO dates from start_date to end_date inclusive"""
+    day = date.fromisoformat(start_date)
+    last = date.fromisoformat(end_date)
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def bits_to_times(bits):
+    """HH:MM start times of every set bit, in order"""
+    times = []
+    while bits:
+        low = bits & -bits
+        times.append(slot_time(low.bit_length() - 1))
+        bits ^= low
+    return times
+
+
+class WorkingHours:
+    """A weekly template of working intervals, e.g. {'mon': ['09:00-12:00', '13:00-17:00']}"""
+
+    def __init__(self, template):
+        self._masks = [0] * 7
+        for weekday, intervals in template.items():
+            mask = 0
+            for interval in intervals:
+                start, end = interval.split('-')
+                for i in range(slot_index(start), slot_index(end)):
+                    mask |= 1 << i
+            self._masks[WEEKDAYS.index(weekday[:3].lower())] = mask
+
+    def mask(self, day):
+        """Bitmap of working slots on a date"""
+        return self._masks[day.weekday()]
+
+
+class WorkingHoursRegistry:
+    """Working-hours templates per doctor_key, loaded from DOCTOR_HOURS_FILE (JSON)"""
+
+    def __init__(self, path=None):
+        self.default = WorkingHours(DEFAULT_WORKING_HOURS)
+        self._templates = {}
+        path = path or os.environ.get('DOCTOR_HOURS_FILE')
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for dkey, template in json.load(f).items():
+                    self._templates[dkey] = WorkingHours(template)
+
+    def for_doctor(self, dkey):
+        return self._templates.get(dkey, self.default)
+
+
+class AvailabilityIndex:
+    """Booked-slot bitmaps per (doctor_key, date)
+
+    Not thread-safe on its own; LocalStore calls it under its lock.
+    """
+
+    def __init__(self):
+        self._booked = {}  # (doctor_key, date) -> bitmap
+
+    def claim(self, dkey, appointment_date, appointment_time):
+        """Set a slot's bit; returns False if it was already set"""
+        key = (dkey, appointment_date)
+        bit = 1 << slot_index(appointment_time)
+        booked = self._booked.get(key, 0)
+        if booked & bit:
+            return False
+        self._booked[key] = booked | bit
+        return True
+
+    def release(self, dkey, appointment_date, appointment_time):
+        key = (dkey, appointment_date)
+        booked = self._booked.get(key, 0) & ~(1 << slot_index(appointment_time))
+        if booked:
+            self._booked[key] = booked
+        else:
+            self._booked.pop(key, None)
+
+    def booked(self, dkey, appointment_date):
+        return self._booked.get((dkey, appointment_date), 0)
+
+
+def free_slots(hours, booked_for_day, start_date, end_date):
+    """{date: [HH:MM, ...]} of working, unbooked slots between two dates
+
+    booked_for_day(iso_date) returns that day's booked-slot bitmap.
+    """
+    free = {}
+    for day in date_range(start_date, end_date):
+        bits = hours.mask(day) & ~booked_for_day(day.isoformat())
+        if bits:
+            free[day.isoformat()] = bits_to_times(bits)
+    return free
+
+
+def is_working_slot(hours, appointment_date, appointment_time):
+    """Whether a slot falls inside the doctor's working hours"""
+    day = date.fromisoformat(appointment_date)
+    return bool(hours.mask(day) >> slot_index(appointment_time) & 1)
@@ -1,14 +1,57 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-import boto3
-from boto3.dynamodb.conditions import Key
+from flask import (
+    Flask, render_template, request, redirect, url_for, session, flash, jsonify,
+    Response, stream_with_context, abort, send_file
+)
+from werkzeug.utils import secure_filename
 from botocore.exceptions import ClientError
+import functools
 import uuid
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import os
 
+from dynamodb_queries import (
+    query_items, patient_appointments_query, patient_records_query, doctor_schedule_query,
+    appointments_on_date_query, appointments_expiring_query, users_by_type_query, in_date_range,
+    stats_query, stats_month_query
+)
+from local_store import store_from_env
+from user_cache import UserCache
+from notifications import LogPublisher, SNSPublisher, dispatcher_from_env
+from dashboard_loader import load_dashboard
+import metrics
+from passwords import PasswordHasherBusy, hash_password, verify_password, hasher
+from aws_clients import get_dynamodb, get_table, get_sns, get_s3, set_table_wrapper
+from schedule import doctor_key, with_schedule_keys
+from pagination import CursorCodec, APPOINTMENTS_PAGE_SIZE, page_size
+from bulk_data import TABLES as EXPORT_TABLES, parallel_scan, local_export, to_jsonl, count_rows
+from medical_records import (
+    LocalBlobStore, CHUNK_SIZE, RECORD_CONTENT_TYPES, RECORDS_BLOB_STORE, blob_key,
+    blob_store_from_env
+)
+from archive import appointment_expiry, cancellation_fields
+from appointment_stats import (
+    CLINIC, add_update, appointment_scopes, days_from_item, doctor_scope, months_between, summarize
+)
+from doctor_directory import DoctorDirectory
+import http_cache
+import rate_limit
+import resilience
+import startup
+from dynamodb_faults import faults_from_env
+from availability import (
+    AvailabilityIndex, WorkingHoursRegistry, SlotUnavailable, MAX_AVAILABILITY_DAYS,
+    SLOT_MINUTES, slot_id, free_slots, is_working_slot
+)
+
 app = Flask(__name__)
 # Use environment variable for secret key in production
 app.secret_key = os.environ.get('SECRET_KEY', 'aws-secret-key-change-in-production')
+# Signed, opaque page cursors for appointment lists
+cursors = CursorCodec(app.secret_key)
+# Largest request body accepted (medical record uploads); bigger ones get a 413
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('RECORDS_MAX_UPLOAD_MB', 100)) * 1024 * 1024
+# Compiled templates kept on disk across restarts (JINJA_CACHE_DIR, see startup.py)
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': startup.bytecode_cache_from_env()}
 
 # -------------------------------------------------
 # AWS CONFIG
@@ -18,132 +61,554 @@ USE_AWS = os.environ.get('USE_AWS', 'false').lower() == 'true'
 
 # Initialize AWS services only if USE_AWS is enabled
 if USE_AWS:
-    dynamodb = boto3.resource("dynamodb", region_name=REGION)
-    sns = boto3.client("sns", region_name=REGION)
+    # DynamoDB Tables (must exist in AWS). The boto3 resource and clients are
+    # built lazily in aws_clients, once per worker process.
+    USERS_TABLE = os.environ.get('USERS_TABLE', 'MedTrack_Users')
+    APPOINTMENTS_TABLE = os.environ.get('APPOINTMENTS_TABLE', 'MedTrack_Appointments')
+    RECORDS_TABLE = os.environ.get('RECORDS_TABLE', 'MedTrack_MedicalRecords')
+    SLOTS_TABLE = os.environ.get('SLOTS_TABLE', 'MedTrack_Slots')
+    # Per-doctor and clinic-wide appointment counters (see appointment_stats.py)
+    STATS_TABLE = os.environ.get('STATS_TABLE', 'MedTrack_AppointmentStats')
     
-    # DynamoDB Tables (must exist in AWS)
-    users_table = dynamodb.Table(os.environ.get('USERS_TABLE', 'MedTrack_Users'))
-    appointments_table = dynamodb.Table(os.environ.get('APPOINTMENTS_TABLE', 'MedTrack_Appointments'))
-    medical_records_table = dynamodb.Table(os.environ.get('RECORDS_TABLE', 'MedTrack_MedicalRecords'))
+    # Retries within a per-request deadline, a circuit breaker per table, and
+    # reads served from recent results while a table is down (see resilience.py).
+    # DYNAMODB_FAULTS simulates throttling and outages (see dynamodb_faults.py).
+    storage_guard = resilience.StorageGuard(faults=faults_from_env())
+    set_table_wrapper(storage_guard.table)
     
     # SNS Topic ARN (optional)
-    SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:481665113061:MedTrack'
+    SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:481665113061:MedTrack')
+    
+    # Read-through cache in front of the users table GetItem (see user_cache.stats())
+    user_cache = UserCache(
+        maxsize=int(os.environ.get('USER_CACHE_SIZE', 1024)),
+        ttl=float(os.environ.get('USER_CACHE_TTL', 60)),
+        negative_ttl=float(os.environ.get('USER_CACHE_NEGATIVE_TTL', 10))
+    )
+else:
+    # Local storage: indexed in-memory dicts, or a SQLite file shared by
+    # every worker on the box (LOCAL_STORE=sqlite)
+    store = store_from_env()
+
+# Doctor schedule view
+DOCTOR_SCHEDULE_PAGE_SIZE = int(os.environ.get('DOCTOR_SCHEDULE_PAGE_SIZE', 25))
+DOCTOR_SCHEDULE_DAYS = int(os.environ.get('DOCTOR_SCHEDULE_DAYS', 7))
+# Longest date range the admin statistics page reads
+MAX_STATS_DAYS = int(os.environ.get('MAX_STATS_DAYS', 366))
+
+# Attributes the reminder scheduler reads (see reminders.py)
+REMINDER_FIELDS = ['appointment_id', 'appointment_date', 'appointment_time', 'doctor_name',
+                   'patient_id', 'patient_email', 'status']
+
+# Doctor name/specialization autocomplete, kept in memory per worker
+doctor_directory = DoctorDirectory()
+# Attributes the doctor directory reads (see doctor_directory.py)
+DOCTOR_FIELDS = ['user_id', 'first_name', 'last_name', 'specialization']
+
+# Per-doctor working hours (DOCTOR_HOURS_FILE, else Mon-Fri 09:00-17:00)
+working_hours = WorkingHoursRegistry()
+
+# Medical record files (RECORDS_BLOB_STORE=local|s3); metadata goes in the records table
+blob_store = blob_store_from_env(get_s3)
+
+# Comma-separated emails allowed to use the /admin pages
+ADMIN_EMAILS = {
+    email.strip() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()
+}
+
+# Notifications are queued and published by a background dispatcher
+if USE_AWS and SNS_TOPIC_ARN:
+    notifier = dispatcher_from_env(SNSPublisher(get_sns, SNS_TOPIC_ARN))
 else:
-    # Fallback to in-memory storage for local development
-    users = {}
-    appointments = {}
-    medical_records = {}
+    notifier = dispatcher_from_env(LogPublisher())
+
+# Request timing, AWS call timing and /metrics (Prometheus)
+metrics.init_app(app)
+# Storage outages end in a 503 with Retry-After rather than a misleading page
+resilience.init_app(app)
+# Token-bucket limits per box, per client and on login/signup/booking (429 + Retry-After)
+limiter = rate_limit.limiter_from_env()
+rate_limit.init_app(app, limiter)
+# Compression and fingerprinted static URLs; public pages cached for anonymous visitors
+compressor = http_cache.init_app(app)
+page_cache = http_cache.PageCache()
+metrics.register_stats('notifier', notifier.stats, (
+    'queue_depth', 'in_flight', 'submitted', 'published', 'dropped', 'failed', 'retries', 'batches'))
+metrics.register_stats('rate_limit', limiter.stats, ('admitted', 'limited', 'errors'))
+metrics.register_stats('page_cache', page_cache.stats, (
+    'size', 'hits', 'misses', 'not_modified', 'bypassed'))
+metrics.register_stats('compression', compressor.stats, (
+    'compressed', 'cache_hits', 'bytes_in', 'bytes_out'))
+metrics.register_stats('doctor_directory', doctor_directory.stats, (
+    'doctors', 'index_entries', 'searches', 'reconciles', 'reconcile_errors'))
+if USE_AWS:
+    metrics.register_stats('user_cache', user_cache.stats, (
+        'size', 'hits', 'negative_hits', 'misses', 'evictions', 'expirations'))
+    metrics.register_stats('storage', storage_guard.stats, (
+        'calls', 'retries', 'failures', 'short_circuits', 'stale_reads', 'breaker_opens',
+        'open_breakers'))
 
 # -------------------------------------------------
 # HELPERS
 # -------------------------------------------------
+def is_admin():
+    """Check if the logged-in user is listed in ADMIN_EMAILS"""
+    return is_logged_in() and session.get('user_email') in ADMIN_EMAILS
+
 def generate_id():
     return str(uuid.uuid4())
 
 def send_notification(subject, message):
-    """Send SNS notification if AWS is enabled"""
-    if not USE_AWS or not SNS_TOPIC_ARN:
-        print(f"[NOTIFICATION] {subject}: {message}")
-        return
+    """Queue a notification (SNS if AWS is enabled, printed otherwise)"""
+    notifier.submit(subject, message)
+
+def parse_date_arg(name, default):
+    """Read a YYYY-MM-DD query argument, falling back to default if missing or invalid"""
+    value = request.args.get(name, '')
     try:
-        sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject=subject,
-            Message=message
-        )
-    except ClientError as e:
-        print(f"SNS Error: {e}")
+        return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        return default
 
 def is_logged_in():
     """Check if user is logged in"""
     return 'user_id' in session
 
+def _fetch_user_by_email(email):
+    """Read a user straight from DynamoDB (email is the partition key)"""
+    response = get_table(USERS_TABLE).get_item(Key={'email': email})
+    return response.get('Item')
+
 def get_user_by_email(email):
-    """Get user by email from DynamoDB or in-memory storage"""
+    """Get user by email from DynamoDB (through the user cache) or local storage"""
     if USE_AWS:
         try:
-            # DynamoDB: email is the partition key
-            response = users_table.get_item(Key={'email': email})
-            return response.get('Item')
+            return user_cache.get(email, _fetch_user_by_email)
         except ClientError as e:
             print(f"DynamoDB Error: {e}")
             return None
     else:
-        # In-memory: search through users
-        for user_id, user in users.items():
-            if user['email'] == email:
-                return user
-        return None
+        # Local: unique email index
+        return store.get_user_by_email(email)
+
+def get_session_user(user_id, email):
+    """Get the logged-in user's profile (by email in DynamoDB, by id in memory)"""
+    if USE_AWS:
+        return get_user_by_email(email)
+    return store.get_user(user_id)
+
+def _store_user(user_data):
+    if USE_AWS:
+        try:
+            get_table(USERS_TABLE).put_item(Item=user_data)
+            return True
+        except ClientError as e:
+            print(f"DynamoDB Error: {e}")
+            return False
+        finally:
+            # Drop any cached (including negative) entry for this email
+            user_cache.invalidate(user_data['email'])
+    else:
+        return store.create_user(user_data)
 
 def create_user(user_data):
-    """Create user in DynamoDB or in-memory storage"""
+    """Create user in DynamoDB or local storage"""
+    created = _store_user(user_data)
+    if created and user_data.get('user_type') == 'doctor':
+        # Searchable on this worker right away; others pick it up on reload
+        doctor_directory.add(user_data)
+    return created
+
+def get_doctors():
+    """Every registered doctor (doctor directory reloads)
+
+    Unlike the other helpers this lets storage errors propagate, so a
+    failed reload keeps the directory's current index instead of
+    emptying it.
+    """
+    if USE_AWS:
+        return list(query_items(get_table(USERS_TABLE), **users_by_type_query('doctor', DOCTOR_FIELDS)))
+    else:
+        return store.doctors()
+
+def update_password(user, password_hash):
+    """Store a new password hash for a user (e.g. after a cost upgrade)"""
     if USE_AWS:
         try:
-            users_table.put_item(Item=user_data)
+            get_table(USERS_TABLE).update_item(
+                Key={'email': user['email']},
+                UpdateExpression='SET password = :password',
+                ExpressionAttributeValues={':password': password_hash}
+            )
             return True
         except ClientError as e:
             print(f"DynamoDB Error: {e}")
             return False
+        except resilience.StorageUnavailable:
+            # Read-only for now; the hash is upgraded on a later login
+            return False
+        finally:
+            user_cache.invalidate(user['email'])
     else:
-        users[user_data['user_id']] = user_data
-        return True
+        return store.set_password(user['user_id'], password_hash)
 
-def get_user_appointments(user_id):
-    """Get all appointments for a user"""
+def get_user_appointments(user_id, start_date=None, end_date=None):
+    """Get all appointments for a user, optionally within a date range (YYYY-MM-DD)"""
     if USE_AWS:
         try:
-            # Scan and filter (or use GSI if configured)
-            response = appointments_table.scan()
-            user_appointments = [
-                item for item in response.get('Items', [])
-                if item.get('patient_id') == user_id
-            ]
-            return user_appointments
+            # Query the PatientIdIndex GSI, following every page
+            return list(query_items(
+                get_table(APPOINTMENTS_TABLE),
+                **patient_appointments_query(user_id, start_date, end_date)
+            ))
         except ClientError as e:
             print(f"DynamoDB Error: {e}")
             return []
     else:
-        # In-memory: get appointment IDs from user and fetch appointments
-        user = users.get(user_id, {})
-        appointment_ids = user.get('appointments', [])
-        return [appointments[aid] for aid in appointment_ids if aid in appointments]
+        # Local: patient index
+        return [
+            appointment for appointment in store.patient_appointments(user_id)
+            if in_date_range(appointment, start_date, end_date)
+        ]
+
+def get_user_appointments_page(user_id, position=None, limit=APPOINTMENTS_PAGE_SIZE,
+                               start_date=None, end_date=None):
+    """One page of a user's appointments, with Limit pushed down to storage
+
+    position is where the previous page stopped (a DynamoDB
+    ExclusiveStartKey, or a booking sequence number locally).
+    Returns (appointments, next_position); next_position is None on the
+    last page.
+    """
+    if USE_AWS:
+        try:
+            kwargs = patient_appointments_query(user_id, start_date, end_date)
+            kwargs['Limit'] = limit
+            if position:
+                kwargs['ExclusiveStartKey'] = position
+            response = get_table(APPOINTMENTS_TABLE).query(**kwargs)
+            return response.get('Items', []), response.get('LastEvaluatedKey')
+        except ClientError as e:
+            print(f"DynamoDB Error: {e}")
+            return [], None
+    else:
+        return store.patient_appointments_page(
+            user_id, offset=position or 0, limit=limit,
+            predicate=lambda appointment: in_date_range(appointment, start_date, end_date)
+        )
+
+def get_doctor_schedule(doctor_name, start_date, end_date, position=None,
+                        limit=DOCTOR_SCHEDULE_PAGE_SIZE):
+    """One page of a doctor's appointments between two dates, in time order
+
+    position is where the previous page stopped (a DynamoDB
+    ExclusiveStartKey, or a (schedule_key, appointment_id) pair locally).
+    Returns (appointments, next_position); next_position is None on the
+    last page.
+    """
+    dkey = doctor_key(doctor_name)
+    if USE_AWS:
+        try:
+            kwargs = doctor_schedule_query(dkey, start_date, end_date, limit)
+            if position:
+                kwargs['ExclusiveStartKey'] = position
+            response = get_table(APPOINTMENTS_TABLE).query(**kwargs)
+            return response.get('Items', []), response.get('LastEvaluatedKey')
+        except ClientError as e:
+            print(f"DynamoDB Error: {e}")
+            return [], None
+    else:
+        return store.doctor_schedule(dkey, start_date, end_date, position, limit)
+
+def get_appointments_on(appointment_date):
+    """Every appointment on one date (reminder scheduler, statistics reconcile)
+
+    Errors are raised, not turned into an empty day, which both callers
+    would act on.
+    """
+    if USE_AWS:
+        return list(query_items(
+            get_table(APPOINTMENTS_TABLE),
+            **appointments_on_date_query(appointment_date, REMINDER_FIELDS)
+        ))
+    else:
+        return store.appointments_on(appointment_date)
 
 def create_appointment(appointment_data):
-    """Create appointment in DynamoDB or in-memory storage"""
+    """Create appointment in DynamoDB or local storage
+
+    Raises SlotUnavailable if the doctor's slot is already booked or is
+    outside their working hours.
+    """
+    # Keys for the doctor schedule index
+    with_schedule_keys(appointment_data)
+    dkey = appointment_data['doctor_key']
+    appointment_date = appointment_data['appointment_date']
+    appointment_time = appointment_data['appointment_time']
+    if not is_working_slot(working_hours.for_doctor(dkey), appointment_date, appointment_time):
+        raise SlotUnavailable("That time is outside the doctor's working hours")
+    # TTL: the row leaves the hot table APPOINTMENT_RETENTION_DAYS after its date
+    appointment_data.update(appointment_expiry(appointment_data))
+    
     if USE_AWS:
+        # Claim the slot and write the appointment in one transaction; the
+        # claim only succeeds if no one else holds that slot.
+        appointment_data['slot_id'] = slot_id(dkey, appointment_date, appointment_time)
         try:
-            appointments_table.put_item(Item=appointment_data)
-            return True
+            storage_guard.call(APPOINTMENTS_TABLE, 'transact_write_items',
+                               get_dynamodb().meta.client.transact_write_items, TransactItems=[
+                {'Put': {
+                    'TableName': SLOTS_TABLE,
+                    'Item': {
+                        'slot_id': appointment_data['slot_id'],
+                        'appointment_id': appointment_data['appointment_id'],
+                        'expires_at': appointment_data['expires_at'],
+                    },
+                    'ConditionExpression': 'attribute_not_exists(slot_id)',
+                }},
+                {'Put': {
+                    'TableName': APPOINTMENTS_TABLE,
+                    'Item': appointment_data,
+                    'ConditionExpression': 'attribute_not_exists(appointment_id)',
+                }},
+            # A retry after a timed-out attempt that did commit is a no-op, not a conflict
+            ], ClientRequestToken=appointment_data['appointment_id'])
         except ClientError as e:
+            reasons = e.response.get('CancellationReasons', [])
+            if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+                raise SlotUnavailable('That time slot is already booked')
             print(f"DynamoDB Error: {e}")
             return False
+        # Not in the transaction: every booking would contend for the clinic's counter item
+        count_appointment(appointment_data, {'booked': 1})
+        return True
     else:
-        appointment_id = appointment_data['appointment_id']
-        appointments[appointment_id] = appointment_data
-        # Add to user's appointment list
-        patient_id = appointment_data['patient_id']
-        if patient_id in users:
-            users[patient_id]['appointments'].append(appointment_id)
+        return store.create_appointment(appointment_data)
+
+def release_slot(appointment):
+    """Free an appointment's slot claim in DynamoDB, unless it has been claimed again"""
+    from boto3.dynamodb.conditions import Attr
+    claim = appointment.get('slot_id')
+    if not claim:
+        return
+    try:
+        get_table(SLOTS_TABLE).delete_item(
+            Key={'slot_id': claim},
+            ConditionExpression=Attr('appointment_id').eq(appointment['appointment_id'])
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            print(f"DynamoDB Error: {e}")
+    except resilience.StorageUnavailable as e:
+        # The claim's own TTL frees it later
+        print(f"DynamoDB Error: {e}")
+
+def soft_cancel_appointment(appointment_id):
+    """Mark an appointment cancelled and free its slot; the row stays until archived
+
+    The update is conditional, so cancelling twice (or a missing
+    appointment) returns False instead of writing again. Cancelling an
+    appointment that is already cancelled still frees its slot, in case
+    the first cancel was applied but its answer was lost.
+    """
+    fields = cancellation_fields()
+    if USE_AWS:
+        try:
+            response = get_table(APPOINTMENTS_TABLE).update_item(
+                Key={'appointment_id': appointment_id},
+                UpdateExpression='SET ' + ', '.join(f'#{name} = :{name}' for name in fields),
+                ConditionExpression='attribute_exists(appointment_id) AND #status <> :status',
+                ExpressionAttributeNames={f'#{name}': name for name in fields},
+                ExpressionAttributeValues={f':{name}': value for name, value in fields.items()},
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"DynamoDB Error: {e}")
+            elif e.response.get('Item', {}).get('status') == {'S': 'cancelled'}:
+                release_slot({'appointment_id': appointment_id,
+                              'slot_id': e.response['Item'].get('slot_id', {}).get('S')})
+            return False
+        release_slot(response['Attributes'])
+        count_appointment(response['Attributes'], {'cancelled': 1})
         return True
+    else:
+        return store.cancel_appointment(appointment_id, fields)
 
 def delete_appointment(appointment_id):
-    """Delete appointment from DynamoDB or in-memory storage"""
+    """Delete an appointment from DynamoDB or local storage for good (archival)
+
+    The appointment's counts stay: statistics outlive the hot table.
+    """
     if USE_AWS:
         try:
-            appointments_table.delete_item(Key={'appointment_id': appointment_id})
+            response = get_table(APPOINTMENTS_TABLE).delete_item(
+                Key={'appointment_id': appointment_id},
+                ReturnValues='ALL_OLD'
+            )
+        except (ClientError, resilience.StorageUnavailable) as e:
+            # The archiver counts it as undeleted and carries on
+            print(f"DynamoDB Error: {e}")
+            return False
+        old = response.get('Attributes', {})
+        # A cancelled appointment's slot was freed already
+        if old and old.get('status') != 'cancelled':
+            release_slot(old)
+        return True
+    else:
+        return store.delete_appointment(appointment_id)
+
+def get_appointments_expiring_on(expires_day):
+    """Every appointment whose TTL falls on a day (see archive.py)
+
+    Errors are raised, not turned into an empty day: the archiver would
+    otherwise checkpoint past rows it never read.
+    """
+    if USE_AWS:
+        return list(query_items(get_table(APPOINTMENTS_TABLE),
+                                **appointments_expiring_query(expires_day)))
+    else:
+        return store.appointments_expiring_on(expires_day)
+
+def add_appointment_stats(scope, day, counts):
+    """Add {counter: amount} to one scope's counters for a day (an ADD in DynamoDB)"""
+    if USE_AWS:
+        try:
+            get_table(STATS_TABLE).update_item(Key={'scope': scope, 'month': day[:7]},
+                                               **add_update(day, counts))
+            return True
+        except (ClientError, resilience.StorageUnavailable) as e:
+            print(f"DynamoDB Error: {e}")
+            return False
+    else:
+        return store.add_appointment_stats(scope, day, counts)
+
+def count_appointment(appointment, counts):
+    """Count a booking or cancellation for the doctor and the clinic (DynamoDB)
+
+    The appointment is already written, so a failure here is only logged;
+    `appointment_stats.py reconcile` corrects the drift.
+    """
+    for scope in appointment_scopes(appointment):
+        add_appointment_stats(scope, appointment['appointment_date'], counts)
+
+def get_appointment_stats(scope, start_date, end_date):
+    """{day: {'booked': n, 'cancelled': n}} of one scope's counters between two dates
+
+    In DynamoDB, one Query reading an item per month.
+    """
+    if USE_AWS:
+        days = {}
+        try:
+            for item in query_items(get_table(STATS_TABLE), **stats_query(scope, start_date, end_date)):
+                days.update(days_from_item(item, start_date, end_date))
+        except ClientError as e:
+            print(f"DynamoDB Error: {e}")
+            return {}
+        return days
+    return store.appointment_stats(scope, start_date, end_date)
+
+def get_appointment_stats_by_scope(start_date, end_date):
+    """{scope: {day: counts}} for the clinic and every doctor between two dates
+
+    In DynamoDB, one MonthIndex Query per month, reading an item per scope.
+    Errors are raised: missing counters would read as zeros to reconcile.
+    """
+    if USE_AWS:
+        stats = {}
+        for month in months_between(start_date, end_date):
+            for item in query_items(get_table(STATS_TABLE), **stats_month_query(month)):
+                days = days_from_item(item, start_date, end_date)
+                if days:
+                    stats.setdefault(item['scope'], {}).update(days)
+        return stats
+    return store.appointment_stats_by_scope(start_date, end_date)
+
+def get_free_slots(doctor_name, start_date, end_date):
+    """{date: [HH:MM, ...]} of a doctor's open slots between two dates"""
+    dkey = doctor_key(doctor_name)
+    hours = working_hours.for_doctor(dkey)
+    if USE_AWS:
+        # One range query on DoctorScheduleIndex builds the booked bitmaps
+        booked = AvailabilityIndex()
+        kwargs = doctor_schedule_query(dkey, start_date, end_date)
+        kwargs['ProjectionExpression'] = 'appointment_date, appointment_time, #status'
+        kwargs['ExpressionAttributeNames'] = {'#status': 'status'}
+        try:
+            for item in query_items(get_table(APPOINTMENTS_TABLE), **kwargs):
+                # Cancelled appointments stay in the index until archived
+                if item.get('status') != 'cancelled':
+                    booked.claim(dkey, item['appointment_date'], item['appointment_time'])
+        except ClientError as e:
+            print(f"DynamoDB Error: {e}")
+            return {}
+        return free_slots(hours, lambda day: booked.booked(dkey, day), start_date, end_date)
+    return free_slots(hours, lambda day: store.booked_slots(dkey, day), start_date, end_date)
+
+def create_medical_record(record):
+    """Save a medical record's metadata in DynamoDB or local storage"""
+    if USE_AWS:
+        try:
+            get_table(RECORDS_TABLE).put_item(Item=record)
             return True
         except ClientError as e:
             print(f"DynamoDB Error: {e}")
             return False
     else:
-        if appointment_id in appointments:
-            # Remove from user's appointment list
-            appointment = appointments[appointment_id]
-            patient_id = appointment.get('patient_id')
-            if patient_id in users:
-                users[patient_id]['appointments'].remove(appointment_id)
-            del appointments[appointment_id]
-        return True
+        return store.create_medical_record(record)
+
+def get_medical_record(record_id):
+    """Get a medical record's metadata by record_id"""
+    if USE_AWS:
+        try:
+            return get_table(RECORDS_TABLE).get_item(Key={'record_id': record_id}).get('Item')
+        except ClientError as e:
+            print(f"DynamoDB Error: {e}")
+            return None
+    else:
+        return store.get_medical_record(record_id)
+
+def get_patient_records(patient_id):
+    """All medical records for a patient, newest first"""
+    if USE_AWS:
+        try:
+            records = list(query_items(get_table(RECORDS_TABLE), **patient_records_query(patient_id)))
+        except ClientError as e:
+            print(f"DynamoDB Error: {e}")
+            return []
+    else:
+        records = store.patient_medical_records(patient_id)
+    return sorted(records, key=lambda record: record['uploaded_at'], reverse=True)
+
+def can_access_record(record):
+    """A record is visible to its patient and to admins"""
+    return record['patient_id'] == session.get('user_id') or is_admin()
+
+def s3_download(record):
+    """Stream a record out of S3 in chunks, passing any Range header through"""
+    try:
+        obj = blob_store.get(record['blob_key'], request.headers.get('Range'))
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'InvalidRange':
+            abort(416)
+        print(f"S3 Error: {e}")
+        abort(404)
+    headers = {
+        'Content-Length': str(obj['ContentLength']),
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{record["sha256"]}"',
+        'Content-Disposition': f'attachment; filename="{record["filename"]}"',
+    }
+    if obj.get('ContentRange'):
+        headers['Content-Range'] = obj['ContentRange']
+    return Response(
+        stream_with_context(obj['Body'].iter_chunks(CHUNK_SIZE)),
+        status=206 if obj.get('ContentRange') else 200,
+        mimetype=record['content_type'],
+        headers=headers,
+        direct_passthrough=True
+    )
 
 # -------------------------------------------------
 # DEMO DATA (for local development only)
@@ -158,7 +623,7 @@ def initialize_demo_data():
     demo_patient = {
         'user_id': patient_id,
         'email': 'patient@demo.com',
-        'password': 'password123',
+        'password': 'password123',  # plaintext demo password, hashed on first login
         'first_name': 'John',
         'last_name': 'Doe',
         'phone': '(555) 123-4567',
@@ -170,7 +635,7 @@ def initialize_demo_data():
         'appointments': [],
         'medical_history': []
     }
-    users[patient_id] = demo_patient
+    store.create_user(demo_patient)
     
     # Demo doctor
     doctor_id = generate_id()
@@ -189,18 +654,120 @@ def initialize_demo_data():
         'appointments': [],
         'patients': []
     }
-    users[doctor_id] = demo_doctor
+    store.create_user(demo_doctor)
 
 # Initialize demo data when the app starts (only for local mode)
 if not USE_AWS:
     initialize_demo_data()
 
+# -------------------------------------------------
+# VIEW HELPERS
+# Shared by the views below and their async versions in asgi_app.py
+# -------------------------------------------------
+def load_reads(reads):
+    """load_dashboard for {name: (helper, args)} reads"""
+    return load_dashboard({name: functools.partial(fn, *args) for name, (fn, args) in reads.items()})
+
+def plan_patient_dashboard():
+    """The patient dashboard's reads, as {name: (helper, args)}, and render(data) for the page"""
+    user_id, email = session['user_id'], session['user_email']
+    # Same scope as /appointments without a date range, so cursors carry over
+    scope = f"appointments:{user_id}:None:None"
+    position = cursors.decode(scope, request.args.get('cursor'))
+    limit = page_size(request.args.get('limit'))
+    
+    # Profile and one page of appointments, loaded concurrently
+    reads = {
+        'user': (get_session_user, (user_id, email)),
+        'appointments': (get_user_appointments_page, (user_id, position, limit)),
+    }
+    
+    def render(data):
+        if data.partial:
+            flash('Some of your dashboard could not be loaded right now. Please refresh.', 'warning')
+        user_appointments, next_position = data.get('appointments', ([], None))
+        return render_template('patient_dashboard.html', user=data.get('user'),
+                               appointments=user_appointments, partial=data.partial,
+                               next_cursor=cursors.encode(scope, next_position))
+    
+    return reads, render
+
+def plan_doctor_dashboard():
+    """The doctor dashboard's reads, as {name: (helper, args)}, and render(data) for the page"""
+    user_id, email = session['user_id'], session['user_email']
+    doctor_name = session['user_name']
+    
+    # Schedule for ?start=..&end=.. (default: the next DOCTOR_SCHEDULE_DAYS days),
+    # paginated with ?cursor=
+    today = date.today()
+    start_date = parse_date_arg('start', today.isoformat())
+    end_date = parse_date_arg(
+        'end', (date.fromisoformat(start_date) + timedelta(days=DOCTOR_SCHEDULE_DAYS - 1)).isoformat())
+    dkey = doctor_key(doctor_name)
+    scope = f"schedule:{dkey}:{start_date}:{end_date}"
+    position = cursors.decode(scope, request.args.get('cursor'))
+    limit = page_size(request.args.get('limit'), DOCTOR_SCHEDULE_PAGE_SIZE)
+    
+    # Counts for the range come from the statistics counters, not the schedule
+    reads = {
+        'user': (get_session_user, (user_id, email)),
+        'schedule': (get_doctor_schedule, (doctor_name, start_date, end_date, position, limit)),
+        'stats': (get_appointment_stats, (doctor_scope(dkey), start_date, end_date)),
+    }
+    
+    def render(data):
+        if data.partial:
+            flash('Some of your dashboard could not be loaded right now. Please refresh.', 'warning')
+        schedule, next_position = data.get('schedule', ([], None))
+        stats = data.get('stats', {})
+        return render_template('doctor_dashboard.html', user=data.get('user'), partial=data.partial,
+                               schedule=schedule, next_cursor=cursors.encode(scope, next_position),
+                               start_date=start_date, end_date=end_date, today=today.isoformat(),
+                               stats=stats, stats_total=summarize(stats))
+    
+    return reads, render
+
+def availability_args():
+    """(doctor, start_date, end_date) of an /availability request, at most MAX_AVAILABILITY_DAYS"""
+    doctor = request.args.get('doctor', '')
+    start_date = parse_date_arg('start', date.today().isoformat())
+    last_date = (date.fromisoformat(start_date) + timedelta(days=MAX_AVAILABILITY_DAYS - 1)).isoformat()
+    end_date = min(parse_date_arg('end', start_date), last_date)
+    return doctor, start_date, end_date
+
+def availability_response(doctor, start_date, end_date, free):
+    return jsonify({
+        'doctor': doctor,
+        'start': start_date,
+        'end': end_date,
+        'slot_minutes': SLOT_MINUTES,
+        'free': free,
+    })
+
+def search_args():
+    """(query, limit) of a /doctors/search request"""
+    return request.args.get('q', ''), request.args.get('limit', 10, type=int)
+
+def search_response(query, limit):
+    return jsonify({
+        'query': query,
+        'doctors': doctor_directory.search(query, limit),
+    })
+
+def end_session():
+    """Log the user out; returns the (subject, message) of the logout notification"""
+    user_email = session.get('user_email', 'Unknown')
+    session.clear()
+    flash('You have been logged out successfully', 'info')
+    return "User Logout", f"{user_email} logged out"
+
 # -------------------------------------------------
 # ROUTES
 # -------------------------------------------------
 
 # Home/Landing page
 @app.route('/')
+@page_cache.page
 def index():
     return render_template('index.html')
 
@@ -214,7 +781,18 @@ def login():
         # Get user from database
         user = get_user_by_email(email)
         
-        if user and user['password'] == password:
+        try:
+            # Hashing runs off the request thread (see passwords.py)
+            valid, new_hash = verify_password(user['password'] if user else None, password)
+        except PasswordHasherBusy:
+            flash('We are busy right now. Please try logging in again.', 'error')
+            return render_template('login.html'), 503
+        
+        if valid:
+            # Upgrade plaintext or outdated-cost hashes now that we know the password
+            if new_hash:
+                update_password(user, new_hash)
+            
             # Set session
             session.clear()
             session['user_id'] = user['user_id']
@@ -255,12 +833,18 @@ def signup():
             flash('Email already registered', 'error')
             return render_template('signup.html')
         
+        try:
+            password_hash = hash_password(password)
+        except PasswordHasherBusy:
+            flash('We are busy right now. Please try again.', 'error')
+            return render_template('signup.html'), 503
+        
         # Create new user
         user_id = generate_id()
         new_user = {
             'user_id': user_id,
             'email': email,
-            'password': password,  # In production, this should be hashed
+            'password': password_hash,
             'first_name': first_name,
             'last_name': last_name,
             'phone': phone,
@@ -302,16 +886,8 @@ def patient_dashboard():
     if not is_logged_in() or session.get('user_type') != 'patient':
         return redirect(url_for('login'))
     
-    # Get user data
-    if USE_AWS:
-        user = get_user_by_email(session['user_email'])
-    else:
-        user = users.get(session['user_id'])
-    
-    # Get user appointments
-    user_appointments = get_user_appointments(session['user_id'])
-    
-    return render_template('patient_dashboard.html', user=user, appointments=user_appointments)
+    reads, render = plan_patient_dashboard()
+    return render(load_reads(reads))
 
 # Doctor dashboard
 @app.route('/doctor_dashboard')
@@ -319,21 +895,18 @@ def doctor_dashboard():
     if not is_logged_in() or session.get('user_type') != 'doctor':
         return redirect(url_for('login'))
     
-    # Get user data
-    if USE_AWS:
-        user = get_user_by_email(session['user_email'])
-    else:
-        user = users.get(session['user_id'])
-    
-    return render_template('doctor_dashboard.html', user=user)
+    reads, render = plan_doctor_dashboard()
+    return render(load_reads(reads))
 
 # About page
 @app.route('/about')
+@page_cache.page
 def about():
     return render_template('about.html')
 
 # Contact page
 @app.route('/contact_us')
+@page_cache.page
 def contact_us():
     return render_template('contact.html')
 
@@ -384,22 +957,62 @@ def tickets():
             else:
                 flash('Failed to book appointment. Please try again.', 'error')
                 return redirect(url_for('booking'))
+        except SlotUnavailable as e:
+            flash(f'{e}. Please choose another time.', 'error')
+            return redirect(url_for('booking'))
+        except resilience.StorageUnavailable:
+            flash('Booking is temporarily unavailable. Please try again in a moment.', 'error')
+            return redirect(url_for('booking'))
         except Exception as e:
             flash(f'Error booking appointment: {str(e)}', 'error')
             return redirect(url_for('booking'))
     
     return render_template('tickets.html')
 
+# Free slots for a doctor (JSON, for the booking form)
+@app.route('/availability')
+def availability():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    
+    doctor, start_date, end_date = availability_args()
+    return availability_response(doctor, start_date, end_date,
+                                 get_free_slots(doctor, start_date, end_date) if doctor else {})
+
+# Doctor autocomplete by name or specialization (JSON, for the booking form)
+@app.route('/doctors/search')
+def search_doctors():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    
+    query, limit = search_args()
+    doctor_directory.ensure_fresh(get_doctors)
+    return search_response(query, limit)
+
 # View all appointments (for patients)
 @app.route('/appointments')
 def appointments():
     if not is_logged_in():
         return redirect(url_for('login'))
     
-    # Get user appointments
-    user_appointments = get_user_appointments(session['user_id'])
+    user_id = session['user_id']
+    # Optionally limited to ?start=YYYY-MM-DD&end=YYYY-MM-DD, paginated with ?cursor=&limit=
+    start_date = parse_date_arg('start', None)
+    end_date = parse_date_arg('end', None)
+    scope = f"appointments:{user_id}:{start_date}:{end_date}"
+    position = cursors.decode(scope, request.args.get('cursor'))
+    limit = page_size(request.args.get('limit'))
     
-    return render_template('appointments.html', appointments=user_appointments)
+    data = load_dashboard({
+        'appointments': lambda: get_user_appointments_page(
+            user_id, position, limit, start_date, end_date),
+    })
+    if data.partial:
+        flash('Your appointments could not be loaded right now. Please refresh.', 'warning')
+    user_appointments, next_position = data.get('appointments', ([], None))
+    
+    return render_template('appointments.html', appointments=user_appointments,
+                           partial=data.partial, next_cursor=cursors.encode(scope, next_position))
 
 # Cancel appointment
 @app.route('/appointments/cancel/<appointment_id>')
@@ -407,7 +1020,7 @@ def cancel_appointment(appointment_id):
     if not is_logged_in():
         return redirect(url_for('login'))
     
-    if delete_appointment(appointment_id):
+    if soft_cancel_appointment(appointment_id):
         send_notification(
             "Appointment Cancelled",
             f"{session['user_email']} cancelled appointment {appointment_id}"
@@ -418,15 +1031,157 @@ def cancel_appointment(appointment_id):
     
     return redirect(url_for('appointments'))
 
+# Medical records list (JSON, newest first)
+@app.route('/records')
+def medical_records():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    return jsonify({'records': get_patient_records(session['user_id'])})
+
+# Upload a medical record: a multipart form field "file", or the raw request
+# body sent with the file's own Content-Type and ?filename= (e.g. curl
+# --data-binary -H 'Content-Type: application/pdf'). Either way the body is
+# copied to the blob store in chunks. Only RECORD_CONTENT_TYPES are taken,
+# since the stored type is what downloads are served with.
+@app.route('/records/upload', methods=['POST'])
+def upload_medical_record():
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    
+    if request.mimetype == 'multipart/form-data':
+        # Werkzeug spools large form files to a temporary file, not memory
+        upload = request.files.get('file')
+        if upload is None or not upload.filename:
+            return jsonify({'error': 'Please choose a file to upload'}), 400
+        stream = upload.stream
+        filename = upload.filename
+        content_type = upload.mimetype
+        title = request.form.get('title', '')
+    else:
+        # Form-encoded or untyped bodies fail the allowlist below
+        stream = request.stream
+        filename = request.args.get('filename', '')
+        content_type = request.mimetype
+        title = request.args.get('title', '')
+    if content_type not in RECORD_CONTENT_TYPES:
+        return jsonify({'error': 'Unsupported file type; upload a PDF or an image',
+                        'allowed': sorted(RECORD_CONTENT_TYPES)}), 415
+    
+    patient_id = session['user_id']
+    record_id = generate_id()
+    filename = secure_filename(filename) or 'record'
+    record = {
+        'record_id': record_id,
+        'patient_id': patient_id,
+        'title': title or filename,
+        'filename': filename,
+        'content_type': content_type,
+        'blob_key': blob_key(patient_id, record_id),
+        'uploaded_by': session['user_email'],
+        'uploaded_at': datetime.now().isoformat(),
+    }
+    size, sha256 = blob_store.put(record['blob_key'], stream, content_type)
+    record.update(size=size, sha256=sha256)
+    
+    if size == 0 or not create_medical_record(record):
+        blob_store.delete(record['blob_key'])
+        return jsonify({'error': 'Empty file' if size == 0 else 'Upload failed'}), 400
+    
+    send_notification("Medical Record Uploaded", f"{session['user_email']} uploaded {filename}")
+    return jsonify(record), 201
+
+# Download a medical record (supports Range requests)
+@app.route('/records/<record_id>/download')
+def download_medical_record(record_id):
+    if not is_logged_in():
+        return redirect(url_for('login'))
+    
+    record = get_medical_record(record_id)
+    if record is None or not can_access_record(record):
+        abort(404)
+    
+    if not isinstance(blob_store, LocalBlobStore):
+        return s3_download(record)
+    # send_file hands the open file to the server's file wrapper (sendfile
+    # under gunicorn) and answers Range / If-None-Match itself
+    return send_file(
+        blob_store.path(record['blob_key']),
+        mimetype=record['content_type'],
+        as_attachment=True,
+        download_name=record['filename'],
+        conditional=True,
+        etag=record['sha256'],
+        max_age=0
+    )
+
+# Streaming JSONL export of a whole table (admins only)
+@app.route('/admin/export/<table_name>.jsonl')
+def export_table(table_name):
+    if not is_admin():
+        abort(403)
+    if table_name not in EXPORT_TABLES:
+        abort(404)
+    
+    if USE_AWS:
+        segments = min(max(request.args.get('segments', 4, type=int), 1), 16)
+        items = parallel_scan(get_table(EXPORT_TABLES[table_name][0]), segments)
+    else:
+        items = local_export(store, table_name)
+    lines = to_jsonl(count_rows(items, f"export {table_name}"))
+    
+    return Response(
+        stream_with_context(lines),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={table_name}.jsonl'}
+    )
+
+# Appointment counts for the clinic and per doctor (admins only)
+@app.route('/admin/stats')
+def admin_stats():
+    if not is_admin():
+        abort(403)
+    
+    # ?start=..&end=.. (default: this month so far), at most MAX_STATS_DAYS
+    today = date.today()
+    start_date = parse_date_arg('start', today.replace(day=1).isoformat())
+    last_date = (date.fromisoformat(start_date) + timedelta(days=MAX_STATS_DAYS - 1)).isoformat()
+    end_date = min(parse_date_arg('end', today.isoformat()), last_date)
+    
+    stats = get_appointment_stats_by_scope(start_date, end_date)
+    clinic = stats.pop(CLINIC, {})
+    return jsonify({
+        'start': start_date,
+        'end': end_date,
+        'total': summarize(clinic),
+        'days': clinic,
+        'doctors': {scope.split('#', 1)[1]: summarize(days) for scope, days in sorted(stats.items())},
+    })
+
 # Logout
 @app.route('/logout')
 def logout():
-    user_email = session.get('user_email', 'Unknown')
-    session.clear()
-    send_notification("User Logout", f"{user_email} logged out")
-    flash('You have been logged out successfully', 'info')
+    send_notification(*end_session())
     return redirect(url_for('index'))
 
+# -------------------------------------------------
+# STARTUP
+# -------------------------------------------------
+def warm_up():
+    """Compile templates, build AWS clients and open connections before the first request
+
+    Run by gunicorn.conf.py in each worker and by lambda_handler.py in each
+    container (see startup.py). Returns the seconds each step took.
+    """
+    if not USE_AWS:
+        return startup.warm_up(app, hasher=hasher)
+    return startup.warm_up(
+        app,
+        tables=[USERS_TABLE, APPOINTMENTS_TABLE, RECORDS_TABLE, SLOTS_TABLE, STATS_TABLE],
+        probe=(USERS_TABLE, {'email': 'warm-up@medtrack.invalid'}),
+        clients=([get_sns] if SNS_TOPIC_ARN else []) + ([get_s3] if RECORDS_BLOB_STORE == 's3' else []),
+        hasher=hasher
+    )
+
 # -------------------------------------------------
 # MAIN
 # -------------------------------------------------
@@ -439,12 +1194,24 @@ if __name__ == '__main__':
     print("=" * 50)
     print("🏥 MedTrack Healthcare Management System")
     print("=" * 50)
-    print(f"Mode: {'AWS (DynamoDB + SNS)' if USE_AWS else 'Local (In-Memory)'}")
+    print(f"Mode: {'AWS (DynamoDB + SNS)' if USE_AWS else f'Local ({type(store).__name__})'}")
     print(f"Region: {REGION}")
     print(f"Port: {port}")
     print(f"Debug: {debug}")
     print("=" * 50)
     
+    # Appointment reminders in a thread of this process (run reminders.py
+    # instead under gunicorn, so only one scheduler exists). With the debug
+    # reloader, only the serving child starts one.
+    if os.environ.get('REMINDERS_IN_PROCESS', 'false').lower() == 'true' and (
+            not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        from reminders import ReminderScheduler
+        reminder_scheduler = ReminderScheduler(get_appointments_on, notifier)
+        metrics.register_stats('reminders', reminder_scheduler.stats,
+                               ('pending', 'sent', 'retried', 'refreshes', 'day_queries',
+                                'failed_days'))
+        reminder_scheduler.start()
+    
     app.run(
         debug=debug,
         host='0.0.0.0',
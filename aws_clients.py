@@ -0,0 +1,124 @@
+"""
+Shared boto3 clients for MedTrack
+Clients are built lazily, once per process, so gunicorn workers forked
+from a preloaded app each get their own connection pool instead of
+inheriting the master's sockets. Pool size, timeouts, keep-alive and retry
+behaviour come from the environment. boto3 itself is only imported when
+the first client is built, so local mode and the Lambda handler's import
+never pay for it.
+"""
+
+import os
+import threading
+
+from metrics import instrument_client
+
+REGION = os.environ.get('AWS_REGION', 'us-east-1')
+
+# Connection management (botocore defaults: 10 connections, legacy retries, 60s timeouts)
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 50))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', 2))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', 5))
+AWS_TCP_KEEPALIVE = os.environ.get('AWS_TCP_KEEPALIVE', 'true').lower() == 'true'
+AWS_RETRY_MODE = os.environ.get('AWS_RETRY_MODE', 'standard')
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', 3))
+# DynamoDB calls are retried by the app's StorageGuard (see resilience.py),
+# within each request's deadline, rather than by botocore
+DYNAMODB_MAX_ATTEMPTS = int(os.environ.get('DYNAMODB_MAX_ATTEMPTS', 1))
+
+# Point at DynamoDB Local / SNS and S3 stand-ins for development and load tests
+DYNAMODB_ENDPOINT_URL = os.environ.get('DYNAMODB_ENDPOINT_URL') or None
+SNS_ENDPOINT_URL = os.environ.get('SNS_ENDPOINT_URL') or None
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+
+_lock = threading.RLock()
+_clients = {}
+_clients_pid = None
+# Applied to every Table get_table builds (e.g. StorageGuard.table)
+_table_wrapper = None
+
+
+def client_config(max_attempts=AWS_MAX_ATTEMPTS):
+    """botocore Config shared by every MedTrack client"""
+    from botocore.config import Config
+    return Config(
+        region_name=REGION,
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        tcp_keepalive=AWS_TCP_KEEPALIVE,
+        retries={'mode': AWS_RETRY_MODE, 'max_attempts': max_attempts},
+    )
+
+
+def reset():
+    """Forget every client (runs automatically in a child after fork)"""
+    global _clients_pid
+    _clients.clear()
+    _clients_pid = None
+
+
+def _get(name, factory):
+    """Build a client once per process; boto3 sessions aren't thread-safe to build from"""
+    global _clients_pid
+    client = _clients.get(name) if _clients_pid == os.getpid() else None
+    if client is not None:
+        return client
+    with _lock:
+        if _clients_pid != os.getpid():
+            _clients.clear()
+            _clients_pid = os.getpid()
+        if name not in _clients:
+            if 'session' not in _clients:
+                import boto3
+                _clients['session'] = boto3.session.Session(region_name=REGION)
+            _clients[name] = factory(_clients['session'])
+        return _clients[name]
+
+
+def _instrumented_resource(resource):
+    """Time calls made through a resource's underlying client (see metrics.py)"""
+    instrument_client(resource.meta.client)
+    return resource
+
+
+def get_dynamodb():
+    """The process-wide DynamoDB resource"""
+    return _get('dynamodb', lambda session: _instrumented_resource(session.resource(
+        'dynamodb', endpoint_url=DYNAMODB_ENDPOINT_URL,
+        config=client_config(DYNAMODB_MAX_ATTEMPTS))))
+
+
+def get_sns():
+    """The process-wide SNS client"""
+    return _get('sns', lambda session: instrument_client(session.client(
+        'sns', endpoint_url=SNS_ENDPOINT_URL, config=client_config())))
+
+
+def get_s3():
+    """The process-wide S3 client (medical record files)"""
+    return _get('s3', lambda session: instrument_client(session.client(
+        's3', endpoint_url=S3_ENDPOINT_URL, config=client_config())))
+
+
+def set_table_wrapper(wrapper):
+    """Pass every Table get_table returns through wrapper(table) from now on"""
+    global _table_wrapper
+    with _lock:
+        _table_wrapper = wrapper
+        for name in [name for name in _clients if name.startswith('table:')]:
+            del _clients[name]
+
+
+def _build_table(table_name):
+    table = get_dynamodb().Table(table_name)
+    return _table_wrapper(table) if _table_wrapper else table
+
+
+def get_table(table_name):
+    """A DynamoDB Table bound to the process-wide resource"""
+    return _get(f'table:{table_name}', lambda session: _build_table(table_name))
+
+
+# A forked child must never reuse the parent's sockets
+os.register_at_fork(after_in_child=reset)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+WSGI vs ASGI benchmark for MedTrack
+Serves the app both ways - aws_app:app on one threaded gunicorn worker,
+and asgi_app:application on one uvicorn worker - against a local store
+that sleeps before every call (LOCAL_STORE_LATENCY), so storage latency
+dominates as it does with DynamoDB. Each is then driven by a growing
+number of concurrent keep-alive connections, all logged in as one seeded
+patient and loading a route (the patient dashboard by default), and the
+throughput, latency and failures at each level are reported.
+
+    python benchmarks/bench_asgi.py --latency 0.02 --concurrency 10,100,1000
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import percentile
+
+# How long a server gets to start listening (seconds)
+STARTUP_TIMEOUT = 30
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed_database(db_path):
+    """Create the benchmark patient (and appointments) in a fresh SQLite store"""
+    os.environ['LOCAL_STORE'] = 'sqlite'
+    os.environ['LOCAL_DB_PATH'] = db_path
+    import aws_app
+    from bench_routes import seed
+    return seed(aws_app)
+
+
+def start_server(mode, port, threads, env):
+    if mode == 'wsgi':
+        target = 'aws_app:app'
+    else:
+        target = 'asgi_app:application'
+        env = dict(env, GUNICORN_WORKER_CLASS='uvicorn.workers.UvicornWorker')
+    # One worker, never recycled mid-run
+    command = [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--workers', '1',
+               '--max-requests', '0', '--threads', str(threads), '--bind', f'127.0.0.1:{port}',
+               target]
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"{mode} server didn't start (try it by hand: {' '.join(command)})")
+
+
+def login(port, email):
+    """The session cookie for a logged-in client"""
+    import requests
+    client = requests.Session()
+    response = client.post(f'http://127.0.0.1:{port}/login',
+                           data={'email': email, 'password': 'bench'}, allow_redirects=False)
+    if response.status_code != 302 or 'session' not in client.cookies:
+        raise RuntimeError(f"Login failed with {response.status_code}")
+    return f"session={client.cookies['session']}"
+
+
+async def fetch(reader, writer, request):
+    """Send one request on a keep-alive connection; returns the status code"""
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def drive(port, path, cookie, concurrency, seconds, timeout):
+    request = (f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n"
+               f"Cookie: {cookie}\r\n\r\n").encode()
+    latencies = []
+    failures = {'status': 0, 'error': 0}
+    deadline = time.perf_counter() + seconds
+
+    async def connection():
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection('127.0.0.1', port), timeout)
+                status = await asyncio.wait_for(fetch(reader, writer, request), timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                failures['error'] += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures['status'] += 1
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return latencies, failures, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='seconds added to every storage call')
+    parser.add_argument('--concurrency', default='10,100,1000',
+                        help='comma-separated numbers of concurrent connections')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per level')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads (WSGI)')
+    parser.add_argument('--path', default='/home1', help='route to load')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    args = parser.parse_args()
+    levels = [int(n) for n in args.concurrency.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='medtrack-bench-asgi-')
+    try:
+        ctx = seed_database(os.path.join(workdir, 'medtrack.db'))
+        env = dict(os.environ, LOCAL_STORE='sqlite', LOCAL_DB_PATH=os.environ['LOCAL_DB_PATH'],
+                   LOCAL_STORE_LATENCY=str(args.latency), RATE_LIMIT_ENABLED='false',
+                   PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'))
+
+        print(f"storage latency={args.latency * 1000:.0f}ms  route={args.path}  "
+              f"gunicorn threads={args.threads}  {args.duration:.0f}s per level")
+        print(f"{'mode':<6}{'conns':>7}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+              f"{'non-200':>9}{'errors':>8}")
+        for mode in args.modes.split(','):
+            port = free_port()
+            server = start_server(mode, port, args.threads, env)
+            try:
+                cookie = login(port, ctx['patient_email'])
+                for concurrency in levels:
+                    latencies, failures, elapsed = asyncio.run(drive(
+                        port, args.path, cookie, concurrency, args.duration, args.timeout))
+                    print(f"{mode:<6}{concurrency:>7}{len(latencies) / elapsed:>9.0f}"
+                          f"{percentile(latencies, 50) * 1000:>9.1f}"
+                          f"{percentile(latencies, 99) * 1000:>9.1f}"
+                          f"{(latencies[-1] if latencies else 0) * 1000:>9.1f}"
+                          f"{failures['status']:>9}{failures['error']:>8}")
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Doctor autocomplete microbenchmark
+Times DoctorDirectory.search for typical prefix queries as the number of
+doctors grows, compared with filtering every doctor on each keystroke,
+plus how long a full reload (the periodic reconciliation) takes
+
+Usage: python benchmarks/bench_doctor_search.py [--max-doctors 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from doctor_directory import DoctorDirectory, doctor_entry, tokenize
+
+SEARCHES = 5000
+
+FIRST_NAMES = ['Sarah', 'James', 'Priya', 'Ahmed', 'Maria', 'Chen', 'Olivia', 'Noah', 'Fatima',
+               'Lucas', 'Aisha', 'Mateo', 'Hannah', 'Ravi', 'Elena', 'Kwame', 'Yuki', 'Omar']
+LAST_NAMES = ['Johnson', 'Patel', 'Garcia', 'Nguyen', 'Okafor', 'Smith', 'Kim', 'Rossi',
+              'Haddad', 'Muller', 'Silva', 'Cohen', 'Tanaka', 'Khan', 'Novak', 'Mensah']
+SPECIALIZATIONS = ['Cardiology', 'Dermatology', 'Neurology', 'Pediatrics', 'Orthopedics',
+                   'Oncology', 'Psychiatry', 'Radiology', 'General Practice', 'Endocrinology']
+
+
+def make_doctors(count, rng):
+    return [{
+        'user_id': f'd{i}',
+        'first_name': rng.choice(FIRST_NAMES),
+        'last_name': f"{rng.choice(LAST_NAMES)}{i}",
+        'specialization': rng.choice(SPECIALIZATIONS),
+        'user_type': 'doctor',
+    } for i in range(count)]
+
+
+def make_queries(doctors, rng):
+    """Prefixes of one or two words, the way a user types them"""
+    queries = []
+    for _ in range(SEARCHES):
+        doctor = rng.choice(doctors)
+        words = [doctor['first_name'], doctor['last_name'], doctor['specialization']]
+        first = rng.choice(words)
+        query = first[:rng.randint(2, len(first))]
+        if rng.random() < 0.5:
+            second = rng.choice([w for w in words if w != first])
+            query += ' ' + second[:rng.randint(1, len(second))]
+        queries.append(query)
+    return queries
+
+
+def linear_search(entries, query, limit=10):
+    """Filter every doctor on each query, kept for comparison"""
+    terms = tokenize(query)
+    matches = []
+    for entry in entries:
+        tokens = tokenize(f"{entry['name']} {entry['specialization']}")
+        if all(any(token.startswith(term) for token in tokens) for term in terms):
+            matches.append(entry)
+            if len(matches) >= limit:
+                break
+    return sorted(matches, key=lambda entry: entry['name'].lower())
+
+
+def time_searches(search, queries):
+    """Average and p99 microseconds per search"""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return sum(timings) / len(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-doctors', type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'doctors':>10} {'reload (ms)':>12} {'avg (us)':>10} {'p99 (us)':>10} {'linear avg (us)':>16}")
+
+    size = 100
+    while size <= args.max_doctors:
+        doctors = make_doctors(size, rng)
+        directory = DoctorDirectory()
+        start = time.perf_counter()
+        directory.load(doctors)
+        reload_ms = (time.perf_counter() - start) * 1e3
+
+        queries = make_queries(doctors, rng)
+        avg, p99 = time_searches(directory.search, queries)
+        entries = [doctor_entry(doctor) for doctor in doctors]
+        linear_queries = queries[:max(10, SEARCHES * 100 // size)]
+        linear_avg, _ = time_searches(lambda q: linear_search(entries, q), linear_queries)
+        print(f"{size:>10} {reload_ms:>12.1f} {avg:>10.1f} {p99:>10.1f} {linear_avg:>16.1f}")
+        size *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Login lookup microbenchmark for the local (in-memory) store
+Shows get_user_by_email latency staying flat as the user count grows,
+compared with the old linear scan over users.values()
+
+Usage: python benchmarks/bench_local_login.py [--max-users 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_store import LocalStore
+
+LOOKUPS = 10000
+# The linear scan gets too slow to measure with LOOKUPS lookups past this size
+MAX_SCAN_USERS = 100000
+
+
+def linear_scan(users, email):
+    """The pre-index lookup, kept for comparison"""
+    for user in users.values():
+        if user['email'] == email:
+            return user
+    return None
+
+
+def time_lookups(lookup, emails):
+    """Average microseconds per lookup"""
+    start = time.perf_counter()
+    for email in emails:
+        lookup(email)
+    return (time.perf_counter() - start) / len(emails) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-users', type=int, default=1000000)
+    args = parser.parse_args()
+
+    store = LocalStore()
+    rng = random.Random(42)
+    print(f"{'users':>10} {'indexed (us)':>14} {'linear scan (us)':>18}")
+
+    size = 0
+    target = 10
+    while target <= args.max_users:
+        for i in range(size, target):
+            store.create_user({'user_id': f'u{i}', 'email': f'user{i}@example.com', 'password': 'x'})
+        size = target
+
+        emails = [f'user{rng.randrange(size)}@example.com' for _ in range(LOOKUPS)]
+        indexed = time_lookups(store.get_user_by_email, emails)
+        if size <= MAX_SCAN_USERS:
+            scan_emails = emails[:max(10, LOOKUPS * 10 // size)]
+            scan = f"{time_lookups(lambda e: linear_scan(store.users, e), scan_emails):18.2f}"
+        else:
+            scan = f"{'-':>18}"
+        print(f"{size:>10} {indexed:>14.3f} {scan}")
+        target *= 10
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Password hashing cost benchmark
+For each hash method/cost, measures how many login checks one core can do
+(verify on the calling thread) and the throughput of the process pool
+login actually uses, with many request threads submitting at once. Pick a
+PASSWORD_HASH_METHOD whose per-core rate still covers peak logins.
+
+Usage: python benchmarks/bench_password_hashing.py [--workers 4] [--duration 3]
+           [--methods scrypt:16384:8:1,scrypt:32768:8:1]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher, _hash, _verify
+
+DEFAULT_METHODS = (
+    'pbkdf2:sha256:100000',
+    'pbkdf2:sha256:600000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+    'scrypt:65536:8:1',
+)
+PASSWORD = 'correct horse battery staple'
+
+
+def single_core(stored, method, duration):
+    """Checks per second on the calling thread"""
+    count = 0
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        _verify(stored, PASSWORD, method)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def pooled(stored, method, workers, concurrency, duration):
+    """Checks per second through a PasswordHasher pool fed by many threads"""
+    hasher = PasswordHasher(method=method, workers=workers, queue_size=concurrency, timeout=60)
+    hasher.verify(stored, PASSWORD)  # start the pool processes before timing
+    counts = []
+    deadline = time.perf_counter() + duration
+
+    def client():
+        count = 0
+        while time.perf_counter() < deadline:
+            hasher.verify(stored, PASSWORD)
+            count += 1
+        counts.append(count)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+    return sum(counts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark password hash costs')
+    parser.add_argument('--methods', default=','.join(DEFAULT_METHODS))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='pool processes (PASSWORD_HASH_WORKERS)')
+    parser.add_argument('--concurrency', type=int, default=16, help='request threads')
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per measurement')
+    args = parser.parse_args()
+
+    print(f"pool workers={args.workers}  request threads={args.concurrency}")
+    print(f"{'method':<24}{'ms/login':>10}{'logins/s/core':>15}"
+          f"{'pool logins/s':>15}{'per worker':>12}")
+    for method in args.methods.split(','):
+        method = method.strip()
+        stored = _hash(PASSWORD, method)
+        per_core = single_core(stored, method, args.duration)
+        pool_rate = pooled(stored, method, args.workers, args.concurrency, args.duration)
+        print(f"{method:<24}{1000 / per_core:>10.1f}{per_core:>15.1f}"
+              f"{pool_rate:>15.1f}{pool_rate / args.workers:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
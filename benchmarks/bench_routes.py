@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Per-route benchmark for MedTrack
+Drives the app in-process through Flask test clients, one logged-in client
+per thread, and reports throughput and p50/p95/p99 latency for each route:
+login, signup, booking (/tickets), both dashboards, appointment listing and
+cancel. Results can be written as JSON and compared against a stored
+baseline; a regression beyond --tolerance makes the script exit non-zero.
+
+Local mode (in-memory store):
+
+    python benchmarks/bench_routes.py --json results.json
+
+AWS mode against a local stand-in (DynamoDB Local, moto_server, LocalStack).
+Tables and an SNS topic are created on the endpoint if missing:
+
+    python benchmarks/bench_routes.py --aws --endpoint-url http://localhost:8000
+
+Compare with a baseline:
+
+    python benchmarks/bench_routes.py --json new.json --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from load_test import percentile
+
+# Seeded appointments per run, so dashboards and listings have data to page through
+SEED_APPOINTMENTS = 50
+
+# Keeps doctors and emails apart from earlier runs against the same tables
+RUN_ID = uuid.uuid4().hex[:8]
+
+_unique = itertools.count()
+
+
+def weekdays(count):
+    """The first count Monday-Friday dates starting two weeks from today"""
+    days = []
+    day = date.today() + timedelta(days=14)
+    while len(days) < count:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+def slot_time(n):
+    """The n-th half-hour slot of a 09:00-17:00 day"""
+    return f"{9 + n % 16 // 2:02d}:{n % 2 * 30:02d}"
+
+
+def next_slot():
+    """A (doctor, date, time) no other booking in this run will use"""
+    n = next(_unique)
+    return f"Dr. Bench {RUN_ID} {n // 16}", weekdays(1)[0], slot_time(n)
+
+
+def booking_form():
+    doctor, day, time_str = next_slot()
+    return {'doctor': doctor, 'date': day, 'time': time_str, 'reason': 'benchmark'}
+
+
+# -------------------------------------------------
+# SCENARIOS
+# Each scenario has an optional untimed prepare(ctx, client) and a timed
+# run(ctx, client, prepared) returning the response, plus the status code
+# a successful request answers with.
+# -------------------------------------------------
+def run_login(ctx, client, _):
+    return client.post('/login', data={'email': ctx['patient_email'], 'password': 'bench'})
+
+
+def run_signup(ctx, client, _):
+    return client.post('/signup', data={
+        'user_type': 'patient', 'email': f"signup-{uuid.uuid4().hex}@bench.example",
+        'password': 'bench', 'first_name': 'Signup', 'last_name': 'Bench', 'phone': '',
+    })
+
+
+def run_book(ctx, client, _):
+    return client.post('/tickets', data=booking_form())
+
+
+def run_patient_dashboard(ctx, client, _):
+    return client.get('/home1')
+
+
+def run_doctor_dashboard(ctx, client, _):
+    return client.get(f"/doctor_dashboard?start={ctx['seed_start']}&end={ctx['seed_end']}")
+
+
+def run_appointments(ctx, client, _):
+    return client.get('/appointments')
+
+
+def prepare_cancel(ctx, client):
+    """Book an appointment to cancel; returns its id"""
+    appointment_id = ctx['app'].generate_id()
+    form = booking_form()
+    ctx['app'].create_appointment({
+        'appointment_id': appointment_id, 'patient_id': ctx['patient_id'],
+        'patient_name': 'Bench Patient', 'patient_email': ctx['patient_email'],
+        'doctor_name': form['doctor'], 'appointment_date': form['date'],
+        'appointment_time': form['time'], 'reason': 'benchmark', 'status': 'scheduled',
+        'created_at': datetime.now().isoformat(),
+    })
+    return appointment_id
+
+
+def run_cancel(ctx, client, appointment_id):
+    return client.get(f"/appointments/cancel/{appointment_id}")
+
+
+SCENARIOS = {
+    # name: (login as, prepare, run, expected status)
+    'login': (None, None, run_login, 302),
+    'signup': (None, None, run_signup, 302),
+    'book': ('patient', None, run_book, 200),
+    'patient_dashboard': ('patient', None, run_patient_dashboard, 200),
+    'doctor_dashboard': ('doctor', None, run_doctor_dashboard, 200),
+    'appointments': ('patient', None, run_appointments, 200),
+    'cancel': ('patient', prepare_cancel, run_cancel, 302),
+}
+
+
+# -------------------------------------------------
+# SETUP
+# -------------------------------------------------
+def configure_aws(endpoint_url):
+    """Point the app at a local stand-in and create its tables and topic"""
+    os.environ['USE_AWS'] = 'true'
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    os.environ['DYNAMODB_ENDPOINT_URL'] = endpoint_url
+    os.environ.setdefault('SNS_ENDPOINT_URL', endpoint_url)
+
+    import boto3
+    from create_dynamodb_tables import provision
+    provision(boto3.client('dynamodb', region_name=os.environ.get('AWS_REGION', 'us-east-1'),
+                           endpoint_url=endpoint_url))
+
+    from aws_clients import get_sns
+    topic = get_sns().create_topic(Name='MedTrack-Bench')
+    os.environ['SNS_TOPIC_ARN'] = topic['TopicArn']
+
+
+def seed(app):
+    """Create the patient and doctor used by every run, plus some appointments"""
+    ctx = {'app': app, 'patient_id': app.generate_id(),
+           'patient_email': f"patient-{RUN_ID}@bench.example",
+           'doctor_email': f"doctor-{RUN_ID}@bench.example",
+           'doctor_name': f"Bench Doctor{RUN_ID}"}
+    for user_type, user_id, email, last_name in (
+            ('patient', ctx['patient_id'], ctx['patient_email'], 'Patient'),
+            ('doctor', app.generate_id(), ctx['doctor_email'], f"Doctor{RUN_ID}")):
+        app.create_user({
+            'user_id': user_id, 'email': email, 'password': 'bench', 'first_name': 'Bench',
+            'last_name': last_name, 'phone': '', 'user_type': user_type,
+            'created_at': datetime.now().isoformat(),
+        })
+
+    days = weekdays(5)
+    ctx['seed_start'], ctx['seed_end'] = days[0], days[-1]
+    for n in range(SEED_APPOINTMENTS):
+        app.create_appointment({
+            'appointment_id': app.generate_id(), 'patient_id': ctx['patient_id'],
+            'patient_name': 'Bench Patient', 'patient_email': ctx['patient_email'],
+            'doctor_name': ctx['doctor_name'], 'appointment_date': days[n // 16 % 5],
+            'appointment_time': slot_time(n),
+            'reason': 'seed', 'status': 'scheduled', 'created_at': datetime.now().isoformat(),
+        })
+    return ctx
+
+
+def logged_in_client(ctx, role):
+    client = ctx['app'].app.test_client()
+    if role:
+        client.post('/login', data={'email': ctx[f'{role}_email'], 'password': 'bench'})
+    return client
+
+
+# -------------------------------------------------
+# RUNNING
+# -------------------------------------------------
+def run_scenario(ctx, name, concurrency, requests_per_thread, warmup):
+    role, prepare, run, expected = SCENARIOS[name]
+    latencies, errors, lock = [], [], threading.Lock()
+    barrier = threading.Barrier(concurrency)
+
+    def worker():
+        client = logged_in_client(ctx, role)
+        for _ in range(warmup):
+            run(ctx, client, prepare(ctx, client) if prepare else None)
+        local_latencies, local_errors = [], 0
+        barrier.wait()
+        for _ in range(requests_per_thread):
+            prepared = prepare(ctx, client) if prepare else None
+            start = time.perf_counter()
+            response = run(ctx, client, prepared)
+            local_latencies.append(time.perf_counter() - start)
+            local_errors += response.status_code != expected
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    # Throughput from summed request time, so untimed prepare steps don't count
+    busy = sum(latencies) / concurrency
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors),
+        'throughput': len(latencies) / busy if busy else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -------------------------------------------------
+# BASELINE COMPARISON
+# -------------------------------------------------
+def compare(results, baseline, tolerance):
+    """Print per-route changes against a baseline; returns the regressed routes
+
+    A route regresses if its p95 grows, or its throughput falls, by more
+    than tolerance (a fraction).
+    """
+    regressed = []
+    print(f"\n{'route':<20}{'p95 ms':>18}{'change':>9}{'req/s':>20}{'change':>9}")
+    for name, current in results['routes'].items():
+        old = baseline.get('routes', {}).get(name)
+        if not old:
+            print(f"{name:<20}  (not in baseline)")
+            continue
+        p95_change = current['p95_ms'] / old['p95_ms'] - 1 if old['p95_ms'] else 0.0
+        rate_change = current['throughput'] / old['throughput'] - 1 if old['throughput'] else 0.0
+        flag = p95_change > tolerance or rate_change < -tolerance
+        if flag:
+            regressed.append(name)
+        print(f"{name:<20}{old['p95_ms']:>8.2f} -> {current['p95_ms']:<7.2f}{p95_change:>+8.0%}"
+              f"{old['throughput']:>9.0f} -> {current['throughput']:<7.0f}{rate_change:>+8.0%}"
+              f"{'  REGRESSION' if flag else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every MedTrack route')
+    parser.add_argument('--aws', action='store_true', help='USE_AWS=true against --endpoint-url')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000',
+                        help='DynamoDB/SNS stand-in for --aws')
+    parser.add_argument('--routes', default=','.join(SCENARIOS),
+                        help='comma-separated subset of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help='timed requests per thread')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per thread')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed p95/throughput change before failing (fraction)')
+    args = parser.parse_args()
+
+    routes = [name.strip() for name in args.routes.split(',') if name.strip()]
+    unknown = set(routes) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    if args.aws:
+        configure_aws(args.endpoint_url)
+    import aws_app
+    ctx = seed(aws_app)
+
+    results = {
+        'meta': {
+            'mode': 'aws' if args.aws else 'local',
+            'endpoint_url': args.endpoint_url if args.aws else None,
+            'concurrency': args.concurrency,
+            'requests_per_thread': args.requests,
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+        },
+        'routes': {},
+    }
+    print(f"mode={results['meta']['mode']}  concurrency={args.concurrency}  "
+          f"requests/thread={args.requests}")
+    print(f"{'route':<20}{'requests':>9}{'errors':>8}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name in routes:
+        stats = run_scenario(ctx, name, args.concurrency, args.requests, args.warmup)
+        results['routes'][name] = stats
+        print(f"{name:<20}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput']:>9.0f}"
+              f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+    aws_app.notifier.flush()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    failed = any(stats['errors'] for stats in results['routes'].values())
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+        if regressed:
+            print(f"\nRegressed beyond {args.tolerance:.0%}: {', '.join(regressed)}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
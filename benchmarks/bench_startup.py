@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for MedTrack
+Starts fresh Python processes that import the app - as the WSGI app
+(aws_app) or through the Lambda handler - and time each stage up to the
+first response: interpreter start, import, warm_up(), the first login
+(the form, then the POST) and a second, warm one for comparison. Each
+configuration runs with and without warm-up; medians over --runs
+processes are reported. The Lambda handler warms up while it is imported.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --aws --endpoint-url http://localhost:8000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# A cheap hash, so the login measures startup costs rather than the KDF
+PASSWORD_METHOD = 'pbkdf2:sha256:1000'
+PASSWORD = 'bench'
+
+STAGES = ('interpreter', 'import', 'warm_up', 'first', 'second', 'total')
+
+
+def http_api_event(method, path, body=''):
+    """An API Gateway HTTP API (payload 2.0) event"""
+    return {
+        'version': '2.0',
+        'rawPath': path,
+        'rawQueryString': '',
+        'headers': {'host': 'bench.example', 'content-type': 'application/x-www-form-urlencoded'},
+        'requestContext': {'http': {'method': method, 'sourceIp': '127.0.0.1'}, 'stage': '$default'},
+        'body': body,
+        'isBase64Encoded': False,
+    }
+
+
+def child(mode, email, password_hash):
+    """Runs in the fresh process; writes its timings to stderr as JSON"""
+    started_at = time.time()
+    start = time.perf_counter()
+    if mode == 'lambda':
+        import lambda_handler
+        aws_app = lambda_handler.aws_app
+    else:
+        import aws_app
+    import startup
+    imported = time.perf_counter()
+    if mode == 'wsgi' and startup.WARM_UP:
+        aws_app.warm_up()
+    warmed = time.perf_counter()
+
+    if not aws_app.USE_AWS:
+        aws_app.store.create_user({'user_id': 'bench', 'email': email, 'password': password_hash,
+                                   'first_name': 'Bench', 'last_name': 'Patient',
+                                   'user_type': 'patient'})
+    if mode == 'lambda':
+        def login():
+            lambda_handler.handler(http_api_event('GET', '/login'), None)
+            return lambda_handler.handler(http_api_event(
+                'POST', '/login', f'email={email}&password={PASSWORD}'), None)['statusCode']
+    else:
+        client = aws_app.app.test_client()
+
+        def login():
+            client.get('/login')
+            return client.post('/login', data={'email': email, 'password': PASSWORD}).status_code
+
+    timings = {'started_at': started_at, 'import': imported - start, 'warm_up': warmed - imported}
+    for name in ('first', 'second'):
+        request_start = time.perf_counter()
+        status = login()
+        timings[name] = time.perf_counter() - request_start
+        if status != 302:
+            raise RuntimeError(f"Login answered {status}")
+    timings['finished_at'] = time.time()
+    # stdout also carries the app's logged notifications
+    sys.stderr.write(json.dumps(timings) + '\n')
+
+
+def run_child(mode, warm_up, env, email, password_hash):
+    env = dict(env, WARM_UP='true' if warm_up else 'false')
+    spawned_at = time.time()
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, email, password_hash],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True).stderr
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['interpreter'] = timings['started_at'] - spawned_at
+    # Import to first response, as a caller waiting on a new process sees it
+    timings['total'] = timings['import'] + timings['warm_up'] + timings['first']
+    return timings
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(*sys.argv[2:5])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='processes per configuration')
+    parser.add_argument('--modes', default='wsgi,lambda')
+    parser.add_argument('--aws', action='store_true', help='use DynamoDB at --endpoint-url')
+    parser.add_argument('--endpoint-url', default='http://localhost:8000',
+                        help='DynamoDB stand-in (DynamoDB Local, moto_server)')
+    args = parser.parse_args()
+
+    from werkzeug.security import generate_password_hash
+    password_hash = generate_password_hash(PASSWORD, method=PASSWORD_METHOD)
+    email = f'startup-{os.getpid()}@bench.example'
+    env = dict(os.environ, PASSWORD_HASH_METHOD=PASSWORD_METHOD, RATE_LIMIT_ENABLED='false',
+               RECORDS_BLOB_STORE='local')
+    if args.aws:
+        from bench_routes import configure_aws
+        configure_aws(args.endpoint_url)
+        import aws_app
+        aws_app.create_user({'user_id': aws_app.generate_id(), 'email': email,
+                             'password': password_hash, 'first_name': 'Bench',
+                             'last_name': 'Patient', 'user_type': 'patient'})
+        env.update({name: os.environ[name] for name in (
+            'USE_AWS', 'AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'DYNAMODB_ENDPOINT_URL',
+            'SNS_ENDPOINT_URL', 'SNS_TOPIC_ARN')})
+    else:
+        env.update(USE_AWS='false', LOCAL_STORE='memory')
+
+    print(f"{'AWS at ' + args.endpoint_url if args.aws else 'local (memory)'}, "
+          f"median of {args.runs} processes, milliseconds")
+    print(f"{'mode':<8}{'warm-up':<9}" + ''.join(f"{stage:>13}" for stage in STAGES))
+    for mode in args.modes.split(','):
+        for warm_up in (False, True):
+            runs = [run_child(mode, warm_up, env, email, password_hash) for _ in range(args.runs)]
+            print(f"{mode:<8}{'yes' if warm_up else 'no':<9}" + ''.join(
+                f"{statistics.median(run[stage] for run in runs) * 1000:>13.1f}" for stage in STAGES))
+
+
+if __name__ == '__main__':
+    main()
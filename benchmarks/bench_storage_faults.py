@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Storage fault drill for MedTrack
+Runs the app's DynamoDB helpers from several threads against a local
+stand-in (DynamoDB Local, moto_server) while a FaultInjector makes it
+misbehave, one phase at a time: healthy, throttled, flaky and slow, a
+full outage, and recovery. Each phase reports how many calls succeeded,
+were answered from recent reads (degraded mode), or were refused with
+StorageUnavailable, their latency, and what the retry layer and circuit
+breakers did.
+
+    python benchmarks/bench_storage_faults.py --endpoint-url http://localhost:8000
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_routes import configure_aws
+from load_test import percentile
+
+# (name, FaultInjector options, seconds)
+PHASES = [
+    ('healthy', {}, 3),
+    ('throttled 30%', {'throttle': 0.3}, 5),
+    ('5% errors, +20ms', {'error': 0.05, 'latency': 0.02}, 5),
+    ('outage', {'outage': True}, 8),
+    ('recovered', {}, 8),
+]
+
+# Distinct keys each thread cycles through; reads of these are cached for degraded mode
+KEYS_PER_THREAD = 20
+
+
+def run_phase(app, resilience, seconds, threads, write_ratio):
+    counts = {'ok': 0, 'stale': 0, 'unavailable': 0, 'error': 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(n):
+        local = {key: 0 for key in counts}
+        local_latencies = []
+        i = 0
+        while time.perf_counter() < deadline:
+            record_id = f"drill-{n}-{i % KEYS_PER_THREAD}"
+            before = app.storage_guard.stale_reads
+            start = time.perf_counter()
+            try:
+                if i % 100 < write_ratio * 100:
+                    app.create_medical_record({'record_id': record_id, 'patient_id': f"drill-{n}",
+                                               'uploaded_at': datetime.now().isoformat()})
+                else:
+                    app.get_medical_record(record_id)
+                    app.get_patient_records(f"drill-{n}")
+                local['stale' if app.storage_guard.stale_reads > before else 'ok'] += 1
+            except resilience.StorageUnavailable:
+                local['unavailable'] += 1
+            except Exception:
+                local['error'] += 1
+            local_latencies.append(time.perf_counter() - start)
+            i += 1
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+            latencies.extend(local_latencies)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    latencies.sort()
+    return counts, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--endpoint-url', default='http://localhost:8000',
+                        help='DynamoDB stand-in (DynamoDB Local, moto_server)')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--write-ratio', type=float, default=0.2,
+                        help='fraction of operations that write')
+    parser.add_argument('--speed', type=float, default=1.0, help='scale every phase duration')
+    args = parser.parse_args()
+
+    configure_aws(args.endpoint_url)
+    import aws_app
+    import resilience
+    from dynamodb_faults import FaultInjector
+
+    guard = aws_app.storage_guard
+    print(f"threads={args.threads}  write ratio={args.write_ratio:.0%}")
+    print(f"{'phase':<20}{'ok':>7}{'stale':>7}{'503':>7}{'error':>7}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'retries':>9}{'short':>7}  breakers")
+    for name, options, seconds in PHASES:
+        guard.faults = FaultInjector(**options) if options else None
+        before = guard.stats()
+        counts, latencies = run_phase(aws_app, resilience, seconds * args.speed, args.threads,
+                                      args.write_ratio)
+        after = guard.stats()
+        breakers = ', '.join(f"{table.split('_')[-1]}={state}"
+                             for table, state in sorted(guard.breaker_states().items()))
+        print(f"{name:<20}{counts['ok']:>7}{counts['stale']:>7}{counts['unavailable']:>7}"
+              f"{counts['error']:>7}{percentile(latencies, 50) * 1000:>9.2f}"
+              f"{percentile(latencies, 99) * 1000:>9.2f}"
+              f"{after['retries'] - before['retries']:>9}"
+              f"{after['short_circuits'] - before['short_circuits']:>7}  {breakers}")
+    aws_app.notifier.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Closed-loop HTTP load test for a running MedTrack server
+Each client thread keeps one keep-alive session and requests the same path
+back to back, then throughput and latency percentiles are printed.
+
+Compare gunicorn profiles against the same DynamoDB endpoint, e.g.:
+
+    gunicorn -w 2 --bind 0.0.0.0:8000 aws_app:app               # sync workers
+    GUNICORN_WORKERS=2 PORT=8000 gunicorn -c gunicorn.conf.py aws_app:app
+    python benchmarks/load_test.py --url http://localhost:8000 --path /home1 \\
+        --login patient@demo.com:password123 --concurrency 32
+"""
+
+import argparse
+import threading
+import time
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_client(args, deadline, latencies, errors, lock):
+    session = requests.Session()
+    if args.login:
+        email, password = args.login.split(':', 1)
+        session.post(f"{args.url}/login", data={'email': email, 'password': password},
+                     allow_redirects=False)
+    local_latencies = []
+    local_errors = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            response = session.get(f"{args.url}{args.path}", allow_redirects=False)
+            if response.status_code >= 400:
+                local_errors += 1
+        except requests.RequestException:
+            local_errors += 1
+        local_latencies.append(time.perf_counter() - start)
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load test for MedTrack')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--login', help='email:password to log in with first')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=run_client, args=(args, deadline, latencies, errors, lock))
+        for _ in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{args.url}{args.path}  concurrency={args.concurrency}")
+    print(f"requests: {len(latencies)}  errors: {sum(errors)}  "
+          f"throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency ms  p50: {percentile(latencies, 50) * 1000:.1f}  "
+          f"p95: {percentile(latencies, 95) * 1000:.1f}  "
+          f"p99: {percentile(latencies, 99) * 1000:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Concurrency check for slot booking
+Many logged-in clients POST /tickets for the same doctor, date and time
+at the same instant; exactly one booking may succeed. Runs in-process
+against the local store, or against DynamoDB when USE_AWS=true (point
+DYNAMODB_ENDPOINT_URL at DynamoDB Local for a local run).
+
+Usage: python benchmarks/stress_slot_booking.py [--threads 64] [--rounds 20]
+Exits non-zero if any slot was double-booked.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import uuid
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aws_app
+from availability import slot_time
+
+
+def next_weekday():
+    """A future Monday-Friday date inside the default working hours"""
+    day = date.today() + timedelta(days=7)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day.isoformat()
+
+
+def book(client, barrier, form, results):
+    barrier.wait()
+    response = client.post('/tickets', data=form)
+    # A successful booking renders tickets.html; a rejected one redirects back
+    results.append(response.status_code == 200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hammer one slot from many threads')
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    # One logged-in client per thread
+    clients = []
+    for i in range(args.threads):
+        email = f"stress-{uuid.uuid4().hex[:8]}@example.com"
+        aws_app.create_user({
+            'user_id': aws_app.generate_id(), 'email': email, 'password': 'x',
+            'first_name': 'Stress', 'last_name': str(i), 'phone': '', 'user_type': 'patient',
+        })
+        client = aws_app.app.test_client()
+        client.post('/login', data={'email': email, 'password': 'x'})
+        clients.append(client)
+
+    day = next_weekday()
+    doctor = f"Dr. Stress {uuid.uuid4().hex[:6]}"
+    failures = 0
+    for round_no in range(args.rounds):
+        form = {
+            'doctor': doctor,
+            'date': day,
+            'time': slot_time(18 + round_no % 16),  # 09:00 onwards
+            'reason': 'stress test',
+        }
+        barrier = threading.Barrier(args.threads)
+        results = []
+        threads = [threading.Thread(target=book, args=(client, barrier, form, results))
+                   for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        booked = sum(results)
+        status = 'ok' if booked == 1 else 'DOUBLE-BOOKED' if booked > 1 else 'NONE BOOKED'
+        print(f"round {round_no + 1:3d}  {form['time']}  successes: {booked}/{args.threads}  {status}")
+        failures += booked != 1
+        if (round_no + 1) % 16 == 0:
+            day = (date.fromisoformat(day) + timedelta(days=7)).isoformat()
+
+    print(f"\n{args.rounds - failures}/{args.rounds} rounds booked exactly once")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
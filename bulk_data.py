@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Bulk import/export for MedTrack tables
+Everything streams: imports read CSV/JSONL a row at a time into DynamoDB
+batch writes, and exports run a parallel Scan whose segments feed a
+bounded queue that is written out as JSONL as it arrives. Memory use stays
+flat whatever the table size.
+
+Imported appointments get what booking one through the app writes: the
+schedule keys, a TTL, and a claim in the slots table for every one that
+isn't cancelled. Batch writes can't be conditional, so a claim overwrites
+any other claim on its slot. The appointment counters aren't touched;
+the import ends by printing the appointment_stats.py reconcile that
+brings them up to date.
+
+Usage:
+    python bulk_data.py import users users.csv
+    python bulk_data.py import appointments appointments.jsonl
+    python bulk_data.py export appointments appointments.jsonl --segments 8
+    python bulk_data.py export users - > users.jsonl
+
+Add --endpoint-url http://localhost:8000 to target DynamoDB Local.
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from decimal import Decimal
+
+from availability import slot_id
+from schedule import with_schedule_keys
+
+# Logical name -> (table name, primary key)
+TABLES = {
+    'users': (os.environ.get('USERS_TABLE', 'MedTrack_Users'), 'email'),
+    'appointments': (os.environ.get('APPOINTMENTS_TABLE', 'MedTrack_Appointments'), 'appointment_id'),
+    'records': (os.environ.get('RECORDS_TABLE', 'MedTrack_MedicalRecords'), 'record_id'),
+}
+# Slot claims written alongside imported appointments
+SLOTS_TABLE = os.environ.get('SLOTS_TABLE', 'MedTrack_Slots')
+
+# Print progress every this many rows
+PROGRESS_EVERY = 10000
+
+_DONE = object()
+
+
+# -------------------------------------------------
+# READING AND WRITING FILES
+# -------------------------------------------------
+def read_records(path):
+    """Yield dicts from a .csv or .jsonl file ('-' reads JSONL from stdin)"""
+    if path == '-':
+        yield from _read_jsonl(sys.stdin)
+        return
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            for row in csv.DictReader(f):
+                # Empty CSV cells become missing attributes, not empty strings
+                yield {k: v for k, v in row.items() if v != ''}
+        else:
+            yield from _read_jsonl(f)
+
+
+def _read_jsonl(f):
+    for line in f:
+        if line.strip():
+            # DynamoDB wants Decimal, not float
+            yield json.loads(line, parse_float=Decimal)
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def to_jsonl(items):
+    """Yield one JSON line per item"""
+    for item in items:
+        yield json.dumps(item, default=_json_default) + '\n'
+
+
+def prepare(kind, item):
+    """Fill in derived attributes the indexes, the TTL and slot claims rely on"""
+    if kind == 'appointments':
+        # archive.py imports this module
+        from archive import appointment_expiry
+        with_schedule_keys(item)
+        if 'expires_at' not in item:
+            item.update(appointment_expiry(item))
+        if item.get('status') != 'cancelled':
+            item['slot_id'] = slot_id(item['doctor_key'], item['appointment_date'],
+                                      item['appointment_time'])
+    return item
+
+
+def slot_claim(item):
+    """The slots table item that holds a prepared appointment's slot"""
+    return {'slot_id': item['slot_id'], 'appointment_id': item['appointment_id'],
+            'expires_at': item['expires_at']}
+
+
+# -------------------------------------------------
+# DYNAMODB
+# -------------------------------------------------
+def dynamodb_import(table, kind, records, slots=None):
+    """Write records through batch_writer; yields each record once it is queued
+
+    batch_writer groups puts into 25-item BatchWriteItem calls and re-sends
+    any UnprocessedItems DynamoDB hands back. With a slots table, active
+    appointments' slot claims are written to it the same way.
+    """
+    key = TABLES[kind][1]
+    with ExitStack() as stack:
+        batch = stack.enter_context(table.batch_writer(overwrite_by_pkeys=[key]))
+        claims = (stack.enter_context(slots.batch_writer(overwrite_by_pkeys=['slot_id']))
+                  if slots is not None else None)
+        for record in records:
+            item = prepare(kind, record)
+            batch.put_item(Item=item)
+            if claims is not None and 'slot_id' in item:
+                claims.put_item(Item=slot_claim(item))
+            yield record
+
+
+def scan_segment(table, segment, total_segments, **kwargs):
+    """Yield every item of one parallel Scan segment"""
+    kwargs.update(Segment=segment, TotalSegments=total_segments)
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get('Items', [])
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def parallel_scan(table, segments=4, queue_size=1000, **kwargs):
+    """Yield every item of a table, scanning segments on a thread pool
+
+    Items pass through a bounded queue, so a slow consumer slows the scan
+    rather than letting pages pile up in memory. Closing the generator
+    early stops the scan threads.
+    """
+    items = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                items.put(value, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(segment):
+        try:
+            for item in scan_segment(table, segment, segments, **kwargs):
+                if not put(item):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=segments, thread_name_prefix='scan')
+    for segment in range(segments):
+        executor.submit(run, segment)
+    try:
+        remaining = segments
+        while remaining:
+            value = items.get()
+            if value is _DONE:
+                remaining -= 1
+            elif isinstance(value, Exception):
+                raise value
+            else:
+                yield value
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+
+# -------------------------------------------------
+# LOCAL STORE
+# -------------------------------------------------
+def local_export(store, kind):
+    """Yield every item of a local store collection (LocalStore or SQLiteStore)"""
+    yield from store.scan(kind)
+
+
+# -------------------------------------------------
+# PROGRESS
+# -------------------------------------------------
+def count_rows(rows, label, out=sys.stderr):
+    """Pass rows through, printing progress and a final rows/sec summary"""
+    start = time.perf_counter()
+    count = 0
+    for count, row in enumerate(rows, 1):
+        if count % PROGRESS_EVERY == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {count} rows ({count / elapsed:.0f} rows/sec)", file=out)
+        yield row
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0.0
+    print(f"{label}: done, {count} rows in {elapsed:.1f}s ({rate:.0f} rows/sec)", file=out)
+
+
+# -------------------------------------------------
+# CLI
+# -------------------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import/export MedTrack tables')
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('table', choices=sorted(TABLES))
+    parser.add_argument('path', help="CSV/JSONL file, or '-' for stdin/stdout")
+    parser.add_argument('--segments', type=int, default=4, help='parallel Scan segments (export)')
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint, e.g. DynamoDB Local')
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    args = parser.parse_args()
+
+    import boto3
+    dynamodb = boto3.resource('dynamodb', region_name=args.region, endpoint_url=args.endpoint_url)
+    table = dynamodb.Table(TABLES[args.table][0])
+
+    if args.action == 'import':
+        slots = dynamodb.Table(SLOTS_TABLE) if args.table == 'appointments' else None
+        rows = dynamodb_import(table, args.table, read_records(args.path), slots)
+        days = set()
+        for row in count_rows(rows, f"import {table.name}"):
+            if 'appointment_date' in row:
+                days.add(row['appointment_date'])
+        if days:
+            print(f"Counters don't include the imported appointments yet; run:\n"
+                  f"    python appointment_stats.py reconcile --start {min(days)} --end {max(days)}",
+                  file=sys.stderr)
+    else:
+        rows = count_rows(parallel_scan(table, args.segments), f"export {table.name}")
+        out = sys.stdout if args.path == '-' else open(args.path, 'w', encoding='utf-8')
+        try:
+            for line in to_jsonl(rows):
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,244 +1,472 @@
 #!/usr/bin/env python3
 """
-Script to create DynamoDB tables for MedTrack application
-Run this before deploying to AWS
+Script to create and migrate DynamoDB tables for MedTrack application
+Run this before deploying to AWS, and again after pulling schema changes.
+
+The schema is declared once in SCHEMA below. Each run compares it with
+what exists and applies only the difference: missing tables are created,
+missing global secondary indexes are added to live tables, TTL is
+turned on, and billing mode is switched if needed. Nothing is ever deleted. Tables are handled
+concurrently.
+
+Usage:
+    python create_dynamodb_tables.py                     # new tables on-demand (PAY_PER_REQUEST)
+    python create_dynamodb_tables.py --plan              # show what would change
+    python create_dynamodb_tables.py --billing provisioned --read 5 --write 5 \\
+        --autoscale 5:100:70                             # min:max:target utilization %
+    python create_dynamodb_tables.py --endpoint-url http://localhost:8000   # DynamoDB Local
 """
 
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 from botocore.exceptions import ClientError
-import sys
 
 # Configuration
-REGION = 'us-east-1'  # Change to your preferred region
-dynamodb = boto3.client('dynamodb', region_name=REGION)
+REGION = os.environ.get('AWS_REGION', 'us-east-1')
+
+# -------------------------------------------------
+# SCHEMA
+# table name -> key schema and global secondary indexes, as
+# (attribute, type, HASH|RANGE) tuples. All indexes project ALL attributes.
+# 'ttl' names the epoch-seconds attribute DynamoDB expires rows by.
+# -------------------------------------------------
+SCHEMA = {
+    os.environ.get('USERS_TABLE', 'MedTrack_Users'): {
+        'key': [('email', 'S', 'HASH')],
+        'indexes': {
+            'UserIdIndex': [('user_id', 'S', 'HASH')],
+            # Every doctor, for the doctor directory's reloads
+            'UserTypeIndex': [('user_type', 'S', 'HASH')],
+        },
+    },
+    os.environ.get('APPOINTMENTS_TABLE', 'MedTrack_Appointments'): {
+        'key': [('appointment_id', 'S', 'HASH')],
+        'indexes': {
+            'PatientIdIndex': [('patient_id', 'S', 'HASH')],
+            # Doctor's schedule: normalized doctor name + "date#time"
+            'DoctorScheduleIndex': [('doctor_key', 'S', 'HASH'), ('schedule_key', 'S', 'RANGE')],
+            # Everything on one date, for the reminder scheduler
+            'AppointmentDateIndex': [('appointment_date', 'S', 'HASH'), ('appointment_time', 'S', 'RANGE')],
+            # Every appointment by the day its TTL fires (archive.py)
+            'ExpiryIndex': [('expires_day', 'S', 'HASH')],
+        },
+        'ttl': 'expires_at',
+    },
+    os.environ.get('RECORDS_TABLE', 'MedTrack_MedicalRecords'): {
+        'key': [('record_id', 'S', 'HASH')],
+        'indexes': {
+            'PatientIdIndex': [('patient_id', 'S', 'HASH')],
+        },
+    },
+    # One item per booked doctor slot (doctor_key#date#time), claimed conditionally
+    os.environ.get('SLOTS_TABLE', 'MedTrack_Slots'): {
+        'key': [('slot_id', 'S', 'HASH')],
+        'indexes': {},
+        'ttl': 'expires_at',
+    },
+    # Appointment counters: one item per scope (clinic, doctor#<doctor_key>) and month
+    os.environ.get('STATS_TABLE', 'MedTrack_AppointmentStats'): {
+        'key': [('scope', 'S', 'HASH'), ('month', 'S', 'RANGE')],
+        'indexes': {
+            # Every scope's counters for one month (admin statistics)
+            'MonthIndex': [('month', 'S', 'HASH'), ('scope', 'S', 'RANGE')],
+        },
+    },
+}
+
+# Seconds between status checks while waiting for tables and indexes
+POLL_INTERVAL = 2
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    """print() that keeps lines from concurrent table threads apart"""
+    with _print_lock:
+        print(message, flush=True)
+
+
+class Capacity:
+    """Billing settings for tables and indexes
 
-def create_users_table():
-    """Create Users table with email as partition key"""
+    billing None leaves existing tables as they are and creates new ones
+    on-demand.
+    """
+
+    def __init__(self, billing=None, read=5, write=5, autoscale=None):
+        self.billing = billing
+        self.read = read
+        self.write = write
+        self.autoscale = autoscale  # (min, max, target %) or None
+
+    @property
+    def provisioned(self):
+        return self.billing == 'PROVISIONED'
+
+    def throughput(self):
+        return {'ReadCapacityUnits': self.read, 'WriteCapacityUnits': self.write}
+
+
+# -------------------------------------------------
+# PLANNING
+# -------------------------------------------------
+def key_schema(keys):
+    return [{'AttributeName': name, 'KeyType': key_type} for name, _, key_type in keys]
+
+
+def attribute_definitions(keys):
+    # Each attribute is defined once, even if several keys use it
+    types = {name: attr_type for name, attr_type, _ in keys}
+    return [{'AttributeName': name, 'AttributeType': attr_type} for name, attr_type in types.items()]
+
+
+def index_definition(name, keys, capacity, provisioned):
+    index = {
+        'IndexName': name,
+        'KeySchema': key_schema(keys),
+        'Projection': {'ProjectionType': 'ALL'},
+    }
+    if provisioned:
+        index['ProvisionedThroughput'] = capacity.throughput()
+    return index
+
+
+def describe(dynamodb, table_name):
+    """The table's description, or None if it doesn't exist"""
     try:
-        response = dynamodb.create_table(
-            TableName='MedTrack_Users',
-            KeySchema=[
-                {
-                    'AttributeName': 'email',
-                    'KeyType': 'HASH'  # Partition key
-                }
-            ],
-            AttributeDefinitions=[
-                {
-                    'AttributeName': 'email',
-                    'AttributeType': 'S'
-                },
-                {
-                    'AttributeName': 'user_id',
-                    'AttributeType': 'S'
-                }
-            ],
-            GlobalSecondaryIndexes=[
-                {
-                    'IndexName': 'UserIdIndex',
-                    'KeySchema': [
-                        {
-                            'AttributeName': 'user_id',
-                            'KeyType': 'HASH'
-                        }
-                    ],
-                    'Projection': {
-                        'ProjectionType': 'ALL'
-                    },
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': 5,
-                        'WriteCapacityUnits': 5
-                    }
-                }
-            ],
-            ProvisionedThroughput={
-                'ReadCapacityUnits': 5,
-                'WriteCapacityUnits': 5
-            }
-        )
-        print("✅ Users table created successfully")
-        return True
+        return dynamodb.describe_table(TableName=table_name)['Table']
     except ClientError as e:
-        if e.response['Error']['Code'] == 'ResourceInUseException':
-            print("⚠️  Users table already exists")
-            return True
-        else:
-            print(f"❌ Error creating Users table: {e}")
-            return False
-
-def create_appointments_table():
-    """Create Appointments table with appointment_id as partition key"""
+        if e.response['Error']['Code'] == 'ResourceNotFoundException':
+            return None
+        raise
+
+
+def describe_with_ttl(dynamodb, table_name, spec):
+    """describe(), plus the TTL setting under 'TimeToLiveDescription' when the spec has one"""
+    existing = describe(dynamodb, table_name)
+    if existing is not None and spec.get('ttl'):
+        existing['TimeToLiveDescription'] = dynamodb.describe_time_to_live(
+            TableName=table_name)['TimeToLiveDescription']
+    return existing
+
+
+def ttl_enabled(existing, attribute):
+    ttl = existing.get('TimeToLiveDescription', {})
+    return (ttl.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING')
+            and ttl.get('AttributeName') == attribute)
+
+
+def plan_table(spec, existing, capacity):
+    """Actions bringing one table in line with its spec, as (kind, detail) pairs"""
+    if existing is None:
+        actions = [('create_table', None)]
+        if spec.get('ttl'):
+            actions.append(('enable_ttl', spec['ttl']))
+        if capacity.autoscale:
+            actions.append(('autoscale', None))
+        return actions
+
+    actions = []
+    current_key = [(k['AttributeName'], k['KeyType']) for k in existing['KeySchema']]
+    wanted_key = [(name, key_type) for name, _, key_type in spec['key']]
+    if current_key != wanted_key:
+        # Changing a primary key means a new table and a copy; not done automatically
+        actions.append(('warn', f"primary key is {current_key}, schema says {wanted_key}"))
+
+    current_billing = existing.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED')
+    if capacity.billing and current_billing != capacity.billing:
+        actions.append(('set_billing', capacity.billing))
+
+    current_indexes = {i['IndexName'] for i in existing.get('GlobalSecondaryIndexes', [])}
+    for index_name in spec['indexes']:
+        if index_name not in current_indexes:
+            actions.append(('create_index', index_name))
+    for index_name in sorted(current_indexes - set(spec['indexes'])):
+        actions.append(('warn', f"index {index_name} is not in the schema (left in place)"))
+
+    if spec.get('ttl') and not ttl_enabled(existing, spec['ttl']):
+        actions.append(('enable_ttl', spec['ttl']))
+
+    if capacity.autoscale:
+        actions.append(('autoscale', None))
+    return actions
+
+
+def plan(dynamodb, capacity, schema=SCHEMA):
+    """{table_name: [actions]} for every table in the schema, described concurrently"""
+    names = list(schema)
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        descriptions = list(executor.map(
+            lambda name: describe_with_ttl(dynamodb, name, schema[name]), names))
+    return {
+        name: plan_table(schema[name], existing, capacity)
+        for name, existing in zip(names, descriptions)
+    }
+
+
+def describe_action(kind, detail):
+    return {
+        'create_table': 'create table',
+        'create_index': f"add index {detail}",
+        'set_billing': f"switch billing to {detail}",
+        'enable_ttl': f"enable TTL on {detail}",
+        'autoscale': 'register auto-scaling targets',
+        'warn': f"warning: {detail}",
+    }[kind]
+
+
+# -------------------------------------------------
+# APPLYING
+# -------------------------------------------------
+def create_table(dynamodb, table_name, spec, capacity):
+    kwargs = {
+        'TableName': table_name,
+        'KeySchema': key_schema(spec['key']),
+        'AttributeDefinitions': attribute_definitions(
+            spec['key'] + [k for index_keys in spec['indexes'].values() for k in index_keys]),
+        'BillingMode': capacity.billing or 'PAY_PER_REQUEST',
+    }
+    if capacity.provisioned:
+        kwargs['ProvisionedThroughput'] = capacity.throughput()
+    if spec['indexes']:
+        kwargs['GlobalSecondaryIndexes'] = [
+            index_definition(name, index_keys, capacity, capacity.provisioned)
+            for name, index_keys in spec['indexes'].items()
+        ]
     try:
-        response = dynamodb.create_table(
-            TableName='MedTrack_Appointments',
-            KeySchema=[
-                {
-                    'AttributeName': 'appointment_id',
-                    'KeyType': 'HASH'  # Partition key
-                }
-            ],
-            AttributeDefinitions=[
-                {
-                    'AttributeName': 'appointment_id',
-                    'AttributeType': 'S'
-                },
-                {
-                    'AttributeName': 'patient_id',
-                    'AttributeType': 'S'
-                }
-            ],
-            GlobalSecondaryIndexes=[
-                {
-                    'IndexName': 'PatientIdIndex',
-                    'KeySchema': [
-                        {
-                            'AttributeName': 'patient_id',
-                            'KeyType': 'HASH'
-                        }
-                    ],
-                    'Projection': {
-                        'ProjectionType': 'ALL'
-                    },
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': 5,
-                        'WriteCapacityUnits': 5
-                    }
-                }
-            ],
-            ProvisionedThroughput={
-                'ReadCapacityUnits': 5,
-                'WriteCapacityUnits': 5
-            }
-        )
-        print("✅ Appointments table created successfully")
-        return True
+        dynamodb.create_table(**kwargs)
     except ClientError as e:
-        if e.response['Error']['Code'] == 'ResourceInUseException':
-            print("⚠️  Appointments table already exists")
-            return True
-        else:
-            print(f"❌ Error creating Appointments table: {e}")
-            return False
-
-def create_medical_records_table():
-    """Create Medical Records table with record_id as partition key"""
-    try:
-        response = dynamodb.create_table(
-            TableName='MedTrack_MedicalRecords',
-            KeySchema=[
-                {
-                    'AttributeName': 'record_id',
-                    'KeyType': 'HASH'  # Partition key
-                }
-            ],
-            AttributeDefinitions=[
-                {
-                    'AttributeName': 'record_id',
-                    'AttributeType': 'S'
+        # Someone else created it between plan and apply
+        if e.response['Error']['Code'] != 'ResourceInUseException':
+            raise
+    wait_until_active(dynamodb, table_name)
+
+
+def create_index(dynamodb, table_name, spec, index_name, capacity):
+    """Add one GSI to a live table and wait for its backfill to finish
+
+    DynamoDB builds one new index per UpdateTable call, so indexes for the
+    same table are added one after another.
+    """
+    index_keys = spec['indexes'][index_name]
+    # A provisioned table's new index needs its own throughput
+    existing = describe(dynamodb, table_name)
+    provisioned = existing.get('BillingModeSummary', {}).get('BillingMode', 'PROVISIONED') == 'PROVISIONED'
+    dynamodb.update_table(
+        TableName=table_name,
+        AttributeDefinitions=attribute_definitions(index_keys),
+        GlobalSecondaryIndexUpdates=[
+            {'Create': index_definition(index_name, index_keys, capacity, provisioned)}
+        ],
+    )
+    wait_until_active(dynamodb, table_name)
+
+
+def set_billing(dynamodb, table_name, capacity):
+    kwargs = {'TableName': table_name, 'BillingMode': capacity.billing}
+    if capacity.provisioned:
+        kwargs['ProvisionedThroughput'] = capacity.throughput()
+        existing = describe(dynamodb, table_name)
+        indexes = [i['IndexName'] for i in existing.get('GlobalSecondaryIndexes', [])]
+        if indexes:
+            kwargs['GlobalSecondaryIndexUpdates'] = [
+                {'Update': {'IndexName': name, 'ProvisionedThroughput': capacity.throughput()}}
+                for name in indexes
+            ]
+    dynamodb.update_table(**kwargs)
+    wait_until_active(dynamodb, table_name)
+
+
+def enable_ttl(dynamodb, table_name, attribute):
+    """Let DynamoDB delete rows once the epoch-seconds attribute has passed"""
+    dynamodb.update_time_to_live(
+        TableName=table_name,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': attribute},
+    )
+
+
+def wait_until_active(dynamodb, table_name):
+    """Poll until the table and all of its indexes are ACTIVE"""
+    while True:
+        table = describe(dynamodb, table_name)
+        if table is not None and table['TableStatus'] == 'ACTIVE' and all(
+                i.get('IndexStatus', 'ACTIVE') == 'ACTIVE'
+                for i in table.get('GlobalSecondaryIndexes', [])):
+            return
+        time.sleep(POLL_INTERVAL)
+
+
+def register_autoscaling(autoscaling, table_name, spec, capacity):
+    """Target-tracking auto-scaling on the table and each of its indexes"""
+    minimum, maximum, target = capacity.autoscale
+    resources = [('table', f"table/{table_name}")] + [
+        ('index', f"table/{table_name}/index/{name}") for name in spec['indexes']
+    ]
+    for kind, resource_id in resources:
+        for unit, metric in (('Read', 'DynamoDBReadCapacityUtilization'),
+                             ('Write', 'DynamoDBWriteCapacityUtilization')):
+            dimension = f"dynamodb:{kind}:{unit}CapacityUnits"
+            autoscaling.register_scalable_target(
+                ServiceNamespace='dynamodb', ResourceId=resource_id,
+                ScalableDimension=dimension, MinCapacity=minimum, MaxCapacity=maximum,
+            )
+            autoscaling.put_scaling_policy(
+                PolicyName=f"{resource_id.replace('/', '-')}-{unit.lower()}",
+                ServiceNamespace='dynamodb', ResourceId=resource_id,
+                ScalableDimension=dimension, PolicyType='TargetTrackingScaling',
+                TargetTrackingScalingPolicyConfiguration={
+                    'TargetValue': float(target),
+                    'PredefinedMetricSpecification': {'PredefinedMetricType': metric},
                 },
-                {
-                    'AttributeName': 'patient_id',
-                    'AttributeType': 'S'
-                }
-            ],
-            GlobalSecondaryIndexes=[
-                {
-                    'IndexName': 'PatientIdIndex',
-                    'KeySchema': [
-                        {
-                            'AttributeName': 'patient_id',
-                            'KeyType': 'HASH'
-                        }
-                    ],
-                    'Projection': {
-                        'ProjectionType': 'ALL'
-                    },
-                    'ProvisionedThroughput': {
-                        'ReadCapacityUnits': 5,
-                        'WriteCapacityUnits': 5
-                    }
-                }
-            ],
-            ProvisionedThroughput={
-                'ReadCapacityUnits': 5,
-                'WriteCapacityUnits': 5
-            }
-        )
-        print("✅ Medical Records table created successfully")
+            )
+
+
+def apply_table(dynamodb, autoscaling, table_name, actions, capacity, schema=SCHEMA):
+    """Run one table's actions in order; returns True on success"""
+    spec = schema[table_name]
+    try:
+        for kind, detail in actions:
+            if kind == 'warn':
+                continue
+            log(f"⏳ {table_name}: {describe_action(kind, detail)}...")
+            if kind == 'create_table':
+                create_table(dynamodb, table_name, spec, capacity)
+            elif kind == 'create_index':
+                create_index(dynamodb, table_name, spec, detail, capacity)
+            elif kind == 'set_billing':
+                set_billing(dynamodb, table_name, capacity)
+            elif kind == 'enable_ttl':
+                enable_ttl(dynamodb, table_name, detail)
+            elif kind == 'autoscale':
+                register_autoscaling(autoscaling, table_name, spec, capacity)
+            log(f"✅ {table_name}: {describe_action(kind, detail)} done")
         return True
     except ClientError as e:
-        if e.response['Error']['Code'] == 'ResourceInUseException':
-            print("⚠️  Medical Records table already exists")
-            return True
-        else:
-            print(f"❌ Error creating Medical Records table: {e}")
-            return False
-
-def wait_for_tables():
-    """Wait for all tables to become active"""
-    print("\n⏳ Waiting for tables to become active...")
-    tables = ['MedTrack_Users', 'MedTrack_Appointments', 'MedTrack_MedicalRecords']
-    
-    for table_name in tables:
-        try:
-            waiter = dynamodb.get_waiter('table_exists')
-            waiter.wait(TableName=table_name)
-            print(f"✅ {table_name} is active")
-        except ClientError as e:
-            print(f"❌ Error waiting for {table_name}: {e}")
+        log(f"❌ Error updating {table_name}: {e}")
+        return False
+
+
+def provision(dynamodb, capacity=None, autoscaling=None, schema=SCHEMA, dry_run=False):
+    """Plan and apply the schema, migrating tables concurrently
+
+    Returns True if every table now matches the schema. With dry_run the
+    plan is only printed.
+    """
+    capacity = capacity or Capacity()
+    changes = plan(dynamodb, capacity, schema)
+    for table_name, actions in changes.items():
+        if not actions:
+            log(f"✅ {table_name}: up to date")
+        for kind, detail in actions:
+            marker = '⚠️ ' if kind == 'warn' else '•'
+            log(f"{marker} {table_name}: {describe_action(kind, detail)}")
+    if dry_run:
+        return True
+
+    pending = {name: actions for name, actions in changes.items()
+               if any(kind != 'warn' for kind, _ in actions)}
+    if not pending:
+        return True
+    print()
+    with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+        results = list(executor.map(
+            lambda name: apply_table(dynamodb, autoscaling, name, pending[name], capacity, schema),
+            pending
+        ))
+    return all(results)
+
+
+# -------------------------------------------------
+# CLI
+# -------------------------------------------------
+def parse_autoscale(value):
+    try:
+        minimum, maximum, target = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('expected MIN:MAX:TARGET, e.g. 5:100:70')
+    return minimum, maximum, target
+
 
 def main():
+    parser = argparse.ArgumentParser(description='Create or migrate MedTrack DynamoDB tables')
+    parser.add_argument('--plan', action='store_true', help='show changes without applying them')
+    parser.add_argument('--billing', choices=['on-demand', 'provisioned'],
+                        help='switch every table to this mode (default: keep; new tables on-demand)')
+    parser.add_argument('--read', type=int, default=5, help='read capacity units (provisioned)')
+    parser.add_argument('--write', type=int, default=5, help='write capacity units (provisioned)')
+    parser.add_argument('--autoscale', type=parse_autoscale, metavar='MIN:MAX:TARGET',
+                        help='target-tracking auto-scaling (provisioned only)')
+    parser.add_argument('--region', default=REGION)
+    parser.add_argument('--endpoint-url', default=os.environ.get('DYNAMODB_ENDPOINT_URL') or None,
+                        help='e.g. DynamoDB Local')
+    args = parser.parse_args()
+    if args.autoscale and args.billing != 'provisioned':
+        parser.error('--autoscale needs --billing provisioned')
+
     print("=" * 60)
-    print("🏥 MedTrack DynamoDB Table Creation")
+    print("🏥 MedTrack DynamoDB Table Setup")
     print("=" * 60)
-    print(f"Region: {REGION}")
+    print(f"Region: {args.region}")
+    if args.endpoint_url:
+        print(f"Endpoint: {args.endpoint_url}")
     print()
-    
-    # Check AWS credentials
-    try:
-        sts = boto3.client('sts')
-        identity = sts.get_caller_identity()
-        print(f"AWS Account: {identity['Account']}")
-        print(f"User ARN: {identity['Arn']}")
-        print()
-    except ClientError as e:
-        print("❌ AWS credentials not configured properly")
-        print("Run: aws configure")
-        sys.exit(1)
-    
-    # Create tables
-    print("Creating DynamoDB tables...")
+
+    # Check AWS credentials (a local stand-in doesn't need real ones)
+    if not args.endpoint_url:
+        try:
+            sts = boto3.client('sts', region_name=args.region)
+            identity = sts.get_caller_identity()
+            print(f"AWS Account: {identity['Account']}")
+            print(f"User ARN: {identity['Arn']}")
+            print()
+        except ClientError as e:
+            print("❌ AWS credentials not configured properly")
+            print("Run: aws configure")
+            sys.exit(1)
+
+    dynamodb = boto3.client('dynamodb', region_name=args.region, endpoint_url=args.endpoint_url)
+    autoscaling = None
+    if args.autoscale:
+        autoscaling = boto3.client('application-autoscaling', region_name=args.region,
+                                   endpoint_url=args.endpoint_url)
+    capacity = Capacity(
+        billing={'provisioned': 'PROVISIONED', 'on-demand': 'PAY_PER_REQUEST'}.get(args.billing),
+        read=args.read, write=args.write, autoscale=args.autoscale
+    )
+
+    print("Planned changes:" if args.plan else "Checking DynamoDB tables...")
     print()
-    
-    success = True
-    success &= create_users_table()
-    success &= create_appointments_table()
-    success &= create_medical_records_table()
-    
-    if success:
-        wait_for_tables()
-        print()
-        print("=" * 60)
-        print("✅ All tables created successfully!")
-        print("=" * 60)
-        print()
-        print("Next steps:")
-        print("1. Set environment variables:")
-        print("   export USE_AWS=true")
-        print("   export AWS_REGION=us-east-1")
-        print("   export SECRET_KEY='your-secure-key'")
+    if not provision(dynamodb, capacity, autoscaling, dry_run=args.plan):
         print()
-        print("2. (Optional) Create SNS topic for notifications:")
-        print("   aws sns create-topic --name MedTrack-Notifications")
-        print("   export SNS_TOPIC_ARN='arn:aws:sns:...'")
-        print()
-        print("3. Run the application:")
-        print("   python aws_app.py")
-        print()
-    else:
-        print()
-        print("❌ Some tables failed to create. Check errors above.")
+        print("❌ Some tables could not be updated. Check errors above.")
         sys.exit(1)
+    if args.plan:
+        return
+
+    print()
+    print("=" * 60)
+    print("✅ All tables match the schema!")
+    print("=" * 60)
+    print()
+    print("Next steps:")
+    print("1. Set environment variables:")
+    print("   export USE_AWS=true")
+    print(f"   export AWS_REGION={args.region}")
+    print("   export SECRET_KEY='your-secure-key'")
+    print()
+    print("2. (Optional) Create SNS topic for notifications:")
+    print("   aws sns create-topic --name MedTrack-Notifications")
+    print("   export SNS_TOPIC_ARN='arn:aws:sns:...'")
+    print()
+    print("3. Run the application:")
+    print("   python aws_app.py")
+    print()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,79 @@
+"""
+Concurrent page-data loader for MedTrack dashboards
+Independent storage reads run together on a shared thread pool, so a page
+waits for the slowest read instead of the sum of all of them. Anything not
+finished by the deadline is left out and the page renders what it has.
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+DASHBOARD_POOL_SIZE = int(os.environ.get('DASHBOARD_POOL_SIZE', 16))
+DASHBOARD_TIMEOUT = float(os.environ.get('DASHBOARD_TIMEOUT', 2.0))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """The shared pool, created lazily (and again in each forked worker)"""
+    global _executor, _executor_pid
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=DASHBOARD_POOL_SIZE,
+                    thread_name_prefix='dashboard'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+class DashboardData:
+    """Results of a load_dashboard call, keyed by loader name"""
+
+    def __init__(self, results, missing):
+        self.results = results
+        self.missing = missing  # names that failed or missed the deadline
+
+    @property
+    def partial(self):
+        return bool(self.missing)
+
+    def get(self, name, default=None):
+        return self.results.get(name, default)
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+
+def load_dashboard(loaders, timeout=None):
+    """Run {name: callable} loaders concurrently and collect what finishes in time
+
+    Each loader runs in a copy of the caller's context, so Flask's request
+    context (and anything stored on g) is visible inside it.
+    """
+    timeout = DASHBOARD_TIMEOUT if timeout is None else timeout
+    executor = get_executor()
+    futures = {
+        executor.submit(contextvars.copy_context().run, loader): name
+        for name, loader in loaders.items()
+    }
+    done, not_done = wait(futures, timeout=timeout)
+
+    results = {}
+    missing = []
+    for future, name in futures.items():
+        if future not in done:
+            future.cancel()
+            print(f"Dashboard: '{name}' missed the {timeout}s deadline")
+            missing.append(name)
+        elif future.exception() is not None:
+            print(f"Dashboard: '{name}' failed: {future.exception()}")
+            missing.append(name)
+        else:
+            results[name] = future.result()
+    return DashboardData(results, missing)
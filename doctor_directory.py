@@ -0,0 +1,194 @@
+"""
+Doctor directory for MedTrack
+An in-process prefix index over doctors' names and specializations, so
+the booking form's doctor picker can autocomplete without touching
+storage. Every word of a doctor's name and specialization goes into one
+sorted list of (token, user_id); a query word is a bisect range on that
+list, and a multi-word query walks the narrowest range and checks the
+other words against that doctor's own few tokens.
+
+Doctors registered by this worker are added as they sign up. Each worker
+also reloads the full list from storage every DOCTOR_DIRECTORY_REFRESH
+seconds (in the background, without blocking searches) to pick up doctors
+registered on other workers and drop any that are gone.
+"""
+
+import bisect
+import os
+import re
+import threading
+import time
+
+DOCTOR_DIRECTORY_REFRESH = float(os.environ.get('DOCTOR_DIRECTORY_REFRESH', 300))
+
+# Most results one search returns
+MAX_RESULTS = 50
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+# Sorts after any token character, so (prefix + _HIGH,) closes a prefix range
+_HIGH = '\uffff'
+
+
+def tokenize(text):
+    """Lowercase alphanumeric words ("Dr. Sarah O'Neil" -> ['dr', 'sarah', 'o', 'neil'])"""
+    return _TOKEN.findall((text or '').lower())
+
+
+def doctor_entry(user):
+    """The fields the directory keeps (and search returns) for a doctor"""
+    return {
+        'user_id': user['user_id'],
+        'name': f"{user.get('first_name', '')} {user.get('last_name', '')}".strip(),
+        'specialization': user.get('specialization', ''),
+    }
+
+
+class DoctorDirectory:
+    """Prefix search over doctor names and specializations"""
+
+    def __init__(self, refresh_interval=DOCTOR_DIRECTORY_REFRESH):
+        self.refresh_interval = refresh_interval
+        self._doctors = {}  # user_id -> entry
+        self._tokens = {}  # user_id -> tuple of tokens
+        self._index = []  # sorted (token, user_id)
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._loaded_at = None
+        self._pid = None
+
+        # Counters
+        self.searches = 0
+        self.reconciles = 0
+        self.reconcile_errors = 0
+
+    def __len__(self):
+        return len(self._doctors)
+
+    # ---------------- updates ----------------
+
+    @staticmethod
+    def _build(entries):
+        doctors, tokens, index = {}, {}, []
+        for entry in entries:
+            user_id = entry['user_id']
+            doctors[user_id] = entry
+            tokens[user_id] = tuple(set(tokenize(f"{entry['name']} {entry['specialization']}")))
+            index.extend((token, user_id) for token in tokens[user_id])
+        index.sort()
+        return doctors, tokens, index
+
+    def add(self, user):
+        """Add or update one doctor (call when a doctor registers)"""
+        entry = doctor_entry(user)
+        with self._lock:
+            self._remove(entry['user_id'])
+            tokens = tuple(set(tokenize(f"{entry['name']} {entry['specialization']}")))
+            self._doctors[entry['user_id']] = entry
+            self._tokens[entry['user_id']] = tokens
+            for token in tokens:
+                bisect.insort(self._index, (token, entry['user_id']))
+
+    def remove(self, user_id):
+        with self._lock:
+            self._remove(user_id)
+
+    def _remove(self, user_id):
+        for token in self._tokens.pop(user_id, ()):
+            i = bisect.bisect_left(self._index, (token, user_id))
+            if i < len(self._index) and self._index[i] == (token, user_id):
+                del self._index[i]
+        self._doctors.pop(user_id, None)
+
+    def load(self, users):
+        """Replace the whole directory with these doctors
+
+        The new index is built before the lock is taken, so searches keep
+        running against the old one until the swap.
+        """
+        doctors, tokens, index = self._build(doctor_entry(user) for user in users)
+        with self._lock:
+            self._doctors, self._tokens, self._index = doctors, tokens, index
+            self._loaded_at = time.monotonic()
+            self._pid = os.getpid()
+
+    def reconcile(self, loader):
+        """Reload from storage with loader() -> iterable of doctor users"""
+        try:
+            self.load(loader())
+            self.reconciles += 1
+        except Exception as e:
+            self.reconcile_errors += 1
+            print(f"Doctor directory: reload failed: {e}")
+
+    def ensure_fresh(self, loader):
+        """Load on first use (blocking), then reload in the background when stale
+
+        A forked worker reloads too, rather than trusting the copy it
+        inherited from the master.
+        """
+        if self._pid != os.getpid():
+            with self._reconcile_lock:
+                if self._pid != os.getpid():
+                    self.reconcile(loader)
+                    if self._pid != os.getpid():
+                        # Load failed; retry after refresh_interval, not on every search
+                        self._pid = os.getpid()
+                        self._loaded_at = time.monotonic()
+            return
+        if time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+        if self._reconcile_lock.acquire(blocking=False):
+            # Only one reload at a time; searches meanwhile use the current index
+            self._loaded_at = time.monotonic()
+
+            def run():
+                try:
+                    self.reconcile(loader)
+                finally:
+                    self._reconcile_lock.release()
+            threading.Thread(target=run, name='doctor-directory', daemon=True).start()
+
+    # ---------------- search ----------------
+
+    def search(self, query, limit=10):
+        """Doctors matching every word of query as a prefix, sorted by name"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        limit = max(1, min(limit, MAX_RESULTS))
+        with self._lock:
+            self.searches += 1
+            index = self._index
+            ranges = []
+            for term in set(terms):
+                low = bisect.bisect_left(index, (term,))
+                high = bisect.bisect_left(index, (term + _HIGH,), low)
+                if low == high:
+                    return []
+                ranges.append((high - low, low, high, term))
+            ranges.sort()
+            _, low, high, _ = ranges[0]
+            others = [term for _, _, _, term in ranges[1:]]
+
+            matches = []
+            seen = set()
+            for i in range(low, high):
+                user_id = index[i][1]
+                if user_id in seen:
+                    continue
+                seen.add(user_id)
+                tokens = self._tokens[user_id]
+                if all(any(token.startswith(term) for token in tokens) for term in others):
+                    matches.append(self._doctors[user_id])
+                    if len(matches) >= limit:
+                        break
+        return sorted(matches, key=lambda entry: entry['name'].lower())
+
+    def stats(self):
+        return {
+            'doctors': len(self._doctors),
+            'index_entries': len(self._index),
+            'searches': self.searches,
+            'reconciles': self.reconciles,
+            'reconcile_errors': self.reconcile_errors,
+        }
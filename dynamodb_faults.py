@@ -0,0 +1,100 @@
+"""
+DynamoDB fault injection for MedTrack
+Makes a working DynamoDB endpoint (AWS, DynamoDB Local, moto_server)
+misbehave the way a real one does under pressure, so the retry, circuit
+breaker and degraded-mode paths in resilience.py can be exercised:
+throttling, 500s, added latency, read timeouts and full outages, per
+table and operation.
+
+Set DYNAMODB_FAULTS to turn it on for the app, e.g.
+
+    DYNAMODB_FAULTS="throttle=0.2,error=0.05,latency=0.02"
+    DYNAMODB_FAULTS="outage=1,tables=MedTrack_Appointments,operations=put_item|update_item"
+
+or build a FaultInjector and set it as the StorageGuard's faults.
+"""
+
+import os
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+
+DYNAMODB_FAULTS = os.environ.get('DYNAMODB_FAULTS', '')
+
+
+def _client_error(code, message, status, operation):
+    return ClientError({
+        'Error': {'Code': code, 'Message': message},
+        'ResponseMetadata': {'HTTPStatusCode': status},
+    }, operation)
+
+
+class FaultInjector:
+    """Fails or delays DynamoDB calls at configurable rates
+
+    Rates are probabilities per call. outage=True fails every call as an
+    unreachable endpoint. tables and operations limit which calls are
+    affected (None means all). Settings can be changed while running.
+    """
+
+    def __init__(self, throttle=0.0, error=0.0, timeout=0.0, latency=0.0, outage=False,
+                 tables=None, operations=None, seed=None, sleep=time.sleep):
+        self.throttle = throttle
+        self.error = error
+        self.timeout = timeout
+        self.latency = latency
+        self.outage = outage
+        self.tables = set(tables) if tables else None
+        self.operations = set(operations) if operations else None
+        self.sleep = sleep
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        # Counters
+        self.injected = 0
+
+    def before(self, table_name, operation):
+        """Called before each DynamoDB call; sleeps and/or raises the simulated fault"""
+        if self.tables is not None and table_name not in self.tables:
+            return
+        if self.operations is not None and operation not in self.operations:
+            return
+        if self.latency:
+            self.sleep(self.latency)
+        if self.outage:
+            self.injected += 1
+            raise EndpointConnectionError(endpoint_url=f'https://dynamodb.invalid/{table_name}')
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.throttle:
+            self.injected += 1
+            raise _client_error('ProvisionedThroughputExceededException',
+                                f'Simulated throttling on {table_name}', 400, operation)
+        roll -= self.throttle
+        if roll < self.error:
+            self.injected += 1
+            raise _client_error('InternalServerError', 'Simulated server error', 500, operation)
+        roll -= self.error
+        if roll < self.timeout:
+            self.injected += 1
+            raise ReadTimeoutError(endpoint_url=f'https://dynamodb.invalid/{table_name}')
+
+
+def faults_from_env(spec=DYNAMODB_FAULTS):
+    """A FaultInjector from "name=value,..." (see module docstring), or None if empty"""
+    if not spec.strip():
+        return None
+    options = {}
+    for part in spec.split(','):
+        name, _, value = part.strip().partition('=')
+        if name in ('tables', 'operations'):
+            options[name] = value.split('|')
+        elif name == 'outage':
+            options[name] = value.lower() in ('1', 'true', 'yes')
+        elif name == 'seed':
+            options[name] = int(value)
+        else:
+            options[name] = float(value)
+    return FaultInjector(**options)
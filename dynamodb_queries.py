@@ -0,0 +1,159 @@
+"""
+Paginated DynamoDB query helpers for MedTrack
+Every helper follows LastEvaluatedKey so results are never cut off at the
+1 MB page limit, and reads only the partition that was asked for. boto3 is
+imported on first use, so local mode never loads it.
+"""
+
+from schedule import DOCTOR_SCHEDULE_INDEX, schedule_bounds
+
+# Global secondary indexes (see create_dynamodb_tables.py)
+# Users by patient/doctor type (doctor directory)
+USER_TYPE_INDEX = 'UserTypeIndex'
+# Appointments and medical records by patient
+PATIENT_ID_INDEX = 'PatientIdIndex'
+# Every appointment on a date, in time order (reminders)
+APPOINTMENT_DATE_INDEX = 'AppointmentDateIndex'
+# Appointments by the day their TTL fires (archival, see archive.py)
+EXPIRY_INDEX = 'ExpiryIndex'
+# Appointment counters of every scope for one month (see appointment_stats.py)
+STATS_MONTH_INDEX = 'MonthIndex'
+
+
+def query_pages(table, **kwargs):
+    """Yield every response page of a Query, following LastEvaluatedKey"""
+    while True:
+        response = table.query(**kwargs)
+        yield response
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return
+        kwargs['ExclusiveStartKey'] = last_key
+
+
+def query_items(table, **kwargs):
+    """Yield every item matched by a Query across all pages"""
+    for page in query_pages(table, **kwargs):
+        yield from page.get('Items', [])
+
+
+def with_projection(kwargs, projection=None):
+    """Add a ProjectionExpression reading only the named attributes (if any)"""
+    if projection:
+        # Placeholders for every name, since some (e.g. status) are reserved words
+        names = {f'#p{i}': name for i, name in enumerate(projection)}
+        kwargs['ProjectionExpression'] = ', '.join(names)
+        kwargs['ExpressionAttributeNames'] = names
+    return kwargs
+
+
+def date_range_condition(start_date=None, end_date=None, attribute='appointment_date'):
+    """Build a condition for an ISO date attribute (YYYY-MM-DD), or None if unbounded"""
+    from boto3.dynamodb.conditions import Attr
+    if start_date and end_date:
+        return Attr(attribute).between(start_date, end_date)
+    if start_date:
+        return Attr(attribute).gte(start_date)
+    if end_date:
+        return Attr(attribute).lte(end_date)
+    return None
+
+
+def patient_appointments_query(patient_id, start_date=None, end_date=None):
+    """Query arguments for one patient's appointments on the PatientIdIndex"""
+    from boto3.dynamodb.conditions import Key
+    kwargs = {
+        'IndexName': PATIENT_ID_INDEX,
+        'KeyConditionExpression': Key('patient_id').eq(patient_id),
+    }
+    # PatientIdIndex has no sort key, so the date range is applied as a filter.
+    # Read cost still scales with this patient's appointments only.
+    condition = date_range_condition(start_date, end_date)
+    if condition is not None:
+        kwargs['FilterExpression'] = condition
+    return kwargs
+
+
+def users_by_type_query(user_type, projection=None):
+    """Query arguments for every user of one type ('doctor' or 'patient') on UserTypeIndex"""
+    from boto3.dynamodb.conditions import Key
+    return with_projection({
+        'IndexName': USER_TYPE_INDEX,
+        'KeyConditionExpression': Key('user_type').eq(user_type),
+    }, projection)
+
+
+def patient_records_query(patient_id):
+    """Query arguments for one patient's medical records on the records PatientIdIndex"""
+    from boto3.dynamodb.conditions import Key
+    return {
+        'IndexName': PATIENT_ID_INDEX,
+        'KeyConditionExpression': Key('patient_id').eq(patient_id),
+    }
+
+
+def doctor_schedule_query(dkey, start_date, end_date, limit=None):
+    """Query arguments for a doctor's appointments between two dates (inclusive)
+
+    A single key-condition range read on DoctorScheduleIndex, however large
+    the table is.
+    """
+    from boto3.dynamodb.conditions import Key
+    low, high = schedule_bounds(start_date, end_date)
+    kwargs = {
+        'IndexName': DOCTOR_SCHEDULE_INDEX,
+        'KeyConditionExpression': Key('doctor_key').eq(dkey) & Key('schedule_key').between(low, high),
+    }
+    if limit:
+        kwargs['Limit'] = limit
+    return kwargs
+
+
+def appointments_on_date_query(appointment_date, projection=None):
+    """Query arguments for every appointment on one date, on AppointmentDateIndex
+
+    projection is an optional list of attribute names to read.
+    """
+    from boto3.dynamodb.conditions import Key
+    kwargs = {
+        'IndexName': APPOINTMENT_DATE_INDEX,
+        'KeyConditionExpression': Key('appointment_date').eq(appointment_date),
+    }
+    return with_projection(kwargs, projection)
+
+
+def appointments_expiring_query(expires_day):
+    """Query arguments for the appointments whose TTL falls on one day, on ExpiryIndex"""
+    from boto3.dynamodb.conditions import Key
+    return {
+        'IndexName': EXPIRY_INDEX,
+        'KeyConditionExpression': Key('expires_day').eq(expires_day),
+    }
+
+
+def stats_query(scope, start_date, end_date):
+    """Query arguments for one scope's counter items covering two dates (one per month)"""
+    from boto3.dynamodb.conditions import Key
+    return {
+        'KeyConditionExpression': Key('scope').eq(scope) & Key('month').between(start_date[:7],
+                                                                             end_date[:7]),
+    }
+
+
+def stats_month_query(month):
+    """Query arguments for every scope's counter item for one month (YYYY-MM), on MonthIndex"""
+    from boto3.dynamodb.conditions import Key
+    return {
+        'IndexName': STATS_MONTH_INDEX,
+        'KeyConditionExpression': Key('month').eq(month),
+    }
+
+
+def in_date_range(item, start_date=None, end_date=None, attribute='appointment_date'):
+    """Python equivalent of date_range_condition for the local store"""
+    value = item.get(attribute, '')
+    if start_date and value < start_date:
+        return False
+    if end_date and value > end_date:
+        return False
+    return True
@@ -0,0 +1,88 @@
+"""
+Gunicorn settings for MedTrack
+Threaded (gthread) workers so a request waiting on DynamoDB or SNS doesn't
+pin a whole worker process. Override any value with the GUNICORN_*
+environment variables below.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Workers x threads = concurrent requests per box. For the ASGI app
+# (asgi_app:application) use GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker;
+# each worker then holds as many requests as arrive (see asgi_app.py).
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Import the app once in the master; boto3 clients are still built per worker
+# after fork (see aws_clients.py)
+preload_app = True
+
+# Recycle workers periodically; jitter keeps them from all restarting together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Every request thread plus every dashboard loader thread may hold a DynamoDB
+# connection at once (every async I/O thread, for the ASGI app); size the
+# botocore pool so none of them has to wait.
+if 'uvicorn' in worker_class:
+    os.environ.setdefault('AWS_MAX_POOL_CONNECTIONS', os.environ.get('ASYNC_IO_THREADS', '256'))
+else:
+    os.environ.setdefault(
+        'AWS_MAX_POOL_CONNECTIONS',
+        str(threads + int(os.environ.get('DASHBOARD_POOL_SIZE', 16)))
+    )
+
+# Without DynamoDB, every worker must share one store rather than keep its
+# own copy in memory (see sqlite_store.py)
+os.environ.setdefault('LOCAL_STORE', 'sqlite')
+# Likewise one set of rate-limit buckets for the whole box (see rate_limit.py)
+os.environ.setdefault('RATE_LIMIT_STORE', 'sqlite')
+
+# Workers write Prometheus samples here so /metrics can add them all up.
+# Must be set before the app (and prometheus_client) is imported.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                      os.path.join(tempfile.gettempdir(), 'medtrack-metrics'))
+
+
+def on_starting(server):
+    """Start every run with an empty metrics directory"""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def when_ready(server):
+    """Compile the preloaded app's templates once, for every forked worker to inherit"""
+    if preload_app and os.environ.get('WARM_UP', 'true').lower() == 'true':
+        import startup
+        from aws_app import app
+        startup.precompile_templates(app)
+
+
+def post_worker_init(worker):
+    """Build this worker's AWS clients and connections before it accepts requests"""
+    if os.environ.get('WARM_UP', 'true').lower() == 'true':
+        from aws_app import warm_up
+        warm_up()
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges (in-flight requests, component stats)"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    """Publish any queued notifications before the worker goes away"""
+    from aws_app import notifier
+    notifier.shutdown()
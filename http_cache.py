@@ -0,0 +1,277 @@
+"""
+HTTP caching and compression for MedTrack
+Public pages (landing, about, contact) are rendered once per worker and
+served from memory to anonymous visitors, with an ETag so a revalidating
+browser gets a 304 instead of the page. Text responses are gzip or brotli
+compressed according to Accept-Encoding; compressed bodies of responses
+that carry an ETag (cached pages, static files) are kept so each is only
+compressed once. Static file URLs built with url_for get a ?v=<content
+hash> and are served with a far-future, immutable Cache-Control, so a
+changed file is fetched again only because its URL changed.
+
+Brotli is used when the Brotli package is installed; otherwise gzip.
+"""
+
+import functools
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request, session
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Seconds a rendered public page is served before being rendered again
+PAGE_CACHE_TTL = float(os.environ.get('PAGE_CACHE_TTL', 300))
+# Smallest body worth compressing (bytes)
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+# Cache lifetime of fingerprinted static files (one year)
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 31536000))
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'application/javascript',
+    'text/javascript', 'application/json', 'image/svg+xml',
+}
+# Static files bigger than this are sent as-is rather than read into memory
+COMPRESS_MAX_STATIC_SIZE = 1024 * 1024
+# Compressed bodies kept per worker, keyed by ETag and encoding
+COMPRESSED_CACHE_SIZE = 256
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=min(COMPRESS_LEVEL + 3, 11))
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+
+# Preferred first when the client accepts both equally
+ENCODERS = {'br': _brotli, 'gzip': _gzip} if brotli else {'gzip': _gzip}
+
+
+def choose_encoding(accept_encodings):
+    """Best encoding the client accepts (werkzeug's request.accept_encodings), or None"""
+    best, best_quality = None, 0
+    for encoding in ENCODERS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def strong_etag(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+# -------------------------------------------------
+# PAGE CACHE
+# -------------------------------------------------
+class PageCache:
+    """Rendered responses for anonymous visitors, per path, with a TTL"""
+
+    def __init__(self, ttl=PAGE_CACHE_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._pages = {}  # path -> (expires_at, body, mimetype, etag)
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.bypassed = 0
+
+    def __len__(self):
+        return len(self._pages)
+
+    def page(self, view):
+        """Decorator for a view whose output only depends on its path when nobody is logged in
+
+        Requests with anything in the session (a login, or a flashed
+        message waiting to be shown) always render normally.
+        """
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if session or request.method not in ('GET', 'HEAD') or self.ttl <= 0:
+                self.bypassed += 1
+                return view(*args, **kwargs)
+
+            # Not the query string, so made-up ?x=... URLs can't grow the cache
+            key = request.path
+            now = self.clock()
+            entry = self._pages.get(key)
+            if entry is None or entry[0] <= now:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    self.bypassed += 1
+                    return response
+                body = response.get_data()
+                entry = (now + self.ttl, body, response.mimetype, strong_etag(body))
+                with self._lock:
+                    self._pages[key] = entry
+                self.misses += 1
+            else:
+                self.hits += 1
+
+            _, body, mimetype, etag = entry
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.set_etag(etag)
+            # Browsers revalidate every time; the answer is usually a bodyless 304
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            response.make_conditional(request)
+            if response.status_code == 304:
+                self.not_modified += 1
+            return response
+
+        return wrapper
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._pages),
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'bypassed': self.bypassed,
+        }
+
+
+# -------------------------------------------------
+# STATIC FINGERPRINTS
+# -------------------------------------------------
+class StaticFingerprints:
+    """Content hashes of static files, recomputed when a file's mtime or size changes"""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self._digests = {}  # filename -> (mtime_ns, size, digest)
+
+    def digest(self, filename):
+        """Short content hash of a static file, or None if it doesn't exist"""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        cached = self._digests.get(filename)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        self._digests[filename] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+
+# -------------------------------------------------
+# FLASK
+# -------------------------------------------------
+class Compressor:
+    """Compresses text responses, remembering the output for responses with an ETag"""
+
+    def __init__(self, maxsize=COMPRESSED_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()  # (etag, encoding) -> compressed body
+        self._lock = threading.Lock()
+
+        # Counters
+        self.compressed = 0
+        self.cache_hits = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def _should_compress(self, response):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return False
+        if response.mimetype not in COMPRESSIBLE_TYPES:
+            return False
+        if response.direct_passthrough:
+            # send_file: static files only, and only small ones
+            return (request.endpoint == 'static' and response.content_length is not None
+                    and response.content_length <= COMPRESS_MAX_STATIC_SIZE)
+        return not response.is_streamed
+
+    def compress(self, response):
+        if request.method == 'HEAD' or not self._should_compress(response):
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        response.vary.add('Accept-Encoding')
+        if encoding is None:
+            return response
+
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        etag, _ = response.get_etag()
+        key = (etag, encoding)
+        body = self._cache.get(key) if etag else None
+        if body is None:
+            body = ENCODERS[encoding](data)
+            if etag:
+                with self._lock:
+                    self._cache[key] = body
+                    while len(self._cache) > self.maxsize:
+                        self._cache.popitem(last=False)
+        else:
+            self.cache_hits += 1
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            # A different representation of the same content (as nginx does)
+            response.set_etag(etag, weak=True)
+        self.compressed += 1
+        self.bytes_in += len(data)
+        self.bytes_out += len(body)
+        return response
+
+    def stats(self):
+        return {
+            'compressed': self.compressed,
+            'cache_hits': self.cache_hits,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+
+
+def init_app(app):
+    """Fingerprint static URLs, cache them for a year, and compress responses
+
+    Returns the Compressor, for its stats().
+    """
+    fingerprints = StaticFingerprints(app.static_folder)
+    compressor = Compressor()
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            digest = fingerprints.digest(values['filename'])
+            if digest:
+                values['v'] = digest
+
+    @app.after_request
+    def _optimize(response):
+        if (request.endpoint == 'static' and response.status_code in (200, 304)
+                and request.args.get('v')
+                and request.args['v'] == fingerprints.digest(request.view_args['filename'])):
+            # The URL changes with the content, so the browser never needs to ask again
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return compressor.compress(response)
+
+    return compressor
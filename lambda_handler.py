@@ -0,0 +1,162 @@
+"""
+AWS Lambda entry point for MedTrack
+Runs the Flask app (aws_app:app) behind API Gateway (REST API, or HTTP API
+with payload format 1.0 or 2.0) or an Application Load Balancer: each event
+becomes a WSGI request, and the response goes back in the proxy format.
+
+The slow work happens once per container, in the init phase: importing the
+app and warm_up() (templates, boto3 clients, a DynamoDB connection). A few
+defaults suit a single-request-at-a-time container rather than a server:
+passwords are hashed in the invocation (no process pool), record files go
+to S3 (the package directory is read-only), and queued notifications are
+published before each invocation returns, since a frozen container can't
+publish them in the background.
+
+    Handler: lambda_handler.handler
+"""
+
+import base64
+import io
+import os
+import sys
+from urllib.parse import urlencode
+
+os.environ.setdefault('USE_AWS', 'true')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('RECORDS_BLOB_STORE', 's3')
+
+import aws_app  # noqa: E402
+import startup  # noqa: E402
+from aws_app import app, notifier  # noqa: E402
+
+# Seconds an invocation waits for its notifications to be published
+LAMBDA_NOTIFY_TIMEOUT = float(os.environ.get('LAMBDA_NOTIFY_TIMEOUT', 2))
+
+# Response types returned as text; anything else (or compressed) is base64-encoded
+TEXT_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml',
+              'image/svg+xml')
+
+if startup.WARM_UP:
+    aws_app.warm_up()
+
+
+def _query_string(event):
+    if event.get('version') == '2.0':
+        return event.get('rawQueryString', '')
+    params = event.get('multiValueQueryStringParameters')
+    if params is None:
+        params = {name: [value] for name, value in (event.get('queryStringParameters') or {}).items()}
+    if 'elb' in event.get('requestContext', {}):
+        # The load balancer passes parameters still URL-encoded
+        return '&'.join(f'{name}={value}' for name, values in params.items() for value in values)
+    return urlencode(params, doseq=True)
+
+
+def _headers(event):
+    """Request headers as {lower-case name: value}"""
+    if event.get('multiValueHeaders'):
+        headers = {name.lower(): ','.join(values) for name, values in event['multiValueHeaders'].items()}
+    else:
+        headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+    if event.get('cookies'):
+        # Payload 2.0 moves cookies out of the headers
+        headers['cookie'] = '; '.join(event['cookies'])
+    return headers
+
+
+def build_environ(event, context):
+    """The WSGI environ for an API Gateway or ALB event"""
+    request_context = event.get('requestContext', {})
+    headers = _headers(event)
+    if event.get('version') == '2.0':
+        method = request_context['http']['method']
+        path = event['rawPath']
+        source_ip = request_context['http'].get('sourceIp', '')
+    else:
+        method = event['httpMethod']
+        path = event['path']
+        source_ip = request_context.get('identity', {}).get('sourceIp', '')
+
+    # On the execute-api URL the stage is part of the path (/prod/login), so
+    # redirects and url_for need it as the script name
+    script_name = ''
+    stage = request_context.get('stage', '$default')
+    if stage != '$default' and headers.get('host', '').endswith('.amazonaws.com'):
+        script_name = f'/{stage}'
+        if path.startswith(script_name + '/'):
+            path = path[len(script_name):]
+
+    body = event.get('body') or ''
+    body = base64.b64decode(body) if event.get('isBase64Encoded') else body.encode('utf-8')
+    host, _, port = headers.get('host', 'lambda').partition(':')
+    scheme = headers.get('x-forwarded-proto', 'https')
+
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': _query_string(event),
+        'SERVER_NAME': host,
+        'SERVER_PORT': port or headers.get('x-forwarded-port', '443' if scheme == 'https' else '80'),
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': source_ip or '127.0.0.1',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scheme,
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'lambda.event': event,
+        'lambda.context': context,
+    }
+    for name, value in headers.items():
+        key = name.upper().replace('-', '_')
+        if key == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif key != 'CONTENT_LENGTH':
+            environ[f'HTTP_{key}'] = value
+    return environ
+
+
+def build_response(event, status, headers, body):
+    """The proxy-format response for the event's source"""
+    values = {}
+    for name, value in headers:
+        values.setdefault(name, []).append(value)
+    content_type = values.get('Content-Type', [''])[0]
+    binary = 'Content-Encoding' in values or not content_type.startswith(TEXT_TYPES)
+    response = {
+        'statusCode': int(status.split(' ', 1)[0]),
+        'body': base64.b64encode(body).decode('ascii') if binary else body.decode('utf-8'),
+        'isBase64Encoded': binary,
+    }
+    if event.get('version') == '2.0':
+        response['cookies'] = values.pop('Set-Cookie', [])
+        response['headers'] = {name: ','.join(items) for name, items in values.items()}
+    elif 'multiValueHeaders' in event:
+        response['multiValueHeaders'] = values
+    else:
+        response['headers'] = {name: items[-1] for name, items in values.items()}
+    if 'elb' in event.get('requestContext', {}):
+        response['statusDescription'] = status
+    return response
+
+
+def handler(event, context):
+    """Lambda handler: one HTTP request through the Flask app"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'], started['headers'] = status, headers
+
+    app_iter = app(build_environ(event, context), start_response)
+    try:
+        body = b''.join(app_iter)
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+    # Publish this request's notifications before the container is frozen
+    notifier.flush(LAMBDA_NOTIFY_TIMEOUT)
+    return build_response(event, started['status'], started['headers'], body)
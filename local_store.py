@@ -0,0 +1,341 @@
+"""
+In-memory storage for MedTrack local development
+Keeps unique secondary indexes next to the primary dicts so that login,
+signup and appointment listing never walk every stored record
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from itertools import count
+
+from appointment_stats import appointment_scopes, empty_counts
+from availability import AvailabilityIndex, SlotUnavailable
+from schedule import ScheduleIndex, doctor_key, schedule_bounds, with_schedule_keys
+
+
+class LocalStore:
+    """Users, appointments and medical records with O(1) index lookups"""
+
+    def __init__(self):
+        # Primary storage
+        self.users = {}  # user_id -> user (both patients and doctors)
+        self.appointments = {}  # appointment_id -> appointment
+        self.medical_records = {}  # record_id -> record
+
+        # Secondary indexes, kept in step with the primary dicts.
+        # Appointment indexes map to dicts used as insertion-ordered sets.
+        self._user_id_by_email = {}  # email -> user_id (unique)
+        self._doctor_ids = {}  # {user_id: None} for every doctor
+        self._appointments_by_patient = {}  # patient_id -> sorted [(seq, appointment_id)]
+        self._appointment_seq = {}  # appointment_id -> booking sequence number
+        self._appointments_by_date = {}  # appointment_date -> {appointment_id: None}
+        self._appointments_by_expiry = {}  # expires_day -> {appointment_id: None}
+        self._doctor_schedule = ScheduleIndex()  # doctor_key -> sorted (schedule_key, id)
+        self._booked_slots = AvailabilityIndex()  # (doctor_key, date) -> booked-slot bitmap
+        self._records_by_patient = {}  # patient_id -> {record_id: None}
+
+        # Appointment counters, updated with the appointments (see appointment_stats.py)
+        self._stats = {}  # scope -> {appointment_date: {'booked': n, 'cancelled': n}}
+
+        self._sequence = count(1)
+        self._lock = threading.RLock()
+
+    # ---------------- users ----------------
+
+    def get_user(self, user_id):
+        """Get a user by user_id"""
+        return self.users.get(user_id)
+
+    def get_user_by_email(self, email):
+        """Get a user by email through the unique email index"""
+        user_id = self._user_id_by_email.get(email)
+        return self.users.get(user_id) if user_id else None
+
+    def create_user(self, user_data):
+        """Store a new user; returns False if the email is already registered"""
+        with self._lock:
+            if user_data['email'] in self._user_id_by_email:
+                return False
+            self.users[user_data['user_id']] = user_data
+            self._user_id_by_email[user_data['email']] = user_data['user_id']
+            if user_data.get('user_type') == 'doctor':
+                self._doctor_ids[user_data['user_id']] = None
+            return True
+
+    def doctors(self):
+        """Every registered doctor"""
+        with self._lock:
+            return [self.users[user_id] for user_id in self._doctor_ids]
+
+    def set_password(self, user_id, password_hash):
+        """Replace a user's stored password hash"""
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return False
+            user['password'] = password_hash
+            return True
+
+    # ---------------- appointments ----------------
+
+    def get_appointment(self, appointment_id):
+        """Get an appointment by appointment_id"""
+        return self.appointments.get(appointment_id)
+
+    def create_appointment(self, appointment_data):
+        """Store an appointment and add it to the patient and doctor indexes
+
+        Claiming the doctor's slot and storing the appointment happen under
+        one lock, so two bookings for the same slot can't both succeed.
+        Raises SlotUnavailable if the slot is already booked.
+        """
+        appointment_id = appointment_data['appointment_id']
+        if 'schedule_key' not in appointment_data:
+            with_schedule_keys(appointment_data)
+        with self._lock:
+            if not self._booked_slots.claim(appointment_data['doctor_key'],
+                                            appointment_data['appointment_date'],
+                                            appointment_data['appointment_time']):
+                raise SlotUnavailable('That time slot is already booked')
+            self.appointments[appointment_id] = appointment_data
+            seq = self._appointment_seq[appointment_id] = next(self._sequence)
+            # Sequence numbers only grow, so appending keeps the list sorted
+            self._appointments_by_patient.setdefault(
+                appointment_data['patient_id'], []).append((seq, appointment_id))
+            self._appointments_by_date.setdefault(
+                appointment_data['appointment_date'], {})[appointment_id] = None
+            if 'expires_day' in appointment_data:
+                self._appointments_by_expiry.setdefault(
+                    appointment_data['expires_day'], {})[appointment_id] = None
+            self._doctor_schedule.add(appointment_data['doctor_key'],
+                                      appointment_data['schedule_key'], appointment_id)
+            self._count(appointment_data, {'booked': 1})
+        return True
+
+    def cancel_appointment(self, appointment_id, changes):
+        """Apply a cancellation's fields and free the slot, keeping the appointment
+
+        Returns False if the appointment doesn't exist or is already cancelled.
+        """
+        with self._lock:
+            appointment = self.appointments.get(appointment_id)
+            if appointment is None or appointment.get('status') == 'cancelled':
+                return False
+            self._booked_slots.release(appointment['doctor_key'],
+                                       appointment['appointment_date'],
+                                       appointment['appointment_time'])
+            if 'expires_day' in appointment:
+                self._discard(self._appointments_by_expiry, appointment['expires_day'], appointment_id)
+            appointment.update(changes)
+            if 'expires_day' in appointment:
+                self._appointments_by_expiry.setdefault(
+                    appointment['expires_day'], {})[appointment_id] = None
+            self._count(appointment, {'cancelled': 1})
+        return True
+
+    def delete_appointment(self, appointment_id):
+        """Remove an appointment and its index entries (its counts stay)"""
+        with self._lock:
+            appointment = self.appointments.pop(appointment_id, None)
+            if appointment is None:
+                return True
+            self._discard_sequenced(self._appointments_by_patient, appointment['patient_id'],
+                                    self._appointment_seq.pop(appointment_id), appointment_id)
+            self._discard(self._appointments_by_date, appointment['appointment_date'], appointment_id)
+            if 'expires_day' in appointment:
+                self._discard(self._appointments_by_expiry, appointment['expires_day'], appointment_id)
+            self._doctor_schedule.remove(appointment['doctor_key'],
+                                         appointment['schedule_key'], appointment_id)
+            # A cancelled appointment's slot was freed already and may be rebooked
+            if appointment.get('status') != 'cancelled':
+                self._booked_slots.release(appointment['doctor_key'],
+                                           appointment['appointment_date'],
+                                           appointment['appointment_time'])
+        return True
+
+    def patient_appointments(self, patient_id):
+        """All appointments for a patient, in booking order"""
+        with self._lock:
+            entries = self._appointments_by_patient.get(patient_id, [])
+            return [self.appointments[aid] for _, aid in entries]
+
+    def patient_appointments_page(self, patient_id, offset=0, limit=None, predicate=None):
+        """One page of a patient's appointments, resuming after a position
+
+        As in SQLiteStore, offset is the booking sequence number the last
+        page stopped at: a bisect finds where to resume, so the cost
+        depends on the page, not on how deep it is, and appointments
+        deleted meanwhile don't shift later pages. Returns (appointments,
+        next_offset), with next_offset None when the index is exhausted.
+        """
+        with self._lock:
+            entries = self._appointments_by_patient.get(patient_id, [])
+            page = []
+            position = offset or 0
+            for i in range(bisect.bisect_right(entries, (position, '\uffff')), len(entries)):
+                position, appointment_id = entries[i]
+                appointment = self.appointments[appointment_id]
+                if predicate is None or predicate(appointment):
+                    page.append(appointment)
+                    if limit is not None and len(page) >= limit:
+                        return page, (position if i + 1 < len(entries) else None)
+            return page, None
+
+    def doctor_appointments(self, doctor_name):
+        """All appointments booked with a doctor, in schedule order"""
+        with self._lock:
+            ids = self._doctor_schedule.all(doctor_key(doctor_name))
+            return [self.appointments[aid] for aid in ids]
+
+    def doctor_schedule(self, dkey, start_date, end_date, after=None, limit=None):
+        """One page of a doctor's appointments between two dates (inclusive)
+
+        Returns (appointments, last) where last is the final
+        (schedule_key, appointment_id) of the page if more remain.
+        """
+        low, high = schedule_bounds(start_date, end_date)
+        with self._lock:
+            ids, last = self._doctor_schedule.range(dkey, low, high, after, limit)
+            return [self.appointments[aid] for aid in ids], last
+
+    def appointments_on(self, appointment_date):
+        """Every appointment on a date, in booking order"""
+        with self._lock:
+            ids = self._appointments_by_date.get(appointment_date, {})
+            return [self.appointments[aid] for aid in ids]
+
+    def appointments_expiring_on(self, expires_day):
+        """Every appointment whose TTL falls on a day (archival)"""
+        with self._lock:
+            ids = self._appointments_by_expiry.get(expires_day, {})
+            return [self.appointments[aid] for aid in ids]
+
+    def booked_slots(self, dkey, appointment_date):
+        """Bitmap of a doctor's booked slots on a date"""
+        with self._lock:
+            return self._booked_slots.booked(dkey, appointment_date)
+
+    # ---------------- appointment statistics ----------------
+
+    def appointment_stats(self, scope, start_date, end_date):
+        """{day: {'booked': n, 'cancelled': n}} of one scope's counters between two dates"""
+        with self._lock:
+            return {day: dict(counts) for day, counts in self._stats.get(scope, {}).items()
+                    if start_date <= day <= end_date}
+
+    def appointment_stats_by_scope(self, start_date, end_date):
+        """{scope: {day: counts}} of every scope's counters between two dates"""
+        with self._lock:
+            scopes = list(self._stats)
+        stats = {scope: self.appointment_stats(scope, start_date, end_date) for scope in scopes}
+        return {scope: days for scope, days in stats.items() if days}
+
+    def add_appointment_stats(self, scope, day, counts):
+        """Add {counter: amount} to one scope's counters for a day"""
+        with self._lock:
+            totals = self._stats.setdefault(scope, {}).setdefault(day, empty_counts())
+            for name, amount in counts.items():
+                totals[name] += amount
+        return True
+
+    def _count(self, appointment, counts):
+        for scope in appointment_scopes(appointment):
+            self.add_appointment_stats(scope, appointment['appointment_date'], counts)
+
+    # ---------------- medical records ----------------
+
+    def get_medical_record(self, record_id):
+        """Get a medical record's metadata by record_id"""
+        return self.medical_records.get(record_id)
+
+    def create_medical_record(self, record):
+        """Store a medical record's metadata and index it by patient"""
+        with self._lock:
+            self.medical_records[record['record_id']] = record
+            self._records_by_patient.setdefault(record['patient_id'], {})[record['record_id']] = None
+        return True
+
+    def patient_medical_records(self, patient_id):
+        """All medical records for a patient, in upload order"""
+        with self._lock:
+            ids = self._records_by_patient.get(patient_id, {})
+            return [self.medical_records[rid] for rid in ids]
+
+    # ---------------- export ----------------
+
+    def scan(self, kind):
+        """Yield every item of a collection ('users', 'appointments' or 'records')"""
+        collection = {
+            'users': self.users,
+            'appointments': self.appointments,
+            'records': self.medical_records,
+        }[kind]
+        # Snapshot the keys so concurrent writes can't break iteration
+        for key in list(collection):
+            item = collection.get(key)
+            if item is not None:
+                yield item
+
+    @staticmethod
+    def _discard(index, key, item_id):
+        """Remove one id from a secondary index, dropping empty buckets"""
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(item_id, None)
+            if not bucket:
+                del index[key]
+
+    @staticmethod
+    def _discard_sequenced(index, key, seq, item_id):
+        """Remove one (seq, id) entry from a sorted per-key list, dropping empty lists"""
+        entries = index.get(key)
+        if entries is not None:
+            i = bisect.bisect_left(entries, (seq, item_id))
+            if i < len(entries) and entries[i] == (seq, item_id):
+                del entries[i]
+            if not entries:
+                del index[key]
+
+
+class SlowStore:
+    """Wraps a store so every method call first sleeps for latency seconds
+
+    A local stand-in for a remote database, for benchmarking how the app
+    behaves when storage latency dominates (see benchmarks/bench_asgi.py).
+    """
+
+    def __init__(self, store, latency):
+        self._store = store
+        self.latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def slow(*args, **kwargs):
+            time.sleep(self.latency)
+            return attr(*args, **kwargs)
+
+        return slow
+
+
+def store_from_env():
+    """The local backend selected by LOCAL_STORE
+
+    'memory' (the default) keeps everything in this process. 'sqlite'
+    shares one database file (LOCAL_DB_PATH) between every worker on the
+    box and survives restarts; see sqlite_store.py. LOCAL_STORE_LATENCY
+    (seconds) delays every call, to imitate a remote database.
+    """
+    if os.environ.get('LOCAL_STORE', 'memory') == 'sqlite':
+        from sqlite_store import SQLiteStore
+        store = SQLiteStore(os.environ.get('LOCAL_DB_PATH', 'medtrack.db'))
+    else:
+        store = LocalStore()
+    latency = float(os.environ.get('LOCAL_STORE_LATENCY', 0))
+    return SlowStore(store, latency) if latency > 0 else store
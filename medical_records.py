@@ -0,0 +1,125 @@
+"""
+Medical record file storage for MedTrack
+Record metadata lives in the MedicalRecords table; file bodies go to a
+pluggable blob store (local directory or an S3-compatible bucket). Bodies
+are copied in fixed-size chunks in both directions, so a large scan or PDF
+is never held in worker memory all at once.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+RECORDS_BLOB_STORE = os.environ.get('RECORDS_BLOB_STORE', 'local')
+RECORDS_DIR = os.environ.get('RECORDS_DIR', 'medical_records_data')
+RECORDS_BUCKET = os.environ.get('RECORDS_BUCKET', 'medtrack-medical-records')
+
+# Content types an upload may declare; downloads are served with the stored one
+RECORD_CONTENT_TYPES = frozenset({
+    'application/pdf',
+    'image/gif',
+    'image/heic',
+    'image/jpeg',
+    'image/png',
+    'image/tiff',
+    'image/webp',
+})
+
+
+class HashingReader:
+    """File-like wrapper that counts and SHA-256 hashes everything read through it"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.size += len(data)
+        self._sha256.update(data)
+        return data
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+
+class LocalBlobStore:
+    """Blobs as files under a directory; downloads can be served with sendfile"""
+
+    def __init__(self, root=RECORDS_DIR):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return path
+
+    def put(self, key, stream, content_type=None):
+        """Copy a stream into the store chunk by chunk; returns (size, sha256)"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        reader = HashingReader(stream)
+        # Write to a temp file first so a failed upload never leaves a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(reader, f, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return reader.size, reader.sha256
+
+    def delete(self, key):
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore:
+    """Blobs in an S3 (or S3-compatible) bucket, uploaded as multipart in chunks"""
+
+    def __init__(self, get_client, bucket=RECORDS_BUCKET):
+        # A callable, so the client is built in the worker process that uses it
+        self.get_client = get_client
+        self.bucket = bucket
+
+    def put(self, key, stream, content_type='application/octet-stream'):
+        """Stream into S3 with a multipart upload; returns (size, sha256)"""
+        from boto3.s3.transfer import TransferConfig
+        reader = HashingReader(stream)
+        self.get_client().upload_fileobj(
+            reader, self.bucket, key,
+            ExtraArgs={'ContentType': content_type},
+            Config=TransferConfig(multipart_chunksize=8 * CHUNK_SIZE, max_concurrency=1)
+        )
+        return reader.size, reader.sha256
+
+    def get(self, key, byte_range=None):
+        """get_object response; byte_range is an HTTP Range header value"""
+        kwargs = {'Bucket': self.bucket, 'Key': key}
+        if byte_range:
+            kwargs['Range'] = byte_range
+        return self.get_client().get_object(**kwargs)
+
+    def delete(self, key):
+        self.get_client().delete_object(Bucket=self.bucket, Key=key)
+
+
+def blob_store_from_env(get_s3=None):
+    """The blob store selected by RECORDS_BLOB_STORE (local or s3)"""
+    if RECORDS_BLOB_STORE == 's3':
+        return S3BlobStore(get_s3, RECORDS_BUCKET)
+    return LocalBlobStore(RECORDS_DIR)
+
+
+def blob_key(patient_id, record_id):
+    return f"{patient_id}/{record_id}"
@@ -0,0 +1,182 @@
+"""
+Prometheus metrics for MedTrack
+Per-route request latency and in-flight gauges come from Flask request
+hooks. DynamoDB and SNS calls are timed through botocore's event hooks on
+each client, and every DynamoDB call asks for ReturnConsumedCapacity, so
+read/write units can be attributed to the route that spent them.
+
+Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) and
+/metrics aggregates every worker's samples.
+"""
+
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    generate_latest, multiprocess
+)
+
+# Storage calls are mostly single-digit milliseconds; requests run longer
+AWS_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+REQUEST_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+# How often a worker copies cache/queue stats into gauges (seconds)
+STATS_REFRESH_INTERVAL = 1.0
+
+REQUEST_LATENCY = Histogram(
+    'medtrack_request_seconds', 'Request latency by route',
+    ['route', 'method', 'status'], buckets=REQUEST_BUCKETS)
+REQUESTS_IN_FLIGHT = Gauge(
+    'medtrack_requests_in_flight', 'Requests currently being handled',
+    ['route'], multiprocess_mode='livesum')
+AWS_CALL_LATENCY = Histogram(
+    'medtrack_aws_call_seconds', 'AWS API call latency (including retries)',
+    ['service', 'operation', 'table', 'route'], buckets=AWS_BUCKETS)
+AWS_CALL_ERRORS = Counter(
+    'medtrack_aws_call_errors_total', 'AWS API calls that failed',
+    ['service', 'operation', 'table', 'route'])
+DYNAMODB_CAPACITY = Counter(
+    'medtrack_dynamodb_consumed_capacity_units_total', 'DynamoDB capacity units consumed',
+    ['table', 'operation', 'route', 'kind'])
+APP_STATS = Gauge(
+    'medtrack_component_stat', 'Counters reported by app components (user cache, notifier)',
+    ['component', 'stat'], multiprocess_mode='livesum')
+
+_stats_sources = {}
+_stats_lock = threading.Lock()
+_stats_refreshed = 0.0
+
+
+def current_route():
+    """The Flask endpoint handling this thread's request, or 'background'"""
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+
+# -------------------------------------------------
+# FLASK
+# -------------------------------------------------
+def init_app(app):
+    """Time every request and serve /metrics"""
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_route = request.endpoint or 'unknown'
+        REQUESTS_IN_FLIGHT.labels(g.metrics_route).inc()
+
+    @app.after_request
+    def _observe(response):
+        if 'metrics_start' in g:
+            REQUEST_LATENCY.labels(g.metrics_route, request.method, response.status_code).observe(
+                time.perf_counter() - g.metrics_start)
+        refresh_stats()
+        return response
+
+    @app.teardown_request
+    def _finish(exc):
+        # Runs even when the view raised, so the gauge can't drift upwards
+        if 'metrics_route' in g:
+            REQUESTS_IN_FLIGHT.labels(g.metrics_route).dec()
+
+    @app.route('/metrics')
+    def metrics():
+        refresh_stats(force=True)
+        return Response(generate_latest(registry()), mimetype=CONTENT_TYPE_LATEST)
+
+
+def registry():
+    """Registry to export: every worker's samples in multiprocess mode"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        return collector_registry
+    return REGISTRY
+
+
+def register_stats(component, stats, keys):
+    """Export some of a component's stats() counters as gauges
+
+    Only pass keys that add up across workers (counts, sizes); ratios and
+    averages would be summed into nonsense.
+    """
+    _stats_sources[component] = (stats, keys)
+
+
+def refresh_stats(force=False):
+    """Copy registered stats into gauges, at most once per STATS_REFRESH_INTERVAL"""
+    global _stats_refreshed
+    now = time.monotonic()
+    if not force and now - _stats_refreshed < STATS_REFRESH_INTERVAL:
+        return
+    with _stats_lock:
+        _stats_refreshed = now
+        for component, (stats, keys) in _stats_sources.items():
+            values = stats()
+            for key in keys:
+                APP_STATS.labels(component, key).set(values[key])
+
+
+# -------------------------------------------------
+# BOTOCORE
+# -------------------------------------------------
+def instrument_client(client):
+    """Time every call a boto3 client makes; ask DynamoDB for consumed capacity"""
+    service = client.meta.service_model.service_id.hyphenize()
+    events = client.meta.events
+    events.register(f'before-parameter-build.{service}', _start_call)
+    events.register(f'after-call.{service}', _finish_call)
+    events.register(f'after-call-error.{service}', _failed_call)
+    return client
+
+
+def _start_call(params, model, context, **kwargs):
+    if 'ReturnConsumedCapacity' in model.input_shape.members:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+    context['metrics'] = (
+        time.perf_counter(),
+        (model.service_model.service_id.hyphenize(), model.name,
+         params.get('TableName', ''), current_route()),
+    )
+
+
+def _finish_call(http_response, parsed, model, context, **kwargs):
+    if 'metrics' not in context:
+        return
+    start, labels = context.pop('metrics')
+    AWS_CALL_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+    if http_response.status_code >= 300:
+        AWS_CALL_ERRORS.labels(*labels).inc()
+    capacity = parsed.get('ConsumedCapacity')
+    # Batch and transaction calls report one entry per table
+    for entry in capacity if isinstance(capacity, list) else [capacity] if capacity else []:
+        _count_capacity(entry, model.name, labels[3])
+
+
+def _failed_call(context, **kwargs):
+    # Connection errors and timeouts never reach after-call
+    if 'metrics' not in context:
+        return
+    start, labels = context.pop('metrics')
+    AWS_CALL_LATENCY.labels(*labels).observe(time.perf_counter() - start)
+    AWS_CALL_ERRORS.labels(*labels).inc()
+
+
+def _count_capacity(entry, operation, route):
+    table = entry.get('TableName', '')
+    read, write = entry.get('ReadCapacityUnits'), entry.get('WriteCapacityUnits')
+    if read is None and write is None:
+        # Only the total was returned; reads and writes are told apart by operation
+        total = entry.get('CapacityUnits', 0)
+        if operation in ('GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems'):
+            read = total
+        else:
+            write = total
+    if read:
+        DYNAMODB_CAPACITY.labels(table, operation, route, 'read').inc(read)
+    if write:
+        DYNAMODB_CAPACITY.labels(table, operation, route, 'write').inc(write)
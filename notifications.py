@@ -0,0 +1,307 @@
+"""
+Background notification dispatcher for MedTrack
+Requests queue notifications and return immediately; worker threads drain
+the queue in batches (SNS PublishBatch takes up to 10 messages per call)
+and retry failures with exponential backoff. A caller that needs to know
+whether a message went out passes on_done to submit: it is called with
+True once the message is published, or False if it was dropped or given
+up on.
+"""
+
+import atexit
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from botocore.exceptions import ClientError
+
+OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_new')
+
+# SNS PublishBatch limit
+SNS_MAX_BATCH = 10
+
+
+class LogPublisher:
+    """Prints notifications (local development)"""
+
+    def publish_batch(self, messages):
+        for subject, message in messages:
+            print(f"[NOTIFICATION] {subject}: {message}")
+        return [], []
+
+
+class SNSPublisher:
+    """Publishes to an SNS topic with PublishBatch"""
+
+    def __init__(self, get_client, topic_arn):
+        # A callable, so the client is built in the process that publishes
+        self.get_client = get_client
+        self.topic_arn = topic_arn
+
+    def publish_batch(self, messages):
+        """Publish messages; returns (worth retrying, rejected for good)"""
+        entries = [
+            {'Id': str(i), 'Subject': subject, 'Message': message}
+            for i, (subject, message) in enumerate(messages)
+        ]
+        response = self.get_client().publish_batch(
+            TopicArn=self.topic_arn,
+            PublishBatchRequestEntries=entries
+        )
+        retry, rejected = [], []
+        for failure in response.get('Failed', []):
+            if failure.get('SenderFault'):
+                # Malformed message: retrying won't help
+                print(f"SNS Error: {failure.get('Code')} {failure.get('Message')}")
+                rejected.append(messages[int(failure['Id'])])
+            else:
+                retry.append(messages[int(failure['Id'])])
+        return retry, rejected
+
+
+class StubPublisher:
+    """Records batches in memory; optional latency and failures for testing"""
+
+    def __init__(self, latency=0.0, fail_times=0):
+        self.batches = []
+        self.latency = latency
+        self.fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def publish_batch(self, messages):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise ClientError({'Error': {'Code': 'Throttling', 'Message': 'stub failure'}},
+                                  'PublishBatch')
+            self.batches.append(list(messages))
+        return [], []
+
+    @property
+    def messages(self):
+        return [message for batch in self.batches for message in batch]
+
+
+class NotificationDispatcher:
+    """Bounded queue of (subject, message) pairs drained by worker threads
+
+    A publisher's publish_batch(messages) publishes (subject, message)
+    pairs and returns two lists of those it didn't: the ones worth
+    retrying and the ones rejected for good.
+    """
+
+    def __init__(self, publisher, maxsize=1000, workers=1, batch_size=SNS_MAX_BATCH,
+                 overflow='drop_oldest', max_retries=3, backoff=0.2, max_backoff=5.0,
+                 block_timeout=1.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        self.publisher = publisher
+        self.maxsize = maxsize
+        self.workers = workers
+        self.batch_size = max(1, min(batch_size, SNS_MAX_BATCH))
+        self.overflow = overflow
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.block_timeout = block_timeout
+
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._threads = []
+        self._pid = None
+        self._closed = False
+
+        # Counters
+        self.submitted = 0
+        self.published = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.publish_seconds_total = 0.0
+        self.publish_seconds_max = 0.0
+
+    # ---------------- producer side ----------------
+
+    def submit(self, subject, message, on_done=None):
+        """Queue a notification; returns False if it was dropped
+
+        on_done(published), if given, is called exactly once: with True
+        from a worker thread after the message is published, or with
+        False when it is dropped (here, or later to make room) or given
+        up on. Keep it short; the worker waits for it.
+        """
+        self._ensure_started()
+        evicted = None
+        with self._lock:
+            if self._closed:
+                self.dropped += 1
+                accepted = False
+            elif len(self._queue) < self.maxsize:
+                accepted = True
+            elif self.overflow == 'drop_new':
+                self.dropped += 1
+                accepted = False
+            elif self.overflow == 'drop_oldest':
+                evicted = self._queue.popleft()
+                self.dropped += 1
+                accepted = True
+            else:
+                # 'block' gives up after block_timeout rather than pinning the request
+                accepted = self._not_full.wait_for(
+                    lambda: len(self._queue) < self.maxsize, self.block_timeout)
+                if not accepted:
+                    self.dropped += 1
+            if accepted:
+                self._queue.append((subject, message, on_done))
+                self.submitted += 1
+                self._not_empty.notify()
+        if evicted is not None:
+            _done([evicted], False)
+        if not accepted:
+            _done([(subject, message, on_done)], False)
+        return accepted
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been published or given up on"""
+        with self._lock:
+            return self._idle.wait_for(
+                lambda: not self._queue and self._in_flight == 0, timeout)
+
+    def shutdown(self, timeout=5.0):
+        """Stop accepting notifications, flush the queue and stop the workers"""
+        if self._pid != os.getpid():
+            return True
+        flushed = self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        return flushed
+
+    def stats(self):
+        """Queue depth, delivery counters and publish latency"""
+        with self._lock:
+            return {
+                'queue_depth': len(self._queue),
+                'in_flight': self._in_flight,
+                'submitted': self.submitted,
+                'published': self.published,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'retries': self.retries,
+                'batches': self.batches,
+                'publish_seconds_avg': self.publish_seconds_total / self.batches if self.batches else 0.0,
+                'publish_seconds_max': self.publish_seconds_max,
+            }
+
+    # ---------------- worker side ----------------
+
+    def _ensure_started(self):
+        """Start workers lazily, and again in a child process after fork"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'notifications-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._queue or self._closed)
+                if not self._queue:
+                    return
+                batch = [self._queue.popleft()
+                         for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight += len(batch)
+                self._not_full.notify(len(batch))
+            try:
+                self._deliver(batch)
+            finally:
+                with self._lock:
+                    self._in_flight -= len(batch)
+                    if not self._queue and self._in_flight == 0:
+                        self._idle.notify_all()
+
+    def _deliver(self, batch):
+        """Publish a batch, retrying what failed with jittered exponential backoff"""
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            # Publishers see (subject, message) pairs and hand back the same objects
+            pairs = {}
+            for entry in pending:
+                pair = (entry[0], entry[1])
+                pairs[id(pair)] = (pair, entry)
+            start = time.perf_counter()
+            try:
+                retry, rejected = self.publisher.publish_batch([pair for pair, _ in pairs.values()])
+            except Exception as e:
+                print(f"SNS Error: {e}")
+                retry, rejected = [pair for pair, _ in pairs.values()], []
+            elapsed = time.perf_counter() - start
+            retry = [pairs.pop(id(pair))[1] for pair in retry]
+            rejected = [pairs.pop(id(pair))[1] for pair in rejected]
+            published = [entry for _, entry in pairs.values()]
+
+            with self._lock:
+                self.batches += 1
+                self.publish_seconds_total += elapsed
+                self.publish_seconds_max = max(self.publish_seconds_max, elapsed)
+                self.published += len(published)
+                self.failed += len(rejected)
+                if retry and attempt < self.max_retries:
+                    self.retries += len(retry)
+            _done(published, True)
+            _done(rejected, False)
+            if not retry:
+                return
+            pending = retry
+            if attempt < self.max_retries:
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                time.sleep(random.uniform(delay / 2, delay))
+
+        with self._lock:
+            self.failed += len(pending)
+        print(f"SNS Error: giving up on {len(pending)} notification(s)")
+        _done(pending, False)
+
+
+def _done(entries, published):
+    """Tell each queued entry's on_done whether it was published"""
+    for _, _, on_done in entries:
+        if on_done is not None:
+            try:
+                on_done(published)
+            except Exception as e:
+                print(f"Notification callback error: {e}")
+
+
+def dispatcher_from_env(publisher):
+    """Build a dispatcher configured from NOTIFY_* environment variables"""
+    dispatcher = NotificationDispatcher(
+        publisher,
+        maxsize=int(os.environ.get('NOTIFY_QUEUE_SIZE', 1000)),
+        workers=int(os.environ.get('NOTIFY_WORKERS', 1)),
+        batch_size=int(os.environ.get('NOTIFY_BATCH_SIZE', SNS_MAX_BATCH)),
+        overflow=os.environ.get('NOTIFY_OVERFLOW', 'drop_oldest'),
+        max_retries=int(os.environ.get('NOTIFY_MAX_RETRIES', 3)),
+    )
+    # Flush whatever is still queued when the worker process exits
+    atexit.register(dispatcher.shutdown)
+    return dispatcher
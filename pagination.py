@@ -0,0 +1,48 @@
+"""
+Opaque, signed page cursors for MedTrack lists
+A cursor wraps wherever the storage layer left off (a DynamoDB
+ExclusiveStartKey, or a position in a local index) and is signed with the
+app secret, so clients can pass it back but can't forge or edit it. Each
+cursor is also bound to the list it came from.
+"""
+
+import os
+
+from itsdangerous import BadSignature, URLSafeSerializer
+
+APPOINTMENTS_PAGE_SIZE = int(os.environ.get('APPOINTMENTS_PAGE_SIZE', 20))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))
+
+
+def page_size(value, default=APPOINTMENTS_PAGE_SIZE):
+    """Clamp a requested page size (e.g. ?limit=) to 1..MAX_PAGE_SIZE"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+class CursorCodec:
+    """Signs and verifies cursor tokens"""
+
+    def __init__(self, secret_key, salt='medtrack-cursor'):
+        self._serializer = URLSafeSerializer(secret_key, salt=salt)
+
+    def encode(self, scope, position):
+        """Token for position within scope (e.g. "appointments:<user_id>"); None if no more pages"""
+        if position is None:
+            return None
+        return self._serializer.dumps({'s': scope, 'p': position})
+
+    def decode(self, scope, token):
+        """Position from a token, or None (first page) if missing, invalid or from another list"""
+        if not token:
+            return None
+        try:
+            payload = self._serializer.loads(token)
+        except BadSignature:
+            return None
+        if not isinstance(payload, dict) or payload.get('s') != scope:
+            return None
+        return payload.get('p')
@@ -0,0 +1,175 @@
+"""
+Password hashing for MedTrack
+Hashes use Werkzeug's self-describing format ("scrypt:32768:8:1$salt$hash"),
+so the cost a hash was made with is stored next to it. Hashing and
+checking run on a small process pool: a login's tens of milliseconds of
+KDF work then doesn't hold the GIL that a gunicorn worker's other request
+threads need. At most PASSWORD_HASH_QUEUE jobs wait on the pool per worker;
+beyond that callers get PasswordHasherBusy instead of piling up. A job
+whose caller timed out still counts until it leaves the pool.
+
+When PASSWORD_HASH_METHOD changes, or a stored password is still plaintext
+from before hashing, verify_password hands back a fresh hash for the
+caller to save. A login for an unknown email is checked against a dummy
+hash of the same cost, so how long it takes doesn't tell whether the
+account exists.
+"""
+
+import atexit
+import hmac
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# scrypt:N:r:p or pbkdf2:sha256:iterations (see benchmarks/bench_password_hashing.py)
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+# Hashing processes per app worker; 0 hashes on the calling thread
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+# Hash jobs allowed to wait or run at once per app worker
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+# Seconds to wait for a queue slot, and then for the result
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+
+HASH_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hash jobs are queued, or one didn't finish in time"""
+
+
+# -------------------------------------------------
+# HASHING (these run inside the pool processes)
+# -------------------------------------------------
+def is_hashed(stored):
+    """Whether a stored password is a hash rather than legacy plaintext"""
+    return isinstance(stored, str) and stored.startswith(HASH_PREFIXES) and stored.count('$') == 2
+
+
+def hash_method(stored):
+    """The method and cost a hash was made with, e.g. 'scrypt:32768:8:1'"""
+    return stored.split('$', 1)[0]
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored, password, method):
+    """(matches, new_hash); new_hash is set when stored should be upgraded"""
+    if is_hashed(stored):
+        if not check_password_hash(stored, password):
+            return False, None
+        if hash_method(stored) == method:
+            return True, None
+    elif not (isinstance(stored, str) and hmac.compare_digest(stored.encode(), password.encode())):
+        return False, None
+    return True, generate_password_hash(password, method=method)
+
+
+# -------------------------------------------------
+# POOL
+# -------------------------------------------------
+class PasswordHasher:
+    """Runs hashing on a bounded process pool, created lazily per process"""
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 queue_size=PASSWORD_HASH_QUEUE, timeout=PASSWORD_HASH_TIMEOUT):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._dummy_hash = None
+
+    def _get_executor(self):
+        # A forked gunicorn worker must not reuse its parent's pool
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # spawn, not fork: forking a process with live threads is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy('Password hashing queue is full')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the job leaves the pool, not until we stop waiting
+        future.add_done_callback(self._release_slot)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # Drops a job that is still queued; one already running keeps its slot
+            future.cancel()
+            raise PasswordHasherBusy('Password hashing timed out')
+
+    def _release_slot(self, future):
+        self._slots.release()
+
+    def warm_up(self):
+        """Start the pool's processes and make the dummy hash now rather than on the first login"""
+        if self.workers > 0:
+            executor = self._get_executor()
+            # One job per process, submitted together, so every process is started
+            for future in [executor.submit(is_hashed, '') for _ in range(self.workers)]:
+                future.result(timeout=self.timeout)
+        self.dummy_hash()
+
+    def hash(self, password):
+        """Hash a new password with the configured method"""
+        return self._run(_hash, password, self.method)
+
+    def verify(self, stored, password):
+        """Check a password; returns (matches, new_hash)
+
+        new_hash is a replacement to save when the stored value is
+        plaintext or was made with a different method or cost. With no
+        stored password (no such user) the check runs against a dummy
+        hash anyway, taking as long as a wrong password, and never matches.
+        """
+        if not stored:
+            self._run(_verify, self.dummy_hash(), password, self.method)
+            return False, None
+        return self._run(_verify, stored, password, self.method)
+
+    def dummy_hash(self):
+        """A hash of a random password, made with the configured method and cost"""
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(secrets.token_urlsafe(16))
+        return self._dummy_hash
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._pid = None
+
+
+hasher = PasswordHasher()
+atexit.register(hasher.shutdown)
+
+
+def hash_password(password):
+    return hasher.hash(password)
+
+
+def verify_password(stored, password):
+    return hasher.verify(stored, password)
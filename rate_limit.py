@@ -0,0 +1,292 @@
+"""
+Rate limiting for MedTrack
+Token buckets checked before a request reaches any view, so a login burst
+or a scraper is turned away with a 429 and a Retry-After in microseconds
+instead of queueing up behind DynamoDB throttling retries.
+
+Every request spends a token from a box-wide bucket and one from its
+client's bucket (by IP). POSTs to /login, /signup and /tickets also spend
+from that route's per-client and box-wide buckets, which are much
+smaller, since they cost a password hash or a table write. A request is
+admitted only if every bucket it needs has a token; otherwise none is
+spent.
+
+With RATE_LIMIT_STORE=sqlite (the default under gunicorn.conf.py) the
+buckets live in one SQLite file (in /dev/shm where available) shared by
+every worker on the box, so the limits hold for the box rather than per
+worker. If that file can't be used, requests are let through.
+
+Limits are "<count>/<second|minute|hour>" with a positive count; route
+limits are a per-client and a box-wide limit separated by a comma.
+
+Clients are told apart by the address the request came from, or, with
+RATE_LIMIT_TRUSTED_PROXIES proxies in front of the app, by the address
+the first of them saw in X-Forwarded-For. It defaults to 0: set it to
+more proxies than there are and clients can pick their own address. The
+Elastic Beanstalk environment (load balancer, then nginx) gets 2 from
+.ebextensions/rate_limit.config; Lambda passes the caller's IP, so it
+stays 0 there.
+"""
+
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from flask import Response, request
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')
+RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'medtrack-ratelimit.db'))
+RATE_LIMIT_GLOBAL = os.environ.get('RATE_LIMIT_GLOBAL', '500/second')
+RATE_LIMIT_CLIENT = os.environ.get('RATE_LIMIT_CLIENT', '20/second')
+# Proxies in front of the app (2 on Elastic Beanstalk: the load balancer
+# and nginx); the client is then read from X-Forwarded-For
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXIES', 0))
+
+# POST limits per endpoint: "per client,box-wide"
+ROUTE_LIMITS = {
+    'login': os.environ.get('RATE_LIMIT_LOGIN', '10/minute,20/second'),
+    'signup': os.environ.get('RATE_LIMIT_SIGNUP', '5/minute,5/second'),
+    'tickets': os.environ.get('RATE_LIMIT_TICKETS', '20/minute,5/second'),
+}
+
+# Never limited
+EXEMPT_ENDPOINTS = {'static', 'metrics'}
+
+# Seconds a worker waits for the bucket file's lock before letting the request through
+SQLITE_LOCK_TIMEOUT = 0.1
+# How often idle (full) buckets are deleted from the shared file
+PRUNE_INTERVAL = 60
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+
+def parse_limit(text):
+    """'10/minute' -> (tokens per second, bucket capacity)"""
+    count, _, period = text.strip().partition('/')
+    seconds = _PERIODS[period.strip().rstrip('s')]
+    count = float(count)
+    if not count > 0:
+        # A bucket that never refills can't say when to come back
+        raise ValueError(f"Rate limit {text.strip()!r} must allow at least some requests "
+                         f"(set RATE_LIMIT_ENABLED=false to turn limiting off)")
+    return count / seconds, count
+
+
+def parse_route_limit(text):
+    """'10/minute,20/second' -> (per-client limit, box-wide limit)"""
+    client, _, box = text.partition(',')
+    return parse_limit(client), parse_limit(box) if box.strip() else None
+
+
+def _refill(tokens, updated, rate, capacity, now):
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+# -------------------------------------------------
+# BUCKET STORES
+# -------------------------------------------------
+class MemoryBuckets:
+    """Token buckets in this process only"""
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def take(self, wanted, now):
+        """Spend one token from each (key, rate, capacity) bucket if all have one
+
+        Returns 0 if the request is admitted, else the seconds until it
+        would be.
+        """
+        with self._lock:
+            levels = []
+            wait = 0.0
+            for key, rate, capacity in wanted:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = _refill(tokens, updated, rate, capacity, now)
+                levels.append((key, tokens))
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if not wait:
+                for key, tokens in levels:
+                    self._buckets[key] = (tokens - 1, now)
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        # A bucket untouched for an hour has refilled under any limit we use
+        cutoff = now - 3600
+        for key in [k for k, (_, updated) in self._buckets.items() if updated < cutoff]:
+            del self._buckets[key]
+        self._pruned_at = now
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBuckets:
+    """Token buckets in a SQLite file shared by every worker on the box
+
+    Each check is one short write transaction. The file holds nothing
+    that matters across a reboot, so it is not synced to disk.
+    """
+
+    def __init__(self, path=RATE_LIMIT_DB_PATH, lock_timeout=SQLITE_LOCK_TIMEOUT):
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self._local = threading.local()
+        self._connect().execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID')
+        self._pruned_at = 0.0
+
+    def _connect(self):
+        """This thread's connection, opened again in a forked child"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.lock_timeout,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    def take(self, wanted, now):
+        """Spend one token from each (key, rate, capacity) bucket if all have one
+
+        Returns 0 if the request is admitted, else the seconds until it
+        would be.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            keys = [key for key, _, _ in wanted]
+            rows = dict((key, (tokens, updated)) for key, tokens, updated in conn.execute(
+                f"SELECT key, tokens, updated FROM buckets WHERE key IN ({','.join('?' * len(keys))})",
+                keys))
+            levels = []
+            wait = 0.0
+            for key, rate, capacity in wanted:
+                tokens, updated = rows.get(key, (capacity, now))
+                tokens = _refill(tokens, updated, rate, capacity, now)
+                levels.append((key, tokens - 1, now))
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if not wait:
+                conn.executemany(
+                    'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                    levels)
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - 3600,))
+                self._pruned_at = now
+            conn.execute('COMMIT')
+            return wait
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+
+# -------------------------------------------------
+# LIMITER
+# -------------------------------------------------
+class RateLimiter:
+    """Decides whether a request is admitted, from the global, client and route buckets"""
+
+    def __init__(self, buckets, global_limit=RATE_LIMIT_GLOBAL, client_limit=RATE_LIMIT_CLIENT,
+                 route_limits=None, clock=time.time):
+        self.buckets = buckets
+        self.global_limit = parse_limit(global_limit)
+        self.client_limit = parse_limit(client_limit)
+        self.route_limits = {
+            endpoint: parse_route_limit(text)
+            for endpoint, text in (ROUTE_LIMITS if route_limits is None else route_limits).items()
+        }
+        self.clock = clock
+
+        # Counters
+        self.admitted = 0
+        self.limited = 0
+        self.errors = 0
+
+    def wanted(self, endpoint, method, client):
+        """(key, rate, capacity) of every bucket this request spends from"""
+        wanted = [('global', *self.global_limit), (f'client:{client}', *self.client_limit)]
+        route = self.route_limits.get(endpoint) if method == 'POST' else None
+        if route:
+            client_limit, box_limit = route
+            wanted.append((f'{endpoint}:{client}', *client_limit))
+            if box_limit:
+                wanted.append((endpoint, *box_limit))
+        return wanted
+
+    def check(self, endpoint, method, client):
+        """0 if the request may go ahead, else seconds until it may"""
+        try:
+            wait = self.buckets.take(self.wanted(endpoint, method, client), self.clock())
+        except sqlite3.Error as e:
+            # Fail open: a busy or broken bucket file mustn't take the site down
+            self.errors += 1
+            print(f"Rate limit: {e}")
+            return 0
+        if wait:
+            self.limited += 1
+        else:
+            self.admitted += 1
+        return wait
+
+    def stats(self):
+        return {
+            'admitted': self.admitted,
+            'limited': self.limited,
+            'errors': self.errors,
+        }
+
+
+_warned_forwarded = False
+
+
+def client_address():
+    """The client's IP, read past RATE_LIMIT_TRUSTED_PROXIES proxies"""
+    global _warned_forwarded
+    if RATE_LIMIT_TRUSTED_PROXIES:
+        forwarded = [a.strip() for a in request.headers.get('X-Forwarded-For', '').split(',') if a.strip()]
+        if len(forwarded) >= RATE_LIMIT_TRUSTED_PROXIES:
+            return forwarded[-RATE_LIMIT_TRUSTED_PROXIES]
+    elif not _warned_forwarded and 'X-Forwarded-For' in request.headers:
+        # Behind a proxy every client would share the proxy's bucket
+        _warned_forwarded = True
+        print(f"Rate limit: ignoring X-Forwarded-For, limiting by {request.remote_addr}; "
+              f"set RATE_LIMIT_TRUSTED_PROXIES if the app is behind a proxy")
+    return request.remote_addr or 'unknown'
+
+
+def limiter_from_env():
+    """A RateLimiter over RATE_LIMIT_STORE=memory|sqlite buckets"""
+    if RATE_LIMIT_STORE == 'sqlite':
+        return RateLimiter(SQLiteBuckets(RATE_LIMIT_DB_PATH))
+    return RateLimiter(MemoryBuckets())
+
+
+def init_app(app, limiter):
+    """Answer over-limit requests with a 429 before they reach a view"""
+
+    @app.before_request
+    def _rate_limit():
+        if not RATE_LIMIT_ENABLED or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+        wait = limiter.check(request.endpoint, request.method, client_address())
+        if wait:
+            return Response('Too many requests. Please try again shortly.\n', status=429,
+                            mimetype='text/plain',
+                            headers={'Retry-After': str(max(1, math.ceil(wait)))})
+        return None
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Appointment reminders for MedTrack
+Each appointment gets one reminder REMINDER_LEAD_HOURS before it starts,
+sent through the notification dispatcher in batches.
+
+Only the window that can fall due soon is held in memory: a min-heap of
+(remind_at, appointment_id) for appointments between today and the end of
+the lead window. The window is filled by per-day queries (the
+AppointmentDateIndex GSI, or the local date index), re-read every
+REMINDER_REFRESH_SECONDS to pick up new bookings and cancellations, and
+extended a day at a time as the clock moves on. Nothing ever scans the
+whole appointments table, however many future appointments there are.
+
+A reminder counts as sent once the dispatcher reports it published; one
+it dropped or gave up on, or that wasn't published before the flush timed
+out, goes back on the schedule and is tried again RETRY_SECONDS later. A day whose
+query fails keeps the reminders already loaded for it until a later
+refresh reads it. Which reminders have been sent is checkpointed to a JSON
+file after every batch, so a restart neither repeats them nor skips the
+ones that fell due while the scheduler was down. At most the batch in
+flight at a crash (or one that published after its flush timed out) can
+be sent twice. Run exactly one scheduler per deployment:
+
+    python reminders.py            # its own process (see Procfile)
+    python reminders.py --once     # send what is due now and exit
+
+or set REMINDERS_IN_PROCESS=true to run it as a thread of `python aws_app.py`.
+"""
+
+import argparse
+import functools
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+REMINDER_LEAD_HOURS = float(os.environ.get('REMINDER_LEAD_HOURS', 24))
+REMINDER_REFRESH_SECONDS = float(os.environ.get('REMINDER_REFRESH_SECONDS', 60))
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', 100))
+REMINDER_CHECKPOINT = os.environ.get('REMINDER_CHECKPOINT', 'reminders_checkpoint.json')
+
+# Seconds to wait for the dispatcher to publish a batch before checkpointing
+FLUSH_TIMEOUT = 30
+
+# Longest sleep between checks for due reminders
+MAX_IDLE_SECONDS = 5
+
+# Seconds before a reminder the dispatcher didn't publish is tried again
+RETRY_SECONDS = 30
+
+
+def appointment_start(appointment):
+    """The appointment's date and time as a datetime, or None if unparseable"""
+    try:
+        return datetime.strptime(
+            f"{appointment['appointment_date']} {appointment['appointment_time']}", '%Y-%m-%d %H:%M')
+    except (KeyError, ValueError):
+        return None
+
+
+class ReminderSchedule:
+    """Min-heap of pending reminders with lazy removal
+
+    Rescheduled or cancelled appointments leave stale heap entries behind;
+    they are recognized and skipped when they reach the top.
+    """
+
+    def __init__(self):
+        self._heap = []  # (remind_at, appointment_id)
+        self._pending = {}  # appointment_id -> (remind_at, appointment)
+        self._by_date = {}  # appointment_date -> {appointment_id, ...}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, remind_at, appointment):
+        appointment_id = appointment['appointment_id']
+        current = self._pending.get(appointment_id)
+        self._pending[appointment_id] = (remind_at, appointment)
+        self._by_date.setdefault(appointment['appointment_date'], set()).add(appointment_id)
+        if current is None or current[0] != remind_at:
+            heapq.heappush(self._heap, (remind_at, appointment_id))
+
+    def discard(self, appointment_id):
+        entry = self._pending.pop(appointment_id, None)
+        if entry is not None:
+            ids = self._by_date.get(entry[1]['appointment_date'])
+            if ids is not None:
+                ids.discard(appointment_id)
+                if not ids:
+                    del self._by_date[entry[1]['appointment_date']]
+
+    def ids_on(self, day):
+        """Pending appointment ids on a date"""
+        return set(self._by_date.get(day, ()))
+
+    def drop_before(self, day):
+        """Forget every date before day (the window has moved past them)"""
+        for old_day in [d for d in self._by_date if d < day]:
+            for appointment_id in self._by_date.pop(old_day):
+                self._pending.pop(appointment_id, None)
+
+    def pop_due(self, now, limit):
+        """Up to limit appointments whose reminder time has come, earliest first"""
+        due = []
+        while self._heap and len(due) < limit and self._heap[0][0] <= now:
+            remind_at, appointment_id = heapq.heappop(self._heap)
+            entry = self._pending.get(appointment_id)
+            if entry is None or entry[0] != remind_at:
+                continue  # stale: cancelled, sent, or rescheduled
+            self.discard(appointment_id)
+            due.append(entry[1])
+        return due
+
+    def next_due(self):
+        """Earliest pending reminder time, or None"""
+        while self._heap:
+            remind_at, appointment_id = self._heap[0]
+            entry = self._pending.get(appointment_id)
+            if entry is not None and entry[0] == remind_at:
+                return remind_at
+            heapq.heappop(self._heap)
+        return None
+
+
+class ReminderScheduler:
+    """Loads upcoming appointments by day and sends their reminders
+
+    fetch_day(iso_date) returns that day's appointments; notifier is a
+    NotificationDispatcher (submit with on_done, flush).
+    """
+
+    def __init__(self, fetch_day, notifier, lead_hours=REMINDER_LEAD_HOURS,
+                 refresh_interval=REMINDER_REFRESH_SECONDS, batch_size=REMINDER_BATCH_SIZE,
+                 checkpoint_path=REMINDER_CHECKPOINT, clock=datetime.now):
+        self.fetch_day = fetch_day
+        self.notifier = notifier
+        self.lead = timedelta(hours=lead_hours)
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.clock = clock
+
+        self.schedule = ReminderSchedule()
+        self._sent = {}  # appointment_id -> appointment start (ISO), until it has passed
+        self._refreshed_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.sent = 0
+        self.retried = 0
+        self.refreshes = 0
+        self.day_queries = 0
+        self.failed_days = 0
+
+        self._load_checkpoint()
+
+    # ---------------- checkpoint ----------------
+
+    def _load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path) as f:
+            self._sent = json.load(f).get('sent', {})
+
+    def _save_checkpoint(self, now):
+        """Write the sent set atomically, dropping appointments that have started"""
+        cutoff = now.isoformat()
+        self._sent = {aid: start for aid, start in self._sent.items() if start > cutoff}
+        if not self.checkpoint_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.reminders-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'saved_at': cutoff, 'sent': self._sent}, f)
+            os.replace(tmp_path, self.checkpoint_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    # ---------------- loading ----------------
+
+    def window_days(self, now):
+        """ISO dates that can hold an appointment due for a reminder before the next refresh"""
+        last = (now + self.lead + timedelta(seconds=self.refresh_interval)).date()
+        day = now.date()
+        days = []
+        while day <= last:
+            days.append(day.isoformat())
+            day += timedelta(days=1)
+        return days
+
+    def refresh(self, now=None):
+        """Re-read every day in the window, adding new bookings and dropping cancellations
+
+        A day whose query fails is left as it was, rather than read as a
+        day without appointments.
+        """
+        now = now or self.clock()
+        days = self.window_days(now)
+        self.schedule.drop_before(days[0])
+        for day in days:
+            try:
+                appointments = self.fetch_day(day)
+            except Exception as e:
+                print(f"Reminders: couldn't load {day}: {e}")
+                self.failed_days += 1
+                continue
+            seen = set()
+            for appointment in appointments:
+                if appointment.get('status', 'scheduled') == 'cancelled':
+                    continue
+                appointment_id = appointment['appointment_id']
+                start = appointment_start(appointment)
+                if start is None or start <= now or appointment_id in self._sent:
+                    continue
+                seen.add(appointment_id)
+                self.schedule.add(start - self.lead, appointment)
+            for appointment_id in self.schedule.ids_on(day) - seen:
+                self.schedule.discard(appointment_id)
+            self.day_queries += 1
+        self._refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    # ---------------- sending ----------------
+
+    def run_once(self, now=None):
+        """Refresh if due, then send every reminder whose time has come; returns how many"""
+        now = now or self.clock()
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self.refresh(now)
+        total = 0
+        while True:
+            batch = self.schedule.pop_due(now, self.batch_size)
+            if not batch:
+                return total
+            outcomes = {}  # appointment_id -> published, set by the dispatcher
+            for appointment in batch:
+                self.notifier.submit("Appointment Reminder", reminder_message(appointment),
+                                     on_done=functools.partial(outcomes.__setitem__,
+                                                               appointment['appointment_id']))
+            self.notifier.flush(FLUSH_TIMEOUT)
+            # Only reminders the dispatcher reported published count as sent
+            accepted, dropped = [], []
+            for appointment in batch:
+                published = outcomes.get(appointment['appointment_id'])
+                (accepted if published else dropped).append(appointment)
+            for appointment in accepted:
+                self._sent[appointment['appointment_id']] = appointment_start(appointment).isoformat()
+            if accepted:
+                self._save_checkpoint(now)
+            self.sent += len(accepted)
+            total += len(accepted)
+            if dropped:
+                retry_at = now + timedelta(seconds=RETRY_SECONDS)
+                for appointment in dropped:
+                    self.schedule.add(retry_at, appointment)
+                self.retried += len(dropped)
+                return total
+
+    def run(self):
+        """Loop until stop(), sleeping until the next reminder or refresh"""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Reminders: {e}")
+            wait = min(self.refresh_interval, MAX_IDLE_SECONDS)
+            next_due = self.schedule.next_due()
+            if next_due is not None:
+                wait = max(0.0, min(wait, (next_due - self.clock()).total_seconds()))
+            self._stop.wait(wait)
+
+    def start(self):
+        """Run in a daemon thread"""
+        self._thread = threading.Thread(target=self.run, name='reminders', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        """Schedule size and counters"""
+        return {
+            'pending': len(self.schedule),
+            'sent': self.sent,
+            'retried': self.retried,
+            'refreshes': self.refreshes,
+            'day_queries': self.day_queries,
+            'failed_days': self.failed_days,
+        }
+
+
+def reminder_message(appointment):
+    who = appointment.get('patient_email') or appointment.get('patient_id')
+    return (f"Reminder: {who} has an appointment with {appointment.get('doctor_name')} "
+            f"on {appointment['appointment_date']} at {appointment['appointment_time']}")
+
+
+def scheduler_for_app(app_module):
+    """A scheduler reading through aws_app's storage helpers and notifier"""
+    return ReminderScheduler(app_module.get_appointments_on, app_module.notifier)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send MedTrack appointment reminders')
+    parser.add_argument('--once', action='store_true', help='send what is due now and exit')
+    args = parser.parse_args()
+
+    import aws_app
+    scheduler = scheduler_for_app(aws_app)
+    if args.once:
+        print(f"Reminders: sent {scheduler.run_once()}")
+    else:
+        print(f"Reminders: every {REMINDER_LEAD_HOURS:g}h ahead, checkpoint {REMINDER_CHECKPOINT}")
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            pass
+    aws_app.notifier.shutdown()
+
+
+if __name__ == '__main__':
+    main()
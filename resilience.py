@@ -0,0 +1,389 @@
+"""
+Resilient DynamoDB calls for MedTrack
+Every table operation goes through StorageGuard.call, which:
+
+- retries only errors worth retrying (throttling, 5xx, timeouts, dropped
+  connections) with exponential backoff and full jitter, and never past
+  the request's deadline (STORAGE_DEADLINE seconds from when it started)
+- retries a write that isn't safe to repeat (a conditional write, an ADD)
+  only when the error says it wasn't applied: after a timeout or a 5xx it
+  may have been, and a second try would fail its condition or count twice
+- keeps a circuit breaker per table that opens once most recent calls
+  have failed, so callers fail in microseconds instead of waiting on a
+  struggling table, and lets one probe through after a cooldown
+- remembers recent read results made while serving requests, so while a
+  table is unavailable those reads are answered from them (read-only
+  degraded mode) and writes are refused; background jobs get the error
+
+When storage can't answer, StorageUnavailable is raised instead of a
+ClientError, so the app's helpers don't mistake an outage for "not
+found" and the request ends in a 503 with Retry-After.
+
+Failures can be simulated with a FaultInjector (see dynamodb_faults.py),
+set as StorageGuard.faults or from DYNAMODB_FAULTS.
+"""
+
+import copy
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+from flask import Response, g, has_request_context
+
+# Attempts per operation, including the first
+STORAGE_MAX_ATTEMPTS = int(os.environ.get('STORAGE_MAX_ATTEMPTS', 4))
+# Backoff before retry n is uniform(0, min(cap, base * 2**n)) seconds
+STORAGE_BACKOFF_BASE = float(os.environ.get('STORAGE_BACKOFF_BASE', 0.05))
+STORAGE_BACKOFF_CAP = float(os.environ.get('STORAGE_BACKOFF_CAP', 1.0))
+# Seconds a request (or a background call) may spend on storage, retries included
+STORAGE_DEADLINE = float(os.environ.get('STORAGE_DEADLINE', 3.0))
+
+# The breaker opens when, over BREAKER_WINDOW seconds and at least
+# BREAKER_MIN_CALLS attempts, BREAKER_ERROR_RATE of them failed
+BREAKER_WINDOW = float(os.environ.get('BREAKER_WINDOW', 10))
+BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 20))
+BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', 0.5))
+# Seconds an open breaker waits before letting a probe through
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', 5))
+
+# Recent read results kept per worker for degraded mode (0 turns it off)
+DEGRADED_CACHE_SIZE = int(os.environ.get('DEGRADED_CACHE_SIZE', 1024))
+
+READ_OPERATIONS = {'get_item', 'query', 'scan', 'batch_get_item'}
+# Reads whose results degraded mode may serve again (not scans: whole-table pages)
+CACHED_READS = {'get_item', 'query'}
+# The parts of a read's response degraded mode serves (not ResponseMetadata)
+CACHED_FIELDS = ('Item', 'Items', 'Count', 'ScannedCount', 'LastEvaluatedKey')
+WRITE_OPERATIONS = {'put_item', 'update_item', 'delete_item', 'batch_write_item',
+                    'transact_write_items'}
+
+# Error codes worth retrying: throttling and server-side failures
+RETRYABLE_CODES = {
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+    'InternalServerError', 'ServiceUnavailable', 'TransactionInProgressException',
+}
+# TransactionCanceledException reasons worth retrying
+RETRYABLE_CANCELLATION_CODES = {'ThrottlingError', 'ProvisionedThroughputExceeded',
+                                'TransactionConflict'}
+
+
+class StorageUnavailable(Exception):
+    """Storage couldn't answer in time (throttled, down, or the breaker is open)"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable(error):
+    """Whether an exception from a DynamoDB call may succeed if tried again"""
+    if isinstance(error, (BotoConnectionError, HTTPClientError)):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    code = error.response.get('Error', {}).get('Code')
+    if code in RETRYABLE_CODES:
+        return True
+    if code == 'TransactionCanceledException':
+        reasons = {r.get('Code') for r in error.response.get('CancellationReasons', [])}
+        return bool(reasons & RETRYABLE_CANCELLATION_CODES) and 'ConditionalCheckFailed' not in reasons
+    return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500
+
+
+def may_have_applied(error):
+    """Whether a failed call may have taken effect anyway: the request was sent
+    but the answer was lost (a timeout, a dropped connection, a 5xx), rather
+    than refused (throttled) or never sent (no connection)"""
+    if isinstance(error, HTTPClientError):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    code = error.response.get('Error', {}).get('Code')
+    if code in ('InternalServerError', 'ServiceUnavailable'):
+        return True
+    if code in RETRYABLE_CODES:
+        return False
+    return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500
+
+
+def is_idempotent(operation, kwargs):
+    """Whether repeating a call that may already have been applied is harmless"""
+    if operation in READ_OPERATIONS:
+        return True
+    if operation == 'transact_write_items':
+        # DynamoDB treats repeats with the same token as the same transaction
+        return 'ClientRequestToken' in kwargs
+    if kwargs.get('ConditionExpression') is not None:
+        return False
+    return not (operation == 'update_item'
+                and re.search(r'\bADD\b', kwargs.get('UpdateExpression', ''), re.IGNORECASE))
+
+
+def backoff(attempt, base=STORAGE_BACKOFF_BASE, cap=STORAGE_BACKOFF_CAP, rng=random):
+    """Seconds to sleep before retry number attempt (0-based), with full jitter"""
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _freeze(value):
+    """A hashable, stable form of call arguments (for the degraded-mode cache key)"""
+    from boto3.dynamodb.conditions import AttributeBase, ConditionBase
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, ConditionBase):
+        expression = value.get_expression()
+        return ('condition', expression['format'], expression['operator'],
+                _freeze(expression['values']))
+    if isinstance(value, AttributeBase):
+        return ('attribute', value.name)
+    return value
+
+
+# -------------------------------------------------
+# CIRCUIT BREAKER
+# -------------------------------------------------
+class CircuitBreaker:
+    """Closed -> open on a high error rate -> half-open probe after a cooldown"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, window=BREAKER_WINDOW, min_calls=BREAKER_MIN_CALLS,
+                 error_rate=BREAKER_ERROR_RATE, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self._outcomes = deque()  # (time, failed)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.opens = 0
+
+    def _trim(self, now):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open state only one probe at a time"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if self.clock() - self._opened_at < self.cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def retry_after(self):
+        """Seconds until an open breaker lets a probe through"""
+        return max(0.0, self.cooldown - (self.clock() - self._opened_at))
+
+    def record(self, failed):
+        now = self.clock()
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if failed:
+                    self._open(now)
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                return
+            if self.state == self.OPEN:
+                return
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            self._trim(now)
+            if (len(self._outcomes) >= self.min_calls
+                    and self._failures >= self.error_rate * len(self._outcomes)):
+                self._open(now)
+
+    def _open(self, now):
+        self.state = self.OPEN
+        self._opened_at = now
+        self.opens += 1
+
+
+# -------------------------------------------------
+# GUARD
+# -------------------------------------------------
+class StorageGuard:
+    """Retries, circuit breakers and degraded-mode reads for DynamoDB calls"""
+
+    def __init__(self, max_attempts=STORAGE_MAX_ATTEMPTS, deadline=STORAGE_DEADLINE,
+                 cache_size=DEGRADED_CACHE_SIZE, faults=None, breaker_factory=CircuitBreaker,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.max_attempts = max_attempts
+        self.deadline = deadline
+        self.cache_size = cache_size
+        self.faults = faults
+        self.breaker_factory = breaker_factory
+        self.sleep = sleep
+        self.clock = clock
+        self._breakers = {}  # table name -> CircuitBreaker
+        self._reads = OrderedDict()  # (table, operation, args) -> last result
+        self._lock = threading.Lock()
+
+        # Counters
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.stale_reads = 0
+
+    def breaker(self, table_name):
+        breaker = self._breakers.get(table_name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(table_name, self.breaker_factory())
+        return breaker
+
+    def _deadline(self):
+        """When this request's storage budget runs out"""
+        if has_request_context():
+            if 'storage_deadline' not in g:
+                g.storage_deadline = self.clock() + self.deadline
+            return g.storage_deadline
+        return self.clock() + self.deadline
+
+    def call(self, table_name, operation, fn, **kwargs):
+        """fn(**kwargs) with retries, the table's breaker and degraded-mode reads
+
+        Non-retryable errors (e.g. a failed condition) are raised as they
+        are. Raises StorageUnavailable when the call can't be completed
+        and no earlier result can stand in for it, including when a write
+        that isn't safe to repeat failed in a way that may have applied it.
+        """
+        self.calls += 1
+        # Only reads made for a request are kept (background jobs never get
+        # stale answers), and only the parts degraded mode serves back
+        cached = operation in CACHED_READS and self.cache_size and has_request_context()
+        key = (table_name, operation, _freeze(kwargs)) if cached else None
+        breaker = self.breaker(table_name)
+        try:
+            result = self._attempt(table_name, operation, fn, kwargs, breaker)
+        except StorageUnavailable:
+            stale = self._reads.get(key) if key else None
+            if stale is None:
+                raise
+            self.stale_reads += 1
+            g.storage_degraded = True
+            return copy.deepcopy(stale)
+        if key:
+            kept = copy.deepcopy({name: result[name] for name in CACHED_FIELDS if name in result})
+            with self._lock:
+                self._reads[key] = kept
+                self._reads.move_to_end(key)
+                while len(self._reads) > self.cache_size:
+                    self._reads.popitem(last=False)
+        return result
+
+    def _attempt(self, table_name, operation, fn, kwargs, breaker):
+        deadline = self._deadline()
+        idempotent = is_idempotent(operation, kwargs)
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.short_circuits += 1
+                raise StorageUnavailable(f"{table_name} is unavailable (circuit open)",
+                                         retry_after=breaker.retry_after())
+            try:
+                if self.faults is not None:
+                    self.faults.before(table_name, operation)
+                result = fn(**kwargs)
+            except Exception as e:
+                retryable = is_retryable(e)
+                breaker.record(failed=retryable)
+                if not retryable:
+                    raise
+                if not idempotent and may_have_applied(e):
+                    # Maybe written: a retry could fail its condition or ADD twice
+                    self.failures += 1
+                    raise StorageUnavailable(
+                        f"{table_name}.{operation} may not have been applied: {e}") from e
+                attempt += 1
+                pause = backoff(attempt - 1)
+                if attempt >= self.max_attempts or self.clock() + pause >= deadline:
+                    self.failures += 1
+                    raise StorageUnavailable(f"{table_name}.{operation} failed: {e}") from e
+                self.retries += 1
+                self.sleep(pause)
+                continue
+            breaker.record(failed=False)
+            return result
+
+    def breaker_states(self):
+        """{table name: 'closed' | 'open' | 'half_open'}"""
+        return {table_name: breaker.state for table_name, breaker in list(self._breakers.items())}
+
+    def table(self, table):
+        """A Table whose data calls go through this guard"""
+        return GuardedTable(table, self)
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'failures': self.failures,
+            'short_circuits': self.short_circuits,
+            'stale_reads': self.stale_reads,
+            'breaker_opens': sum(b.opens for b in list(self._breakers.values())),
+            'open_breakers': sum(b.state != CircuitBreaker.CLOSED
+                                 for b in list(self._breakers.values())),
+        }
+
+
+class GuardedTable:
+    """A boto3 Table whose item operations go through a StorageGuard; everything else passes through"""
+
+    def __init__(self, table, guard):
+        self._table = table
+        self._guard = guard
+
+    def __getattr__(self, name):
+        attribute = getattr(self._table, name)
+        if name in READ_OPERATIONS or name in WRITE_OPERATIONS:
+            table_name = self._table.name
+
+            def guarded(**kwargs):
+                return self._guard.call(table_name, name, attribute, **kwargs)
+            return guarded
+        return attribute
+
+
+# -------------------------------------------------
+# FLASK
+# -------------------------------------------------
+def init_app(app):
+    """Answer StorageUnavailable with a 503 and flag responses served from stale reads"""
+
+    @app.errorhandler(StorageUnavailable)
+    def _unavailable(error):
+        print(f"Storage unavailable: {error}")
+        return Response('The service is temporarily unavailable. Please try again shortly.\n',
+                        status=503, mimetype='text/plain',
+                        headers={'Retry-After': str(max(1, round(error.retry_after)))})
+
+    @app.after_request
+    def _flag_degraded(response):
+        if g.get('storage_degraded'):
+            response.headers['X-MedTrack-Degraded'] = 'read-only'
+            response.cache_control.no_store = True
+        return response
+
+    @app.context_processor
+    def _degraded():
+        return {'storage_degraded': g.get('storage_degraded', False)}
@@ -0,0 +1,80 @@
+"""
+Doctor schedule keys for MedTrack
+Appointments carry a normalized doctor_key and a sortable
+"appointment_date#appointment_time" schedule_key. In DynamoDB they back the
+DoctorScheduleIndex GSI; locally ScheduleIndex keeps the same ordering in
+sorted per-doctor lists, so a day or week view is one range lookup.
+"""
+
+import bisect
+import re
+
+# Global secondary index on MedTrack_Appointments (see create_dynamodb_tables.py)
+DOCTOR_SCHEDULE_INDEX = 'DoctorScheduleIndex'
+
+# Sorts after any time of day, so "<date>#~" closes a date range
+_END_OF_DAY = '#~'
+
+
+def doctor_key(doctor_name):
+    """Normalize a free-text doctor name ("Dr. Sarah  Johnson" -> "sarah johnson")"""
+    name = re.sub(r'\s+', ' ', (doctor_name or '').strip().lower())
+    return re.sub(r'^dr\.?\s+', '', name)
+
+
+def schedule_key(appointment_date, appointment_time):
+    """Sortable key for an appointment slot ("2024-05-01#09:30")"""
+    return f"{appointment_date}#{appointment_time}"
+
+
+def schedule_bounds(start_date, end_date):
+    """Inclusive schedule_key bounds covering whole days start_date..end_date"""
+    return f"{start_date}#", f"{end_date}{_END_OF_DAY}"
+
+
+def with_schedule_keys(appointment):
+    """Fill in doctor_key and schedule_key on an appointment dict"""
+    appointment['doctor_key'] = doctor_key(appointment.get('doctor_name'))
+    appointment['schedule_key'] = schedule_key(
+        appointment.get('appointment_date', ''), appointment.get('appointment_time', ''))
+    return appointment
+
+
+class ScheduleIndex:
+    """Per-doctor lists of (schedule_key, appointment_id), kept sorted"""
+
+    def __init__(self):
+        self._entries = {}  # doctor_key -> sorted list of (schedule_key, appointment_id)
+
+    def add(self, dkey, skey, appointment_id):
+        bisect.insort(self._entries.setdefault(dkey, []), (skey, appointment_id))
+
+    def remove(self, dkey, skey, appointment_id):
+        entries = self._entries.get(dkey)
+        if not entries:
+            return
+        i = bisect.bisect_left(entries, (skey, appointment_id))
+        if i < len(entries) and entries[i] == (skey, appointment_id):
+            del entries[i]
+        if not entries:
+            del self._entries[dkey]
+
+    def range(self, dkey, low, high, after=None, limit=None):
+        """Appointment ids with low <= schedule_key <= high, in schedule order
+
+        after is a (schedule_key, appointment_id) pair to resume past.
+        Returns (ids, last_entry) where last_entry is set only if more remain.
+        """
+        entries = self._entries.get(dkey, [])
+        start = bisect.bisect_left(entries, (low,))
+        if after is not None:
+            start = max(start, bisect.bisect_right(entries, tuple(after)))
+        stop = bisect.bisect_right(entries, (high, '\uffff'))
+        if limit is not None and stop - start > limit:
+            page = entries[start:start + limit]
+            return [aid for _, aid in page], page[-1]
+        return [aid for _, aid in entries[start:stop]], None
+
+    def all(self, dkey):
+        """Every appointment id for a doctor, in schedule order"""
+        return [aid for _, aid in self._entries.get(dkey, [])]
@@ -0,0 +1,398 @@
+"""
+SQLite storage for MedTrack local mode
+A drop-in replacement for LocalStore that keeps its data in one SQLite
+database file, so every gunicorn worker on a box sees the same users and
+appointments and nothing is lost on restart.
+
+The database runs in WAL mode: readers never block the writer and each
+other, and writes from different workers are serialized by SQLite's own
+lock (BEGIN IMMEDIATE, with a busy timeout). Each thread in each process
+gets its own connection; sqlite3 caches the prepared statements per
+connection. Records are stored as JSON next to the columns the indexes
+need, so the lookups mirror LocalStore's: email, patient and doctor
+schedule are all index range reads.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from appointment_stats import COUNTERS, appointment_scopes
+from availability import SlotUnavailable, slot_index
+from schedule import doctor_key, schedule_bounds, with_schedule_keys
+
+# Seconds a writer waits for another worker's transaction before giving up
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))
+
+# Rows fetched at a time while filling a filtered page
+_PAGE_BATCH = 100
+# How SQLite reports a second claim on a slot (its primary key)
+_SLOT_TAKEN = 'UNIQUE constraint failed: slots.'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_by_type ON users (json_extract(data, '$.user_type'));
+CREATE TABLE IF NOT EXISTS appointments (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    appointment_id TEXT NOT NULL UNIQUE,
+    patient_id TEXT NOT NULL,
+    doctor_key TEXT NOT NULL,
+    schedule_key TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS appointments_by_patient ON appointments (patient_id, seq);
+CREATE INDEX IF NOT EXISTS appointments_by_doctor
+    ON appointments (doctor_key, schedule_key, appointment_id);
+CREATE INDEX IF NOT EXISTS appointments_by_schedule ON appointments (schedule_key);
+CREATE INDEX IF NOT EXISTS appointments_by_expiry
+    ON appointments (json_extract(data, '$.expires_day'));
+CREATE TABLE IF NOT EXISTS slots (
+    doctor_key TEXT NOT NULL,
+    appointment_date TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    appointment_id TEXT NOT NULL,
+    PRIMARY KEY (doctor_key, appointment_date, slot)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS slots_by_appointment ON slots (appointment_id);
+CREATE TABLE IF NOT EXISTS appointment_stats (
+    scope TEXT NOT NULL,
+    day TEXT NOT NULL,
+    booked INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS appointment_stats_by_day ON appointment_stats (day);
+CREATE TABLE IF NOT EXISTS medical_records (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    record_id TEXT NOT NULL UNIQUE,
+    patient_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_by_patient ON medical_records (patient_id, seq);
+"""
+
+# Logical collection -> table (see bulk_data.TABLES)
+_COLLECTIONS = {
+    'users': 'users',
+    'appointments': 'appointments',
+    'records': 'medical_records',
+}
+
+
+def _json_default(value):
+    # datetime/date values (e.g. created_at) are stored as ISO strings
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _dumps(item):
+    return json.dumps(item, default=_json_default)
+
+
+class SQLiteStore:
+    """LocalStore's interface over a shared SQLite database file"""
+
+    def __init__(self, path='medtrack.db', busy_timeout=SQLITE_BUSY_TIMEOUT):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        # IF NOT EXISTS everywhere, so every worker can run this at startup
+        self._connect().executescript(SCHEMA)
+
+    # ---------------- connections ----------------
+
+    def _connect(self):
+        """This thread's connection, opened again in a forked child"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            # isolation_level=None: transactions are started explicitly below
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL makes NORMAL safe against corruption; only the last commits
+            # can be lost on power failure, not on a process crash
+            conn.execute('PRAGMA synchronous=NORMAL')
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    @contextmanager
+    def _transaction(self):
+        """A write transaction holding SQLite's write lock from the start
+
+        BEGIN IMMEDIATE takes the lock up front, so two workers can't both
+        read and then deadlock trying to upgrade to a write.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    def _one(self, sql, params):
+        row = self._connect().execute(sql, params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _all(self, sql, params):
+        return [json.loads(row[0]) for row in self._connect().execute(sql, params)]
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local = threading.local()
+
+    # ---------------- users ----------------
+
+    def get_user(self, user_id):
+        """Get a user by user_id"""
+        return self._one('SELECT data FROM users WHERE user_id = ?', (user_id,))
+
+    def get_user_by_email(self, email):
+        """Get a user by email through the unique email index"""
+        return self._one('SELECT data FROM users WHERE email = ?', (email,))
+
+    def create_user(self, user_data):
+        """Store a new user; returns False if the email is already registered"""
+        try:
+            with self._transaction() as conn:
+                conn.execute('INSERT INTO users (user_id, email, data) VALUES (?, ?, ?)',
+                             (user_data['user_id'], user_data['email'], _dumps(user_data)))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def set_password(self, user_id, password_hash):
+        """Replace a user's stored password hash"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE users SET data = json_set(data, '$.password', ?) WHERE user_id = ?",
+                (password_hash, user_id))
+        return cursor.rowcount > 0
+
+    def doctors(self):
+        """Every registered doctor"""
+        return self._all("SELECT data FROM users WHERE json_extract(data, '$.user_type') = 'doctor'", ())
+
+    # ---------------- appointments ----------------
+
+    def get_appointment(self, appointment_id):
+        """Get an appointment by appointment_id"""
+        return self._one('SELECT data FROM appointments WHERE appointment_id = ?', (appointment_id,))
+
+    def create_appointment(self, appointment_data):
+        """Store an appointment, claiming the doctor's slot in the same transaction
+
+        The slot's primary key makes a second claim fail, whichever worker
+        it comes from. Raises SlotUnavailable if the slot is already booked;
+        any other constraint failure (e.g. a reused appointment_id) is
+        raised as the IntegrityError it is.
+        """
+        if 'schedule_key' not in appointment_data:
+            with_schedule_keys(appointment_data)
+        with self._transaction() as conn:
+            try:
+                conn.execute(
+                    'INSERT INTO slots (doctor_key, appointment_date, slot, appointment_id) '
+                    'VALUES (?, ?, ?, ?)',
+                    (appointment_data['doctor_key'], appointment_data['appointment_date'],
+                     slot_index(appointment_data['appointment_time']),
+                     appointment_data['appointment_id']))
+            except sqlite3.IntegrityError as e:
+                if not str(e).startswith(_SLOT_TAKEN):
+                    raise
+                raise SlotUnavailable('That time slot is already booked')
+            conn.execute(
+                'INSERT INTO appointments (appointment_id, patient_id, doctor_key, schedule_key, data) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (appointment_data['appointment_id'], appointment_data['patient_id'],
+                 appointment_data['doctor_key'], appointment_data['schedule_key'],
+                 _dumps(appointment_data)))
+            self._count(conn, appointment_data, {'booked': 1})
+        return True
+
+    def cancel_appointment(self, appointment_id, changes):
+        """Apply a cancellation's fields and free the slot, keeping the appointment
+
+        Returns False if the appointment doesn't exist or is already cancelled.
+        """
+        paths = ', '.join(f"'$.{name}', ?" for name in changes)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE appointments SET data = json_set(data, {paths}) "
+                "WHERE appointment_id = ? AND json_extract(data, '$.status') IS NOT 'cancelled'",
+                (*changes.values(), appointment_id))
+            if cursor.rowcount == 0:
+                return False
+            conn.execute('DELETE FROM slots WHERE appointment_id = ?', (appointment_id,))
+            appointment = json.loads(conn.execute(
+                'SELECT data FROM appointments WHERE appointment_id = ?', (appointment_id,)).fetchone()[0])
+            self._count(conn, appointment, {'cancelled': 1})
+        return True
+
+    def delete_appointment(self, appointment_id):
+        """Remove an appointment and free its slot (its counts stay)"""
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM slots WHERE appointment_id = ?', (appointment_id,))
+            conn.execute('DELETE FROM appointments WHERE appointment_id = ?', (appointment_id,))
+        return True
+
+    def patient_appointments(self, patient_id):
+        """All appointments for a patient, in booking order"""
+        return self._all('SELECT data FROM appointments WHERE patient_id = ? ORDER BY seq',
+                         (patient_id,))
+
+    def patient_appointments_page(self, patient_id, offset=0, limit=None, predicate=None):
+        """One page of a patient's appointments, resuming after a position
+
+        offset is the booking sequence number the last page stopped at, so
+        each page is an index range read however deep it is. Returns
+        (appointments, next_offset), with next_offset None when the index
+        is exhausted.
+        """
+        conn = self._connect()
+        page = []
+        position = offset or 0
+        while True:
+            rows = conn.execute(
+                'SELECT seq, data FROM appointments WHERE patient_id = ? AND seq > ? '
+                'ORDER BY seq LIMIT ?', (patient_id, position, _PAGE_BATCH)).fetchall()
+            for seq, data in rows:
+                position = seq
+                appointment = json.loads(data)
+                if predicate is None or predicate(appointment):
+                    page.append(appointment)
+                    if limit is not None and len(page) >= limit:
+                        more = conn.execute(
+                            'SELECT 1 FROM appointments WHERE patient_id = ? AND seq > ? LIMIT 1',
+                            (patient_id, position)).fetchone()
+                        return page, (position if more else None)
+            if len(rows) < _PAGE_BATCH:
+                return page, None
+
+    def doctor_appointments(self, doctor_name):
+        """All appointments booked with a doctor, in schedule order"""
+        return self._all('SELECT data FROM appointments WHERE doctor_key = ? '
+                         'ORDER BY schedule_key, appointment_id', (doctor_key(doctor_name),))
+
+    def doctor_schedule(self, dkey, start_date, end_date, after=None, limit=None):
+        """One page of a doctor's appointments between two dates (inclusive)
+
+        Returns (appointments, last) where last is the final
+        (schedule_key, appointment_id) of the page if more remain.
+        """
+        low, high = schedule_bounds(start_date, end_date)
+        after_key, after_id = tuple(after) if after is not None else ('', '')
+        rows = self._connect().execute(
+            'SELECT schedule_key, appointment_id, data FROM appointments '
+            'WHERE doctor_key = ? AND schedule_key BETWEEN ? AND ? '
+            'AND (schedule_key, appointment_id) > (?, ?) '
+            'ORDER BY schedule_key, appointment_id LIMIT ?',
+            (dkey, low, high, after_key, after_id, -1 if limit is None else limit + 1)).fetchall()
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            return [json.loads(data) for _, _, data in rows], (rows[-1][0], rows[-1][1])
+        return [json.loads(data) for _, _, data in rows], None
+
+    def appointments_on(self, appointment_date):
+        """Every appointment on a date, in time order"""
+        low, high = schedule_bounds(appointment_date, appointment_date)
+        return self._all('SELECT data FROM appointments WHERE schedule_key BETWEEN ? AND ? '
+                         'ORDER BY schedule_key', (low, high))
+
+    def appointments_expiring_on(self, expires_day):
+        """Every appointment whose TTL falls on a day (archival)"""
+        return self._all("SELECT data FROM appointments WHERE json_extract(data, '$.expires_day') = ?",
+                         (expires_day,))
+
+    def booked_slots(self, dkey, appointment_date):
+        """Bitmap of a doctor's booked slots on a date"""
+        bits = 0
+        for (slot,) in self._connect().execute(
+                'SELECT slot FROM slots WHERE doctor_key = ? AND appointment_date = ?',
+                (dkey, appointment_date)):
+            bits |= 1 << slot
+        return bits
+
+    # ---------------- appointment statistics ----------------
+
+    def appointment_stats(self, scope, start_date, end_date):
+        """{day: {'booked': n, 'cancelled': n}} of one scope's counters between two dates"""
+        rows = self._connect().execute(
+            'SELECT day, booked, cancelled FROM appointment_stats '
+            'WHERE scope = ? AND day BETWEEN ? AND ? ORDER BY day', (scope, start_date, end_date))
+        return {day: {'booked': booked, 'cancelled': cancelled} for day, booked, cancelled in rows}
+
+    def appointment_stats_by_scope(self, start_date, end_date):
+        """{scope: {day: counts}} of every scope's counters between two dates"""
+        stats = {}
+        for scope, day, booked, cancelled in self._connect().execute(
+                'SELECT scope, day, booked, cancelled FROM appointment_stats '
+                'WHERE day BETWEEN ? AND ? ORDER BY scope, day', (start_date, end_date)):
+            stats.setdefault(scope, {})[day] = {'booked': booked, 'cancelled': cancelled}
+        return stats
+
+    def add_appointment_stats(self, scope, day, counts):
+        """Add {counter: amount} to one scope's counters for a day"""
+        with self._transaction() as conn:
+            self._add_stats(conn, scope, day, counts)
+        return True
+
+    @staticmethod
+    def _add_stats(conn, scope, day, counts):
+        amounts = [counts.get(name, 0) for name in COUNTERS]
+        conn.execute(
+            'INSERT INTO appointment_stats (scope, day, booked, cancelled) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (scope, day) DO UPDATE SET booked = booked + excluded.booked, '
+            'cancelled = cancelled + excluded.cancelled', (scope, day, *amounts))
+
+    def _count(self, conn, appointment, counts):
+        for scope in appointment_scopes(appointment):
+            self._add_stats(conn, scope, appointment['appointment_date'], counts)
+
+    # ---------------- medical records ----------------
+
+    def get_medical_record(self, record_id):
+        """Get a medical record's metadata by record_id"""
+        return self._one('SELECT data FROM medical_records WHERE record_id = ?', (record_id,))
+
+    def create_medical_record(self, record):
+        """Store a medical record's metadata and index it by patient"""
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO medical_records (record_id, patient_id, data) '
+                         'VALUES (?, ?, ?)',
+                         (record['record_id'], record['patient_id'], _dumps(record)))
+        return True
+
+    def patient_medical_records(self, patient_id):
+        """All medical records for a patient, in upload order"""
+        return self._all('SELECT data FROM medical_records WHERE patient_id = ? ORDER BY seq',
+                         (patient_id,))
+
+    # ---------------- export ----------------
+
+    def scan(self, kind):
+        """Yield every item of a collection ('users', 'appointments' or 'records')
+
+        Reads run on their own connection inside one snapshot, so a long
+        export neither sees half-applied writes nor blocks them.
+        """
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        try:
+            conn.execute('BEGIN')
+            for (data,) in conn.execute(f'SELECT data FROM {_COLLECTIONS[kind]}'):
+                yield json.loads(data)
+        finally:
+            conn.close()
@@ -0,0 +1,80 @@
+"""
+Cold-start helpers for MedTrack
+Importing aws_app does as little as it can: boto3 is imported, its clients
+built and its connections opened when first used, and templates are
+compiled when first rendered. Left alone, all of that lands on a new
+process's first requests. warm_up() does it up front instead, at a moment
+the deployment chooses: gunicorn's post_worker_init hook (see
+gunicorn.conf.py) or the Lambda init phase (see lambda_handler.py).
+
+With JINJA_CACHE_DIR set, compiled templates are also kept on disk as
+bytecode, so a restarted process loads them instead of compiling again.
+"""
+
+import os
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from aws_clients import get_dynamodb, get_table
+
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR', '')
+# Whether gunicorn workers and Lambda containers warm up before serving
+WARM_UP = os.environ.get('WARM_UP', 'true').lower() == 'true'
+
+
+def bytecode_cache_from_env():
+    """A Jinja bytecode cache in JINJA_CACHE_DIR, or None if unset"""
+    if not JINJA_CACHE_DIR:
+        return None
+    from jinja2 import FileSystemBytecodeCache
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    return FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+
+def precompile_templates(app):
+    """Compile every template into the app's Jinja cache; returns how many there are"""
+    env = app.jinja_env
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def open_dynamodb_connection(table_name, key):
+    """GetItem a key that needn't exist, to open a pooled connection (and its TLS session)
+
+    Goes around the StorageGuard: a failure here is only logged, and
+    mustn't count against the table's circuit breaker.
+    """
+    try:
+        get_dynamodb().Table(table_name).get_item(Key=key)
+    except (BotoCoreError, ClientError) as e:
+        print(f"Warm-up: DynamoDB connection failed: {e}")
+
+
+def warm_up(app, tables=(), probe=None, clients=(), hasher=None):
+    """Do the one-off work a new process's first requests would otherwise do
+
+    Compiles every template; builds each of clients (aws_clients factories
+    such as get_sns) and the Table for each of tables; reads probe, a
+    (table, key) pair, to open a connection to DynamoDB; and starts the
+    password hashing processes. Returns the seconds each step took.
+    """
+    timings = {}
+
+    def step(name, fn, *args):
+        start = time.perf_counter()
+        fn(*args)
+        timings[name] = time.perf_counter() - start
+
+    step('templates', precompile_templates, app)
+    for factory in clients:
+        step(factory.__name__, factory)
+    for table_name in tables:
+        step(f'table:{table_name}', get_table, table_name)
+    if probe:
+        step('dynamodb_connection', open_dynamodb_connection, *probe)
+    if hasher is not None:
+        step('password_pool', hasher.warm_up)
+    return timings
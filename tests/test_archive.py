@@ -0,0 +1,67 @@
+"""
+Archival: expiring rows are written to the archive and deleted from the
+hot table, a failed delete holds the checkpoint back, and rows archived
+more than once are read back once.
+"""
+
+from datetime import date
+
+from archive import _load_checkpoint, archive_expiring, read_archive
+
+TODAY = date(2030, 1, 10)
+
+
+def appointment(appointment_id, status='scheduled'):
+    return {
+        'appointment_id': appointment_id,
+        'patient_id': 'p1',
+        'appointment_date': '2030-01-07',
+        'status': status,
+        'expires_day': '2030-01-08',
+    }
+
+
+class Table:
+    """Stands in for the appointments table: fetch by expiry day, delete by id"""
+
+    def __init__(self, items, failing=()):
+        self.items = {item['appointment_id']: item for item in items}
+        self.failing = set(failing)
+
+    def fetch_expiring(self, iso_day):
+        return [item for item in self.items.values() if item['expires_day'] == iso_day]
+
+    def delete(self, appointment_id):
+        if appointment_id in self.failing:
+            return False
+        return self.items.pop(appointment_id, None) is not None
+
+
+def run(table, root):
+    return archive_expiring(table.fetch_expiring, table.delete, root=str(root), today=TODAY,
+                            ahead_days=0, lookback_days=3)
+
+
+def test_expiring_rows_are_archived_and_deleted(tmp_path):
+    table = Table([appointment('a1'), appointment('a2', 'cancelled')])
+
+    assert run(table, tmp_path) == (2, 0)
+
+    assert table.items == {}
+    assert sorted(item['appointment_id'] for item in
+                  read_archive('2030-01-01', '2030-01-31', root=str(tmp_path))) == ['a1', 'a2']
+    assert _load_checkpoint(str(tmp_path)) == '2030-01-09'
+
+
+def test_a_failed_delete_is_archived_again_but_read_once(tmp_path):
+    table = Table([appointment('a1'), appointment('a2')], failing={'a2'})
+
+    assert run(table, tmp_path) == (2, 1)
+    assert _load_checkpoint(str(tmp_path)) == '2030-01-07'
+    table.failing.clear()
+    assert run(table, tmp_path) == (1, 0)
+
+    assert table.items == {}
+    assert sorted(item['appointment_id'] for item in
+                  read_archive('2030-01-01', '2030-01-31', root=str(tmp_path))) == ['a1', 'a2']
+    assert _load_checkpoint(str(tmp_path)) == '2030-01-09'
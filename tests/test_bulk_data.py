@@ -0,0 +1,54 @@
+"""
+Bulk import into DynamoDB (moto): appointments arrive with their schedule
+keys and TTL, and every one that isn't cancelled claims its slot.
+"""
+
+import boto3
+import pytest
+
+from bulk_data import SLOTS_TABLE, TABLES, dynamodb_import
+from create_dynamodb_tables import provision
+
+moto = pytest.importorskip('moto')
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_SESSION_TOKEN', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        assert provision(boto3.client('dynamodb', region_name='us-east-1'))
+        yield boto3.resource('dynamodb', region_name='us-east-1')
+
+
+def appointment(appointment_id, time, status='scheduled'):
+    return {
+        'appointment_id': appointment_id,
+        'patient_id': 'p1',
+        'doctor_name': 'Dr. Sarah Smith',
+        'appointment_date': '2030-01-07',
+        'appointment_time': time,
+        'status': status,
+    }
+
+
+def test_imported_appointments_claim_their_slots(dynamodb):
+    table = dynamodb.Table(TABLES['appointments'][0])
+    slots = dynamodb.Table(SLOTS_TABLE)
+    records = [appointment('a1', '09:00'), appointment('a2', '09:30'),
+               appointment('a3', '10:00', 'cancelled')]
+
+    assert len(list(dynamodb_import(table, 'appointments', records, slots))) == 3
+
+    items = {item['appointment_id']: item for item in table.scan()['Items']}
+    assert set(items) == {'a1', 'a2', 'a3'}
+    assert all(item['doctor_key'] and item['expires_at'] for item in items.values())
+    assert 'slot_id' not in items['a3']
+    claims = {claim['slot_id']: claim for claim in slots.scan()['Items']}
+    assert claims == {
+        items[appointment_id]['slot_id']: {'slot_id': items[appointment_id]['slot_id'],
+                                           'appointment_id': appointment_id,
+                                           'expires_at': items[appointment_id]['expires_at']}
+        for appointment_id in ('a1', 'a2')
+    }
@@ -0,0 +1,68 @@
+"""
+Table provisioning against a local stand-in for DynamoDB (moto): every
+table in SCHEMA is created with its keys, indexes and TTL, a second run
+changes nothing, and a live table missing an index gets it added.
+"""
+
+import copy
+
+import boto3
+import pytest
+
+from create_dynamodb_tables import Capacity, SCHEMA, plan, plan_table, provision
+
+moto = pytest.importorskip('moto')
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    for name, value in (('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'),
+                        ('AWS_SESSION_TOKEN', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        yield boto3.client('dynamodb', region_name='us-east-1')
+
+
+def test_creates_every_table_with_its_keys_indexes_and_ttl(dynamodb):
+    assert provision(dynamodb)
+
+    assert set(dynamodb.list_tables()['TableNames']) == set(SCHEMA)
+    for table_name, spec in SCHEMA.items():
+        table = dynamodb.describe_table(TableName=table_name)['Table']
+        assert [(k['AttributeName'], k['KeyType']) for k in table['KeySchema']] == \
+            [(name, key_type) for name, _, key_type in spec['key']]
+        assert {i['IndexName'] for i in table.get('GlobalSecondaryIndexes', [])} == \
+            set(spec['indexes'])
+        assert table['BillingModeSummary']['BillingMode'] == 'PAY_PER_REQUEST'
+        if spec.get('ttl'):
+            ttl = dynamodb.describe_time_to_live(TableName=table_name)['TimeToLiveDescription']
+            assert ttl['TimeToLiveStatus'] == 'ENABLED'
+            assert ttl['AttributeName'] == spec['ttl']
+
+
+def test_second_run_has_nothing_to_do(dynamodb):
+    assert provision(dynamodb)
+
+    assert plan(dynamodb, Capacity()) == {table_name: [] for table_name in SCHEMA}
+    assert provision(dynamodb)
+
+
+def test_adds_a_missing_index_to_a_live_table(dynamodb):
+    table_name = next(name for name, spec in SCHEMA.items() if len(spec['indexes']) > 1)
+    old_schema = copy.deepcopy(SCHEMA)
+    missing = sorted(old_schema[table_name]['indexes'])[0]
+    del old_schema[table_name]['indexes'][missing]
+    assert provision(dynamodb, schema=old_schema)
+
+    assert plan(dynamodb, Capacity())[table_name] == [('create_index', missing)]
+    assert provision(dynamodb)
+
+    table = dynamodb.describe_table(TableName=table_name)['Table']
+    assert missing in {i['IndexName'] for i in table['GlobalSecondaryIndexes']}
+
+
+def test_plan_for_a_missing_table():
+    spec = {'key': [('slot_id', 'S', 'HASH')], 'indexes': {}, 'ttl': 'expires_at'}
+
+    assert plan_table(spec, None, Capacity()) == [('create_table', None),
+                                                  ('enable_ttl', 'expires_at')]
@@ -0,0 +1,115 @@
+"""
+The notification dispatcher: what is submitted reaches the publisher in
+batches of at most batch_size, failed batches are retried, and a full
+queue applies its overflow policy.
+"""
+
+import threading
+
+from notifications import SNS_MAX_BATCH, NotificationDispatcher, StubPublisher
+
+
+def submit_all(dispatcher, count):
+    return [dispatcher.submit('Subject', f'message {i}') for i in range(count)]
+
+
+def test_every_message_is_published_in_batches():
+    publisher = StubPublisher()
+    dispatcher = NotificationDispatcher(publisher, batch_size=4)
+
+    assert all(submit_all(dispatcher, 25))
+    assert dispatcher.shutdown(timeout=5)
+
+    assert sorted(message for _, message in publisher.messages) == \
+        sorted(f'message {i}' for i in range(25))
+    assert all(1 <= len(batch) <= 4 for batch in publisher.batches)
+    assert dispatcher.stats()['published'] == 25
+
+
+def test_batches_never_exceed_the_sns_limit():
+    publisher = StubPublisher()
+    dispatcher = NotificationDispatcher(publisher, batch_size=50)
+
+    submit_all(dispatcher, 35)
+    assert dispatcher.shutdown(timeout=5)
+
+    assert max(len(batch) for batch in publisher.batches) <= SNS_MAX_BATCH
+    assert len(publisher.messages) == 35
+
+
+def test_failed_batches_are_retried():
+    publisher = StubPublisher(fail_times=2)
+    dispatcher = NotificationDispatcher(publisher, max_retries=3, backoff=0.001)
+
+    submit_all(dispatcher, 3)
+    assert dispatcher.shutdown(timeout=5)
+
+    assert len(publisher.messages) == 3
+    stats = dispatcher.stats()
+    assert stats['retries'] >= 2
+    assert stats['failed'] == 0
+
+
+def test_gives_up_after_max_retries():
+    publisher = StubPublisher(fail_times=10)
+    dispatcher = NotificationDispatcher(publisher, max_retries=1, backoff=0.001)
+
+    submit_all(dispatcher, 2)
+    assert dispatcher.shutdown(timeout=5)
+
+    assert publisher.messages == []
+    assert dispatcher.stats()['failed'] == 2
+
+
+def test_full_queue_drops_new_messages():
+    release = threading.Event()
+
+    class BlockedPublisher(StubPublisher):
+        def publish_batch(self, messages):
+            release.wait(5)
+            return super().publish_batch(messages)
+
+    publisher = BlockedPublisher()
+    dispatcher = NotificationDispatcher(publisher, maxsize=2, batch_size=1, overflow='drop_new')
+    try:
+        accepted = submit_all(dispatcher, 10)
+    finally:
+        release.set()
+    assert dispatcher.shutdown(timeout=5)
+
+    assert not all(accepted)
+    assert len(publisher.messages) == accepted.count(True)
+    assert dispatcher.stats()['dropped'] == accepted.count(False)
+
+
+def test_on_done_reports_each_message_outcome():
+    outcomes = {}
+    publisher = StubPublisher(fail_times=10)
+    dispatcher = NotificationDispatcher(publisher, max_retries=1, backoff=0.001)
+
+    dispatcher.submit('Subject', 'lost', on_done=lambda ok: outcomes.setdefault('lost', ok))
+    assert dispatcher.flush(timeout=5)
+    publisher.fail_times = 0
+    dispatcher.submit('Subject', 'sent', on_done=lambda ok: outcomes.setdefault('sent', ok))
+    assert dispatcher.shutdown(timeout=5)
+    dispatcher.submit('Subject', 'late', on_done=lambda ok: outcomes.setdefault('late', ok))
+
+    assert outcomes == {'lost': False, 'sent': True, 'late': False}
+
+
+def test_messages_rejected_for_good_are_not_retried():
+    class RejectingPublisher(StubPublisher):
+        def publish_batch(self, messages):
+            self.batches.append(list(messages))
+            return [], [pair for pair in messages if pair[1] == 'bad']
+
+    outcomes = {}
+    publisher = RejectingPublisher()
+    dispatcher = NotificationDispatcher(publisher, batch_size=2)
+    dispatcher.submit('Subject', 'bad', on_done=lambda ok: outcomes.setdefault('bad', ok))
+    dispatcher.submit('Subject', 'good', on_done=lambda ok: outcomes.setdefault('good', ok))
+    assert dispatcher.shutdown(timeout=5)
+
+    assert outcomes == {'bad': False, 'good': True}
+    assert dispatcher.stats()['failed'] == 1
+    assert dispatcher.stats()['retries'] == 0
@@ -0,0 +1,47 @@
+"""
+Password hashing on the process pool: hashes verify, and a job whose
+caller timed out keeps its queue slot until it leaves the pool, so
+PASSWORD_HASH_QUEUE bounds the backlog.
+"""
+
+import time
+
+import pytest
+
+from passwords import PasswordHasher, PasswordHasherBusy, is_hashed
+
+METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(method=METHOD, workers=1, queue_size=2)
+    hasher.warm_up()
+    hasher.timeout = 0.2
+    yield hasher
+    hasher._get_executor().shutdown(cancel_futures=True)
+
+
+def test_hash_then_verify(hasher):
+    stored = hasher.hash('secret')
+
+    assert is_hashed(stored)
+    assert hasher.verify(stored, 'secret') == (True, None)
+    assert hasher.verify(stored, 'wrong') == (False, None)
+
+
+def test_timed_out_jobs_hold_their_slot_until_they_finish(hasher):
+    for _ in range(2):
+        with pytest.raises(PasswordHasherBusy, match='timed out'):
+            hasher._run(time.sleep, 1.5)
+
+    with pytest.raises(PasswordHasherBusy, match='queue is full'):
+        hasher._run(is_hashed, '')
+
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            assert hasher._run(is_hashed, '') is False
+            break
+        except PasswordHasherBusy:
+            assert time.monotonic() < deadline
@@ -0,0 +1,80 @@
+"""
+The reminder scheduler records a reminder as sent only once the
+dispatcher has published it; reminders it gave up on are tried again,
+and a day whose query fails keeps its pending reminders.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from notifications import NotificationDispatcher, StubPublisher
+from reminders import RETRY_SECONDS, ReminderScheduler
+
+NOW = datetime(2030, 1, 7, 9, 0)
+
+
+def appointment(appointment_id, time='10:00', day='2030-01-07'):
+    return {'appointment_id': appointment_id, 'patient_id': 'p1', 'doctor_name': 'Dr. Sarah Smith',
+            'appointment_date': day, 'appointment_time': time}
+
+
+@pytest.fixture
+def days():
+    return {'2030-01-07': [appointment('a1'), appointment('a2', '11:00')]}
+
+
+@pytest.fixture
+def publisher():
+    return StubPublisher()
+
+
+@pytest.fixture
+def scheduler(days, publisher, tmp_path):
+    dispatcher = NotificationDispatcher(publisher, max_retries=1, backoff=0.001)
+    scheduler = ReminderScheduler(lambda day: days.get(day, []), dispatcher,
+                                  checkpoint_path=str(tmp_path / 'checkpoint.json'),
+                                  clock=lambda: NOW)
+    yield scheduler
+    dispatcher.shutdown()
+
+
+def test_due_reminders_are_published_once(scheduler, publisher):
+    assert scheduler.run_once(NOW) == 2
+    assert scheduler.run_once(NOW + timedelta(minutes=1)) == 0
+
+    assert len(publisher.messages) == 2
+
+
+def test_reminders_that_failed_to_publish_are_retried(scheduler, publisher):
+    publisher.fail_times = 100
+
+    assert scheduler.run_once(NOW) == 0
+    assert scheduler.stats()['retried'] == 2
+    publisher.fail_times = 0
+    assert scheduler.run_once(NOW + timedelta(seconds=RETRY_SECONDS - 1)) == 0
+    assert scheduler.run_once(NOW + timedelta(seconds=RETRY_SECONDS)) == 2
+
+    assert len(publisher.messages) == 2
+
+
+def test_sent_reminders_survive_a_restart(scheduler, publisher, days):
+    assert scheduler.run_once(NOW) == 2
+
+    restarted = ReminderScheduler(lambda day: days.get(day, []), scheduler.notifier,
+                                  checkpoint_path=scheduler.checkpoint_path, clock=lambda: NOW)
+    assert restarted.run_once(NOW) == 0
+    assert len(publisher.messages) == 2
+
+
+def test_a_day_that_fails_to_load_keeps_its_reminders(scheduler, days):
+    scheduler.refresh(NOW - timedelta(hours=2))
+    assert len(scheduler.schedule) == 2
+
+    def failing(day):
+        raise RuntimeError('storage unavailable')
+    scheduler.fetch_day = failing
+    scheduler.refresh(NOW - timedelta(hours=2))
+
+    assert len(scheduler.schedule) == 2
+    assert scheduler.stats()['failed_days'] > 0
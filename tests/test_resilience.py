@@ -0,0 +1,187 @@
+"""
+StorageGuard under injected DynamoDB faults: retryable errors are retried
+and then turned into StorageUnavailable, the breaker opens and fails
+calls fast, reads made for a request are answered from their last result
+while the table is down, and writes that may have been applied are not
+retried.
+"""
+
+import pytest
+from botocore.exceptions import ClientError
+from flask import Flask, g
+
+import resilience
+from dynamodb_faults import FaultInjector
+from resilience import CircuitBreaker, StorageGuard, StorageUnavailable
+
+TABLE = 'MedTrack_Appointments'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Operation:
+    """Stands in for a Table method: counts calls and returns a fixed response"""
+
+    def __init__(self, response=None, error=None):
+        self.response = response if response is not None else {}
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def guard(clock):
+    def breaker():
+        return CircuitBreaker(window=10, min_calls=20, error_rate=0.5, cooldown=5, clock=clock)
+    return StorageGuard(max_attempts=3, deadline=60, cache_size=16, breaker_factory=breaker,
+                        sleep=lambda seconds: None, clock=clock)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    resilience.init_app(app)
+    return app
+
+
+def conditional_check_failed():
+    return ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'no'},
+                        'ResponseMetadata': {'HTTPStatusCode': 400}}, 'UpdateItem')
+
+
+def test_throttled_calls_are_retried(guard):
+    guard.faults = FaultInjector(throttle=0.3, seed=1)
+    get_item = Operation({'Item': {'appointment_id': 'a1'}})
+
+    for _ in range(10):
+        assert guard.call(TABLE, 'get_item', get_item, Key={'appointment_id': 'a1'})['Item']
+    assert guard.retries == guard.faults.injected > 0
+
+
+def test_persistent_errors_become_storage_unavailable(guard):
+    guard.faults = FaultInjector(error=1.0)
+    get_item = Operation()
+
+    with pytest.raises(StorageUnavailable):
+        guard.call(TABLE, 'get_item', get_item, Key={'appointment_id': 'a1'})
+    assert guard.faults.injected == 3
+    assert guard.retries == 2
+    assert get_item.calls == 0
+
+
+def test_breaker_opens_then_lets_a_probe_through(guard, clock):
+    guard.faults = FaultInjector(outage=True)
+    query = Operation({'Items': []})
+    while guard.breaker_states().get(TABLE) != CircuitBreaker.OPEN:
+        with pytest.raises(StorageUnavailable):
+            guard.call(TABLE, 'query', query, IndexName='PatientIdIndex')
+    assert guard.faults.injected == 20
+
+    short_circuits = guard.short_circuits
+    with pytest.raises(StorageUnavailable) as raised:
+        guard.call(TABLE, 'query', query, IndexName='PatientIdIndex')
+    assert guard.faults.injected == 20
+    assert guard.short_circuits == short_circuits + 1
+    assert raised.value.retry_after == 5
+
+    guard.faults = None
+    clock.now += 5
+    assert guard.call(TABLE, 'query', query, IndexName='PatientIdIndex') == {'Items': []}
+    assert guard.breaker_states() == {TABLE: CircuitBreaker.CLOSED}
+
+
+def test_request_reads_are_served_stale_during_an_outage(guard, app):
+    get_item = Operation({'Item': {'appointment_id': 'a1', 'status': 'scheduled'},
+                          'ResponseMetadata': {'HTTPStatusCode': 200}})
+    with app.test_request_context('/'):
+        guard.call(TABLE, 'get_item', get_item, Key={'appointment_id': 'a1'})
+
+    guard.faults = FaultInjector(outage=True)
+    with app.test_request_context('/'):
+        stale = guard.call(TABLE, 'get_item', get_item, Key={'appointment_id': 'a1'})
+        assert g.storage_degraded
+    assert stale == {'Item': {'appointment_id': 'a1', 'status': 'scheduled'}}
+    assert guard.stale_reads == 1
+
+    with app.test_request_context('/'), pytest.raises(StorageUnavailable):
+        guard.call(TABLE, 'get_item', get_item, Key={'appointment_id': 'other'})
+
+
+def test_background_reads_are_never_served_stale(guard):
+    get_item = Operation({'Item': {'appointment_id': 'a1'}})
+    guard.call(TABLE, 'get_item', get_item, Key={'appointment_id': 'a1'})
+
+    guard.faults = FaultInjector(outage=True)
+    with pytest.raises(StorageUnavailable):
+        guard.call(TABLE, 'get_item', get_item, Key={'appointment_id': 'a1'})
+
+
+def test_writes_are_refused_during_an_outage(guard, app):
+    put_item = Operation()
+    guard.faults = FaultInjector(outage=True)
+
+    with app.test_request_context('/'), pytest.raises(StorageUnavailable):
+        guard.call(TABLE, 'put_item', put_item, Item={'appointment_id': 'a1'})
+    assert put_item.calls == 0
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'ConditionExpression': 'attribute_exists(appointment_id)', 'UpdateExpression': 'SET #s = :s'},
+    {'UpdateExpression': 'ADD booked_07 :booked'},
+])
+def test_writes_that_may_have_applied_are_not_retried(guard, kwargs):
+    update_item = Operation()
+    guard.faults = FaultInjector(timeout=1.0)
+
+    with pytest.raises(StorageUnavailable):
+        guard.call(TABLE, 'update_item', update_item, Key={'appointment_id': 'a1'}, **kwargs)
+    assert guard.faults.injected == 1
+    assert guard.retries == 0
+
+
+def test_throttled_adds_are_retried(guard):
+    update_item = Operation({'Attributes': {}})
+    guard.faults = FaultInjector(throttle=0.3, seed=2)
+
+    for _ in range(5):
+        guard.call(TABLE, 'update_item', update_item, Key={'appointment_id': 'a1'},
+                   UpdateExpression='ADD booked_07 :booked')
+    assert update_item.calls == 5
+    assert guard.retries == guard.faults.injected > 0
+
+
+def test_a_failed_condition_is_raised_as_is(guard):
+    update_item = Operation(error=conditional_check_failed())
+
+    with pytest.raises(ClientError):
+        guard.call(TABLE, 'update_item', update_item, Key={'appointment_id': 'a1'},
+                   ConditionExpression='attribute_exists(appointment_id)')
+    assert update_item.calls == 1
+    assert guard.breaker_states() == {TABLE: CircuitBreaker.CLOSED}
+
+
+def test_storage_unavailable_is_a_503_with_retry_after(app):
+    @app.route('/down')
+    def down():
+        raise StorageUnavailable('down', retry_after=2.4)
+
+    response = app.test_client().get('/down')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
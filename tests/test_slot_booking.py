@@ -0,0 +1,77 @@
+"""
+Slot booking under concurrency: of many simultaneous bookings for one
+doctor, date and time, exactly one may succeed, in every store.
+"""
+
+import threading
+
+import pytest
+
+from availability import SlotUnavailable
+from local_store import LocalStore
+from sqlite_store import SQLiteStore
+
+THREADS = 16
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return LocalStore()
+    return SQLiteStore(str(tmp_path / 'medtrack.db'))
+
+
+def appointment(appointment_id, patient_id, time='10:00'):
+    return {
+        'appointment_id': appointment_id,
+        'patient_id': patient_id,
+        'doctor_name': 'Dr. Sarah Smith',
+        'appointment_date': '2030-01-07',
+        'appointment_time': time,
+        'status': 'scheduled',
+    }
+
+
+def book_at_once(store, appointments):
+    """Book every appointment from its own thread, all released together"""
+    barrier = threading.Barrier(len(appointments))
+    outcomes = []
+
+    def book(data):
+        barrier.wait()
+        try:
+            outcomes.append(store.create_appointment(data))
+        except SlotUnavailable:
+            outcomes.append(False)
+
+    threads = [threading.Thread(target=book, args=(data,)) for data in appointments]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def test_one_of_many_concurrent_bookings_wins(store):
+    outcomes = book_at_once(store, [appointment(f'a{i}', f'p{i}') for i in range(THREADS)])
+
+    assert outcomes.count(True) == 1
+    assert len(store.appointments_on('2030-01-07')) == 1
+
+
+def test_concurrent_bookings_of_different_slots_all_succeed(store):
+    times = [f'{9 + i // 2:02d}:{30 * (i % 2):02d}' for i in range(THREADS)]
+    outcomes = book_at_once(store, [appointment(f'a{i}', f'p{i}', time)
+                                    for i, time in enumerate(times)])
+
+    assert all(outcomes)
+    assert len(store.appointments_on('2030-01-07')) == THREADS
+
+
+def test_cancelling_frees_the_slot(store):
+    store.create_appointment(appointment('first', 'p1'))
+    with pytest.raises(SlotUnavailable):
+        store.create_appointment(appointment('second', 'p2'))
+
+    assert store.cancel_appointment('first', {'status': 'cancelled'})
+    assert store.create_appointment(appointment('second', 'p2'))
@@ -0,0 +1,105 @@
+"""
+Read-through user profile cache for MedTrack
+Bounded LRU with a TTL, plus short-lived negative entries for unknown emails
+so repeated bad logins don't each cost a DynamoDB read
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Marks a cached "no such user" result
+_MISSING = object()
+
+
+class UserCache:
+    """Thread-safe LRU cache of user records keyed by email"""
+
+    def __init__(self, maxsize=1024, ttl=60, negative_ttl=10):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # email -> (expires_at, user or _MISSING)
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a load that raced a write isn't cached
+        self._generation = 0
+
+        # Counters for sizing the cache
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, email, loader):
+        """Return the cached user for email, calling loader(email) on a miss
+
+        Exceptions from loader propagate and nothing is cached for them.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(email)
+                    if value is _MISSING:
+                        self.negative_hits += 1
+                        return None
+                    self.hits += 1
+                    return value
+                del self._entries[email]
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+
+        # Load outside the lock so a slow read doesn't block other lookups
+        user = loader(email)
+        self.put(email, user, generation)
+        return user
+
+    def put(self, email, user, generation=None):
+        """Cache a user record, or a negative entry when user is None
+
+        When generation is given, the entry is skipped if any invalidation
+        happened since it was read.
+        """
+        ttl = self.ttl if user is not None else self.negative_ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        value = user if user is not None else _MISSING
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[email] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, email):
+        """Drop any cached entry for email (call after every write to that user)"""
+        with self._lock:
+            self._entries.pop(email, None)
+            self._generation += 1
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        """Counters and current size, for sizing maxsize and ttl"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            }